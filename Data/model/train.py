@@ -0,0 +1,184 @@
+"""Entraînement reproductible du modèle de churn, version script du notebook data/entrainement_modele.ipynb.
+
+Usage (depuis la racine du projet) :
+    uv run python -m Data.model.train                       # régression logistique, écrit model.joblib
+    uv run python -m Data.model.train --estimator forest    # forêt aléatoire (grille du notebook)
+    uv run python -m Data.model.train --output-dir /tmp/candidat   # à charger ensuite via /models/load
+
+master_dataset.csv est lu une fois et ses features (mêmes calculs que l'API) sont mises en cache sur disque
+par joblib.Memory : un nouvel entraînement sur le même fichier repart de la matrice en cache. La recherche
+d'hyperparamètres répartit ses ajustements (combinaison × pli, SMOTE refait dans chaque pli) sur tous les
+cœurs (n_jobs=-1). Le pipeline lui-même n'a pas de cache : sur 1 470 lignes, hacher et relire le scaler et
+SMOTE coûte plus cher que de les réajuster.
+
+Le modèle est écrit avec features.joblib et model.meta.json (ordre des features, métriques, durée, versions),
+que l'API vérifie au chargement (app.ml.model_store.load_metadata).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+
+from app.ml.features import FEATURE_COLUMNS
+from app.ml.model_store import file_sha256, save_model
+from app.ml.scorer import DEFAULT_VALIDATION_DATA, MODEL_DIR
+
+DEFAULT_CACHE_DIR = os.path.join(MODEL_DIR, ".cache")
+SEED = 42
+
+# Grilles du notebook : le modèle livré est la régression logistique, optimisée sur le rappel
+GRIDS = {
+    "logistic": {
+        "model__C": [0.01, 0.1, 1, 5, 10],
+        "model__class_weight": ["balanced", None],
+        "smote__k_neighbors": [1, 3, 5, 7],
+    },
+    "forest": {
+        "model__n_estimators": [50, 100],
+        "model__max_depth": [5, 10, 15],
+        "model__min_samples_leaf": [2, 4],
+        "model__class_weight": ["balanced", None],
+    },
+}
+
+
+def _feature_matrix(dataset_path: str, signature: str):
+    # `signature` (SHA-256 du fichier) fait partie de la clé du cache : un CSV modifié est relu
+    import pandas as pd
+    from app.ml.features import dataset_feature_matrix
+
+    df = pd.read_csv(dataset_path)
+    y = (df["a_quitte_l_entreprise"] == "Oui").to_numpy(dtype=np.int64)
+    return dataset_feature_matrix(df), y
+
+
+def load_features(dataset_path: str = DEFAULT_VALIDATION_DATA, memory: joblib.Memory | None = None):
+    """Matrice des features (ordre FEATURE_COLUMNS) et cible de master_dataset.csv, en cache si `memory` est donné."""
+    compute = memory.cache(_feature_matrix) if memory is not None else _feature_matrix
+    return compute(os.path.abspath(dataset_path), file_sha256(dataset_path))
+
+
+def build_pipeline(estimator: str):
+    """Pipeline du notebook : StandardScaler -> SMOTE -> modèle."""
+    from imblearn.over_sampling import SMOTE
+    from imblearn.pipeline import Pipeline
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    if estimator == "logistic":
+        model = LogisticRegression(max_iter=1000, random_state=SEED)
+    elif estimator == "forest":
+        model = RandomForestClassifier(random_state=SEED)
+    else:
+        raise ValueError(f"Modèle inconnu : {estimator}")
+    # Le scaler sert aussi à la forêt : le score compilé (app/ml/scorer.py) attend ce format de pipeline
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("smote", SMOTE(random_state=SEED)),
+        ("model", model),
+    ])
+
+
+def evaluate(model, X, y) -> dict:
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+    predictions = model.predict(X)
+    probabilities = model.predict_proba(X)[:, 1]
+    return {
+        "roc_auc": round(float(roc_auc_score(y, probabilities)), 4),
+        "recall": round(float(recall_score(y, predictions)), 4),
+        "precision": round(float(precision_score(y, predictions, zero_division=0)), 4),
+        "f1": round(float(f1_score(y, predictions)), 4),
+        "accuracy": round(float(accuracy_score(y, predictions)), 4),
+    }
+
+
+def _dump(obj, path: str) -> None:
+    # Fichier temporaire puis os.replace : un worker qui surveille model.joblib ne lit jamais un fichier partiel
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def train(estimator: str = "logistic", dataset_path: str = DEFAULT_VALIDATION_DATA, output_dir: str = MODEL_DIR,
+          cache_dir: str | None = DEFAULT_CACHE_DIR, n_jobs: int = -1, folds: int = 5, grid: dict | None = None) -> dict:
+    """Entraîne, évalue et enregistre le modèle ; renvoie ses métadonnées."""
+    import imblearn
+    import pandas as pd
+    import sklearn
+    from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+
+    start = time.perf_counter()
+    memory = joblib.Memory(cache_dir, verbose=0) if cache_dir else None
+    X, y = load_features(dataset_path, memory)
+    # Ajusté sur un DataFrame : le modèle garde feature_names_in_, que l'API compare à features.joblib au chargement
+    X = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    features_seconds = time.perf_counter() - start
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=SEED, stratify=y)
+    search = GridSearchCV(
+        build_pipeline(estimator),
+        grid if grid is not None else GRIDS[estimator],
+        cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=SEED),
+        scoring="recall",
+        n_jobs=n_jobs,
+    )
+    search_start = time.perf_counter()
+    search.fit(X_train, y_train)
+    search_seconds = time.perf_counter() - search_start
+    model = search.best_estimator_
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, "model.joblib")
+    _dump(list(FEATURE_COLUMNS), os.path.join(output_dir, "features.joblib"))
+    metadata = {
+        "estimator": estimator,
+        "features": list(FEATURE_COLUMNS),
+        "params": dict(search.best_params_),
+        "cv_recall": round(float(search.best_score_), 4),
+        "metrics": evaluate(model, X_test, y_test),
+        "training_seconds": {
+            "features": round(features_seconds, 3),
+            "search": round(search_seconds, 3),
+            "total": round(time.perf_counter() - start, 3),
+        },
+        "fits": len(search.cv_results_["params"]) * folds,
+        "n_jobs": n_jobs,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "dataset": {"path": os.path.basename(dataset_path), "sha256": file_sha256(dataset_path), "rows": len(y)},
+        "versions": {"scikit-learn": sklearn.__version__, "imbalanced-learn": imblearn.__version__},
+    }
+    # Modèle puis model.meta.json, chacun renommé depuis un fichier temporaire
+    return save_model(model, model_path, metadata)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estimator", choices=sorted(GRIDS), default="logistic")
+    parser.add_argument("--dataset", default=DEFAULT_VALIDATION_DATA)
+    parser.add_argument("--output-dir", default=MODEL_DIR, help="Dossier de model.joblib, features.joblib et model.meta.json")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Cache joblib.Memory, vide pour désactiver")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Processus de la recherche d'hyperparamètres (-1 = tous les cœurs)")
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    metadata = train(args.estimator, args.dataset, args.output_dir, args.cache_dir or None, args.n_jobs, args.folds)
+    print(f"Modèle {metadata['estimator']} : {metadata['params']}")
+    print(f"Rappel en validation croisée : {metadata['cv_recall']}, sur le jeu de test : {metadata['metrics']}")
+    print(f"{metadata['fits']} ajustements en {metadata['training_seconds']['total']}s, écrits dans {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
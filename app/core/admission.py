@@ -0,0 +1,200 @@
+"""Contrôle d'admission : limite de débit par utilisateur et concurrence bornée, avant bcrypt.
+
+Une requête protégée passe deux contrôles dans le middleware, avant bcrypt, la session SQL et le pool de threads :
+- seau à jetons par utilisateur vérifié (jeton signé, ou identifiants Basic déjà validés et en cache), par adresse
+  IP pour tout le reste : 429 quand il est vide ;
+- places de traitement limitées par worker, avec une file d'attente bornée : 503 quand la file est pleine
+  ou que l'attente dépasse ADMISSION_QUEUE_TIMEOUT.
+Un client qui inonde /predict est ainsi refusé en quelques microsecondes au lieu d'encombrer les files internes
+jusqu'aux timeouts. Tout s'exécute sur la boucle d'événements : pas de verrou, état propre à chaque worker.
+"""
+import asyncio
+import base64
+import math
+import time
+from collections import OrderedDict, deque
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram, registry
+from app.core.security import credential_cache, verify_access_token
+
+# Routes soumises au contrôle : celles qui authentifient. Sondes, /metrics et documentation passent toujours.
+GUARDED_PREFIXES = ("/predict", "/history", "/stats", "/token", "/models", "/archive")
+
+WAIT_BUCKETS = (1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+queue_wait = registry.register(Histogram(
+    "churn_admission_wait_seconds", "Attente d'une place de traitement dans la file d'admission", buckets=WAIT_BUCKETS))
+shed_total = registry.register(Counter(
+    "churn_admission_shed_total", "Requêtes refusées par le contrôle d'admission", ["reason"]))
+
+
+def client_key(scope) -> str:
+    """Clé de limitation : utilisateur vérifié (jeton signé ou identifiants Basic déjà en cache), sinon adresse du client.
+
+    Un en-tête non vérifié ne choisit jamais le seau : sinon n'importe qui pourrait vider celui d'un autre
+    utilisateur, ou changer de nom à chaque requête pour repartir d'un seau plein.
+    """
+    for name, value in scope.get("headers", ()):
+        if name != b"authorization":
+            continue
+        scheme, _, credentials = value.partition(b" ")
+        try:
+            if scheme.lower() == b"basic":
+                username, _, password = base64.b64decode(credentials, validate=True).decode().partition(":")
+                # Couple déjà validé par bcrypt : un HMAC et une recherche dans le cache, pas de bcrypt ici
+                if username and credential_cache.contains(username, password):
+                    return "user:" + username
+            elif scheme.lower() == b"bearer":
+                # Signature HMAC vérifiée : quelques microsecondes
+                username = verify_access_token(credentials.decode())
+                if username:
+                    return "user:" + username
+        except (ValueError, UnicodeDecodeError):
+            pass
+        break
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:inconnu"
+
+
+class RateLimiter:
+    """Seaux à jetons par clé, en nombre borné (les clés inactives depuis le plus longtemps sont oubliées)."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # clé -> [jetons restants, date du dernier remplissage]
+
+    def acquire(self, key: str, rate: float, burst: int) -> float:
+        """Prend un jeton : renvoie 0 si la requête passe, sinon le délai (secondes) avant le prochain jeton."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(burst), now]
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class Overloaded(Exception):
+    """Aucune place de traitement : file pleine ("queue_full") ou attente trop longue ("queue_timeout")."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """Places de traitement limitées ; les requêtes en trop attendent dans une file bornée (FIFO)."""
+
+    def __init__(self):
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, limit: int, queue_size: int, timeout: float) -> float:
+        """Réserve une place ; renvoie le temps passé dans la file, lève Overloaded si la requête est refusée."""
+        if self.active < limit and not self._waiters:
+            self.active += 1
+            return 0.0
+        if len(self._waiters) >= queue_size:
+            raise Overloaded("queue_full")
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait((waiter,), timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)  # Client parti pendant l'attente
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            raise Overloaded("queue_timeout")
+        return time.perf_counter() - start
+
+    def _abandon(self, waiter) -> None:
+        if waiter.done():
+            self.release()  # La place venait de nous être transmise : on la rend
+            return
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        # La place passe directement à la première requête en attente, sans repasser par le compteur
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+rate_limiter = RateLimiter()
+concurrency_limiter = ConcurrencyLimiter()
+
+
+def admission_stats() -> dict:
+    return {
+        "active": concurrency_limiter.active,
+        "queued": concurrency_limiter.queued,
+        "limit": settings.ADMISSION_MAX_CONCURRENCY,
+        "queue_size": settings.ADMISSION_QUEUE_SIZE,
+        "shed": {reason: shed_total.value(reason) for reason in ("rate_limited", "queue_full", "queue_timeout")},
+    }
+
+
+def _reject(status_code: int, detail: str, retry_after: float, reason: str) -> JSONResponse:
+    shed_total.inc(reason)
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI : 429 au-delà du débit de l'utilisateur, 503 quand le worker est saturé."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED or not scope["path"].startswith(GUARDED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        if settings.RATE_LIMIT_PER_SECOND > 0:
+            retry_after = rate_limiter.acquire(client_key(scope), settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST)
+            if retry_after:
+                response = _reject(429, "Trop de requêtes pour cet utilisateur.", retry_after, "rate_limited")
+                await response(scope, receive, send)
+                return
+        if settings.ADMISSION_MAX_CONCURRENCY <= 0:
+            await self.app(scope, receive, send)
+            return
+        try:
+            waited = await concurrency_limiter.acquire(
+                settings.ADMISSION_MAX_CONCURRENCY, settings.ADMISSION_QUEUE_SIZE, settings.ADMISSION_QUEUE_TIMEOUT
+            )
+        except Overloaded as overloaded:
+            response = _reject(503, "Service saturé, réessayez dans un instant.", 1, overloaded.reason)
+            await response(scope, receive, send)
+            return
+        queue_wait.observe(waited)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            concurrency_limiter.release()
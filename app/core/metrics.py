@@ -0,0 +1,209 @@
+"""Instrumentation légère du chemin chaud, exposée au format Prometheus sur /metrics.
+
+Chaque mesure coûte un perf_counter() et une recherche dichotomique dans les seuils : on peut la laisser
+active en production. Les métriques sont propres à chaque worker uvicorn (pas de mémoire partagée).
+"""
+import bisect
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from app.core.config import settings
+
+# Seuils des histogrammes de durée (secondes) : de la microseconde (score compilé) à la seconde (bcrypt)
+DURATION_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{str(value)}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(dict(zip(self.label_names, label_values)))} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=DURATION_BUCKETS):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # valeurs des labels -> [compteurs par seuil..., somme, nombre]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in sorted(self._series.items()):
+            labels = dict(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(labels)} {series[-1]}"
+
+
+class Gauge:
+    """Jauge lue au moment du scrape : callback renvoyant {valeurs des labels: valeur}."""
+
+    def __init__(self, name: str, help_text: str, label_names=(), callback=None):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self.callback = callback
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        try:
+            values = self.callback() if self.callback else {}
+        except Exception:
+            values = {}  # Une source indisponible ne doit pas casser tout le scrape
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(dict(zip(self.label_names, label_values)))} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name: str, help_text: str, label_names=(), callback=None):
+        return self.register(Gauge(name, help_text, label_names, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.register(Histogram(
+    "churn_stage_duration_seconds", "Durée de chaque étape du traitement d'une prédiction", ["stage"]))
+request_duration = registry.register(Histogram(
+    "churn_http_request_duration_seconds", "Durée des requêtes HTTP par route", ["route"]))
+requests_total = registry.register(Counter(
+    "churn_http_requests_total", "Requêtes HTTP par route, méthode et code de statut", ["route", "method", "status"]))
+profiles_total = registry.register(Counter(
+    "churn_profiles_total", "Requêtes profilées par échantillonnage"))
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Chronomètre un bloc de code et l'ajoute à l'histogramme de l'étape."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - start, stage)
+
+
+# --- Profilage échantillonné : une fraction des requêtes est tracée en détail ---
+
+_profiling = threading.Lock()  # Un seul profileur actif à la fois
+
+
+def _profile_path(scope, extension: str) -> str:
+    directory = settings.PROFILE_DIR or os.path.join(tempfile.gettempdir(), "projet5_profiles")
+    os.makedirs(directory, exist_ok=True)
+    route = scope.get("path", "").strip("/").replace("/", "_") or "root"
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**6:06d}-{route}.{extension}")
+
+
+async def _run_profiled(app, scope, receive, send):
+    """Trace la requête avec pyinstrument s'il est installé (gère l'asynchrone), sinon cProfile."""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+    if Profiler is not None:
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            await app(scope, receive, send)
+        finally:
+            profiler.stop()
+            with open(_profile_path(scope, "html"), "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        return
+    import cProfile
+
+    # cProfile suit le thread de la boucle : les autres coroutines entrelacées apparaissent aussi
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await app(scope, receive, send)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(_profile_path(scope, "prof"))
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : durée et code de statut par route, profilage d'une fraction des requêtes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        sample = settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+        try:
+            if sample and _profiling.acquire(blocking=False):
+                profiles_total.inc()
+                try:
+                    await _run_profiled(self.app, scope, receive, send_wrapper)
+                finally:
+                    _profiling.release()
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            # Le modèle de route (/history) et non l'URL complète : le nombre de séries reste borné
+            route = scope.get("route")
+            route_path = getattr(route, "path", "non_routee")
+            request_duration.observe(time.perf_counter() - start, route_path)
+            requests_total.inc(route_path, scope["method"], status_holder["status"])
@@ -1,8 +1,27 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
 from passlib.context import CryptContext
 
+from app.core.config import settings
+
 # On configure le contexte de hachage avec bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Clé servant à signer les jetons et à condenser les mots de passe en cache.
+# Sans AUTH_SECRET_KEY, elle est aléatoire : les jetons ne valent alors que pour ce processus.
+SECRET_KEY = (settings.AUTH_SECRET_KEY or secrets.token_hex(32)).encode()
+
+# Fichier "époque" partagé entre processus : create_user.py le touche à chaque changement de mot de passe
+EPOCH_FILE = settings.AUTH_EPOCH_FILE or os.path.join(tempfile.gettempdir(), "projet5_auth_epoch")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie si le mot de passe en clair correspond au hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -10,3 +29,122 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     """Transforme un mot de passe en clair en hash sécurisé."""
     return pwd_context.hash(password)
+
+def get_credentials_epoch() -> int:
+    """Renvoie l'époque courante des identifiants (0 si aucun mot de passe n'a encore été changé)."""
+    try:
+        return os.stat(EPOCH_FILE).st_mtime_ns
+    except OSError:
+        return 0
+
+def bump_credentials_epoch() -> None:
+    """Signale à tous les processus qu'un mot de passe a changé (vide les caches, révoque les jetons)."""
+    with open(EPOCH_FILE, "a"):
+        pass
+    # On force une nouvelle date même si deux changements tombent dans la même milliseconde
+    now = time.time_ns()
+    os.utime(EPOCH_FILE, ns=(now, max(now, get_credentials_epoch() + 1)))
+
+
+class CredentialCache:
+    """Cache borné des identifiants déjà vérifiés par bcrypt, avec expiration (TTL)."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (username, condensé) -> date d'expiration
+        self._epoch = get_credentials_epoch()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(username: str, password: str):
+        # On ne garde jamais le mot de passe en clair : seulement un HMAC avec la clé secrète
+        digest = hmac.new(SECRET_KEY, password.encode(), hashlib.sha256).digest()
+        return (username, digest)
+
+    def _check_epoch(self):
+        # Un changement de mot de passe dans un autre processus invalide tout le cache
+        epoch = get_credentials_epoch()
+        if epoch != self._epoch:
+            self._entries.clear()
+            self._epoch = epoch
+
+    def contains(self, username: str, password: str) -> bool:
+        """Vrai si ce couple identifiant / mot de passe a été validé récemment."""
+        if self.maxsize <= 0:
+            return False
+        key = self._key(username, password)
+        with self._lock:
+            self._check_epoch()
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, username: str, password: str) -> None:
+        """Mémorise un couple identifiant / mot de passe validé par bcrypt."""
+        if self.maxsize <= 0:
+            return
+        key = self._key(username, password)
+        with self._lock:
+            self._check_epoch()
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)  # On évince le plus ancien
+
+    def invalidate(self, username: str | None = None) -> None:
+        """Oublie les identifiants d'un utilisateur (ou de tous si username est None)."""
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == username]:
+                    del self._entries[key]
+
+
+credential_cache = CredentialCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+def invalidate_credentials(username: str) -> None:
+    """À appeler après un changement de mot de passe : vide ce cache et prévient les autres processus."""
+    credential_cache.invalidate(username)
+    bump_credentials_epoch()
+
+
+# --- Mode jeton : on s'authentifie une fois en Basic, puis on présente un jeton signé ---
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(SECRET_KEY, payload, hashlib.sha256).digest()
+
+def create_access_token(username: str) -> str:
+    """Crée un jeton signé (HMAC-SHA256) valable AUTH_TOKEN_TTL secondes."""
+    expires_at = int(time.time()) + settings.AUTH_TOKEN_TTL
+    payload = f"{username}:{expires_at}:{get_credentials_epoch()}".encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+def verify_access_token(token: str) -> str | None:
+    """Renvoie l'utilisateur du jeton s'il est authentique, non expiré et non révoqué, sinon None."""
+    try:
+        payload_b64, signature_b64 = token.split(".")
+        payload = _b64decode(payload_b64)
+        signature = _b64decode(signature_b64)
+        username, expires_at, epoch = payload.decode().rsplit(":", 2)
+        expires_at, epoch = int(expires_at), int(epoch)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    # Un changement de mot de passe (nouvelle époque) révoque les jetons déjà émis
+    if expires_at < time.time() or epoch != get_credentials_epoch():
+        return None
+    return username
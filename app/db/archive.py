@@ -0,0 +1,326 @@
+"""Archive Parquet de l'historique : mois révolus copiés en fichiers colonnes compressés, lus sans toucher à la base.
+
+Disposition : <ARCHIVE_DIR>/month=AAAA-MM/part-0.parquet (partitionnement "hive"), plus _manifest.json qui
+retient jusqu'où l'archive est complète. Un passage d'archivage (archive_history) traite un mois à la fois :
+écriture du fichier (zstd, lignes triées par date), suppression facultative des lignes dans la base (partition
+supprimée sur PostgreSQL partitionné, DELETE sinon), puis avancée du manifeste juste avant le commit. Interrompu
+avant, il reprend au même mois et réécrit le même fichier : aucune ligne en double, aucune ligne perdue.
+Chaque mois est traité sous le verrou de maintenance de l'historique (app/db/partitions.py), partagé avec la
+création des partitions et la rétention. La rétention ne supprime jamais un mois pas encore archivé.
+
+Lecture (scan_archive, archive_summary) : pyarrow.dataset n'ouvre que les mois demandés (élagage par partition),
+saute les groupes de lignes hors de la période grâce à leurs statistiques min/max, et ne lit que les colonnes utiles.
+"""
+import json
+import logging
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import delete, func, select, text
+
+from app.core.config import settings
+from app.db.history import HISTORY_COLUMNS, _json_default
+from app.db.models import Historique
+from app.db.partitions import HISTORY_TABLE, history_partitions, is_partitioned, lock_maintenance, month_start
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(__file__), "../../Data/archive")
+MANIFEST = "_manifest.json"  # Préfixe "_" : ignoré par pyarrow.dataset
+ARCHIVE_FIELDS = [column.name for column in HISTORY_COLUMNS]
+
+
+def archive_dir() -> str:
+    return settings.ARCHIVE_DIR or DEFAULT_ARCHIVE_DIR
+
+
+def archive_schema():
+    """Schéma Parquet de l'historique : mêmes largeurs que la table compacte, date en UTC."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date_prediction", pa.timestamp("us", tz="UTC")),
+        ("age", pa.int16()),
+        ("revenu_mensuel", pa.float64()),
+        ("distance_domicile_travail", pa.float64()),
+        ("satisfaction_environnement", pa.int16()),
+        ("heures_supp", pa.bool_()),
+        ("annees_promo", pa.int32()),
+        ("satisfaction_equilibre", pa.int16()),
+        ("pee", pa.int32()),
+        ("poste_actuel", pa.int32()),
+        ("anciennete", pa.int32()),
+        ("exp_totale", pa.float64()),
+        ("prediction", pa.int16()),
+        ("probability", pa.float64()),
+        ("model_version", pa.string()),
+    ])
+
+
+def month_key(value: date) -> str:
+    return f"{value:%Y-%m}"
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite rend des dates naïves : elles sont enregistrées en UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _month_bounds(month: date) -> tuple[datetime, datetime]:
+    upper = month_start(month, 1)
+    return (datetime.combine(month, time(), timezone.utc), datetime.combine(upper, time(), timezone.utc))
+
+
+def read_manifest(directory: str) -> dict:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {"archived_before": None, "months": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def archived_before_month(manifest: dict) -> date | None:
+    """Premier mois pas encore archivé (tous les mois antérieurs sont dans l'archive), None si rien n'est archivé."""
+    return date.fromisoformat(manifest["archived_before"]) if manifest["archived_before"] else None
+
+
+def _write_manifest(directory: str, manifest: dict) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+
+
+def _record_batch(rows, schema):
+    import pyarrow as pa
+
+    columns = {name: [row[name] for row in rows] for name in ARCHIVE_FIELDS}
+    columns["heures_supp"] = [None if value is None else value == "Oui" for value in columns["heures_supp"]]
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def write_month(connection, directory: str, month: date, chunk_size: int = 100_000) -> dict:
+    """Écrit les lignes d'un mois dans month=AAAA-MM/part-0.parquet ; renvoie le nombre de lignes et d'octets."""
+    import pyarrow.parquet as pq
+
+    lower, upper = _month_bounds(month)
+    query = (
+        select(*HISTORY_COLUMNS)
+        .where(Historique.date_prediction >= lower, Historique.date_prediction < upper)
+        .order_by(Historique.date_prediction, Historique.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    partition_dir = os.path.join(directory, f"month={month_key(month)}")
+    os.makedirs(partition_dir, exist_ok=True)
+    path = os.path.join(partition_dir, "part-0.parquet")
+    schema = archive_schema()
+    fd, tmp_path = tempfile.mkstemp(dir=partition_dir, suffix=".tmp")
+    os.close(fd)
+    rows = 0
+    try:
+        # Un groupe de lignes par bloc lu : dates croissantes, donc min/max de chaque groupe exploitables au filtrage
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for partition in connection.execute(query).mappings().partitions():
+                writer.write_batch(_record_batch(partition, schema))
+                rows += len(partition)
+        if rows:
+            os.replace(tmp_path, path)
+        else:
+            os.unlink(tmp_path)  # Mois déjà archivé puis vidé par un passage interrompu : le fichier reste
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return {"rows": rows, "bytes": os.path.getsize(path) if os.path.exists(path) else 0}
+
+
+def delete_month(connection, month: date) -> None:
+    """Retire un mois archivé de la base : DETACH puis DROP de sa partition sur PostgreSQL, DELETE sinon."""
+    if is_partitioned(connection):
+        for name, partition_month in history_partitions(connection).items():
+            if partition_month == month:
+                connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {name}"))
+                connection.execute(text(f"DROP TABLE {name}"))
+    # Lignes restantes : table simple, ou partition par défaut sur PostgreSQL
+    lower, upper = _month_bounds(month)
+    connection.execute(delete(Historique).where(Historique.date_prediction >= lower, Historique.date_prediction < upper))
+
+
+def archive_history(bind, directory: str, after_months: int = 3, delete_rows: bool = False,
+                    today: date | None = None, chunk_size: int = 100_000) -> list[str]:
+    """Archive les mois révolus plus anciens que les `after_months` derniers mois ; renvoie les mois écrits."""
+    cutoff = month_start(today or datetime.now(timezone.utc).date(), -after_months)
+    os.makedirs(directory, exist_ok=True)
+    archived_before = archived_before_month(read_manifest(directory))
+    # Premier mois encore à archiver : après le manifeste, et seulement s'il reste des lignes avant la limite
+    query = select(func.min(Historique.date_prediction)).where(Historique.date_prediction < _month_bounds(cutoff)[0])
+    if archived_before is not None:
+        query = query.where(Historique.date_prediction >= _month_bounds(archived_before)[0])
+    with bind.connect() as connection:
+        first = connection.scalar(query)
+    if first is None:
+        return []
+    month = month_start(_as_utc(first).date())
+    if archived_before is not None:
+        month = max(month, archived_before)
+    archived = []
+    while month < cutoff:
+        with bind.begin() as connection:
+            # Un worker à la fois, et manifeste relu sous le verrou : un mois traité entre-temps par un autre
+            # worker n'est ni réécrit (ses lignes peuvent déjà être supprimées) ni détaché une seconde fois
+            lock_maintenance(connection)
+            manifest = read_manifest(directory)
+            if archived_before_month(manifest) is None or archived_before_month(manifest) <= month:
+                written = write_month(connection, directory, month, chunk_size)
+                if delete_rows:
+                    delete_month(connection, month)
+                if written["rows"]:
+                    manifest["months"][month_key(month)] = {**written, "deleted": delete_rows}
+                    archived.append(month_key(month))
+                manifest["archived_before"] = month_start(month, 1).isoformat()
+                # Avant le commit, donc avant de rendre le verrou : le worker suivant lit un manifeste à jour
+                _write_manifest(directory, manifest)
+        month = month_start(month, 1)
+    if archived:
+        logger.info("Historique archivé en Parquet : %s", ", ".join(archived))
+    return archived
+
+
+# --- Lecture de l'archive ---
+
+def archive_dataset(directory: str):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+    return ds.dataset(directory, format="parquet", schema=archive_schema().append(pa.field("month", pa.string())),
+                      partitioning=partitioning)
+
+
+def archive_filter(date_from: datetime | None = None, date_to: datetime | None = None,
+                   prediction: int | None = None, model_version: str | None = None):
+    """Filtre pyarrow : bornes de mois pour l'élagage des partitions, bornes exactes sur date_prediction."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    timestamp = pa.timestamp("us", tz="UTC")
+    conditions = []
+    if date_from is not None:
+        date_from = _as_utc(date_from)
+        conditions += [ds.field("month") >= month_key(date_from),
+                       ds.field("date_prediction") >= pa.scalar(date_from, type=timestamp)]
+    if date_to is not None:
+        date_to = _as_utc(date_to)
+        # Borne exclue : un date_to au 1er du mois à minuit n'ouvre pas ce mois
+        conditions += [ds.field("month") <= month_key(date_to - timedelta(microseconds=1)),
+                       ds.field("date_prediction") < pa.scalar(date_to, type=timestamp)]
+    if prediction is not None:
+        conditions.append(ds.field("prediction") == prediction)
+    if model_version is not None:
+        conditions.append(ds.field("model_version") == model_version)
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+def scan_archive(directory: str, columns: list[str] | None = None, batch_size: int = 65_536, **filters):
+    """Lots (pyarrow.RecordBatch) de l'archive : seulement les colonnes demandées et les mois concernés."""
+    if not os.path.isdir(directory):
+        return
+    columns = columns or ARCHIVE_FIELDS
+    unknown = [column for column in columns if column not in ARCHIVE_FIELDS]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues : {', '.join(unknown)}")
+    yield from archive_dataset(directory).to_batches(
+        columns=columns, filter=archive_filter(**filters), batch_size=batch_size
+    )
+
+
+GROUP_KEYS = ("month", "day", "model_version")
+
+
+def archive_summary(directory: str, group_by: str = "month", **filters) -> list[dict]:
+    """Prédictions, départs prédits, taux et probabilité moyenne par mois, jour ou version du modèle."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if group_by not in GROUP_KEYS:
+        raise ValueError(f"Regroupement inconnu : {group_by}")
+    # Mois : la colonne de partition, sans décoder une seule date. Jour : date UTC, mise en forme par groupe seulement
+    source = {"month": "month", "day": "date_prediction", "model_version": "model_version"}[group_by]
+    if not os.path.isdir(directory):
+        return []
+    table = archive_dataset(directory).to_table(
+        columns=[source, "prediction", "probability"], filter=archive_filter(**filters)
+    )
+    if not table.num_rows:
+        return []
+    keys = pc.cast(table[source], pa.date32()) if group_by == "day" else table[source]
+    grouped = pa.table({
+        "key": keys, "prediction": pc.cast(table["prediction"], pa.int64()), "probability": table["probability"],
+    }).group_by("key").aggregate([("prediction", "count"), ("prediction", "sum"), ("probability", "mean")])
+    if group_by == "day":
+        grouped = grouped.set_column(0, "key", pc.strftime(grouped["key"], "%Y-%m-%d"))
+    summary = []
+    for row in sorted(grouped.to_pylist(), key=lambda item: (item["key"] is None, item["key"] or "")):
+        count = row["prediction_count"]
+        summary.append({
+            group_by: row["key"],
+            "total": count,
+            "churn": row["prediction_sum"],
+            "churn_rate": round(row["prediction_sum"] / count, 4) if count else None,
+            "mean_probability": round(row["probability_mean"], 4) if row["probability_mean"] is not None else None,
+        })
+    return summary
+
+
+def _encode(batch) -> list[dict]:
+    rows = batch.to_pylist()
+    if "heures_supp" in batch.schema.names:
+        for row in rows:
+            if row["heures_supp"] is not None:
+                row["heures_supp"] = "Oui" if row["heures_supp"] else "Non"
+    return rows
+
+
+def stream_archive_ndjson(directory: str, columns: list[str] | None = None, **filters):
+    """Export NDJSON de l'archive, lot par lot (même format que /history/export)."""
+    for batch in scan_archive(directory, columns, **filters):
+        yield "".join(json.dumps(row, default=_json_default) + "\n" for row in _encode(batch))
+
+
+def stream_archive_csv(directory: str, columns: list[str] | None = None, **filters):
+    import csv
+    import io
+
+    columns = columns or ARCHIVE_FIELDS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in scan_archive(directory, columns, **filters):
+        writer.writerows([row[column] for column in columns] for row in _encode(batch))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Archive Parquet des mois révolus de l'historique")
+    parser.add_argument("--directory", default=archive_dir())
+    parser.add_argument("--after-months", type=int, default=settings.ARCHIVE_AFTER_MONTHS)
+    parser.add_argument("--delete", action="store_true", help="Supprimer de la base les mois archivés")
+    args = parser.parse_args()
+    months = archive_history(engine, args.directory, args.after_months, args.delete)
+    print(f"Mois archivés dans {args.directory} : {', '.join(months) or 'aucun'}")
@@ -0,0 +1,139 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Historique
+from app.db.stats import apply_rollup, queue_rollup
+
+# Colonnes renvoyées par /history (toutes celles de la table, sans passer par des objets ORM)
+HISTORY_COLUMNS = list(Historique.__table__.columns)
+HISTORY_FIELDS = [column.name for column in HISTORY_COLUMNS]
+
+
+def encode_cursor(row) -> str:
+    """Curseur opaque pointant après la ligne donnée : (date_prediction, id)."""
+    raw = f"{row['date_prediction'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Inverse de encode_cursor ; lève ValueError si le curseur est invalide."""
+    date_text, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(date_text), int(row_id)
+
+
+def filtered_history(date_from=None, date_to=None, prediction=None):
+    """Requête de base sur l'historique, du plus récent au plus ancien, avec les filtres optionnels."""
+    query = select(*HISTORY_COLUMNS).order_by(Historique.date_prediction.desc(), Historique.id.desc())
+    if date_from is not None:
+        query = query.where(Historique.date_prediction >= date_from)
+    if date_to is not None:
+        query = query.where(Historique.date_prediction < date_to)
+    if prediction is not None:
+        query = query.where(Historique.prediction == prediction)
+    return query
+
+
+def history_page(db: Session, limit: int, cursor: str | None = None, **filters):
+    """Une page d'historique par pagination "keyset" : renvoie (lignes, curseur suivant ou None)."""
+    query = filtered_history(**filters)
+    if cursor is not None:
+        # On reprend juste après la dernière ligne vue, l'index (date, id) évite tout tri complet
+        query = query.where(tuple_(Historique.date_prediction, Historique.id) < decode_cursor(cursor))
+    rows = db.execute(query.limit(limit + 1)).mappings().all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _iter_rows(db: Session, chunk_size: int, **filters):
+    # yield_per active le curseur côté serveur : la mémoire reste constante quelle que soit la taille de l'export
+    result = db.execute(filtered_history(**filters).execution_options(yield_per=chunk_size))
+    for partition in result.mappings().partitions():
+        yield partition
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable : {type(value)}")
+
+
+def stream_history_ndjson(db: Session, chunk_size: int = 1000, **filters):
+    """Export NDJSON en flux : une ligne JSON par prédiction."""
+    for partition in _iter_rows(db, chunk_size, **filters):
+        yield "".join(json.dumps(dict(row), default=_json_default) + "\n" for row in partition)
+
+
+def stream_history_csv(db: Session, chunk_size: int = 1000, **filters):
+    """Export CSV en flux, en-tête compris."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HISTORY_FIELDS)
+    for partition in _iter_rows(db, chunk_size, **filters):
+        writer.writerows([row[field] for field in HISTORY_FIELDS] for row in partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def insert_history(db: Session, rows: list[dict], defer_rollup: bool = False) -> None:
+    """Insère des lignes d'historique (sans commit).
+
+    Par défaut, les agrégats de /stats sont mis à jour dans la même transaction : réservé aux écritures par lot.
+    Une écriture par requête passe defer_rollup=True : seuls les id de ses lignes partent dans
+    historique_rollup_pending, toujours dans la même transaction, et fold_pending les replie plus tard.
+    """
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        # Date fixée ici : l'agrégat du jour et la ligne d'historique portent la même
+        row.setdefault("date_prediction", now)
+    if not settings.STATS_ROLLUP_ENABLED:
+        # Un seul INSERT multi-lignes (executemany "insertmanyvalues" de SQLAlchemy 2)
+        db.execute(insert(Historique), rows)
+    elif defer_rollup:
+        # Même INSERT multi-lignes, avec RETURNING pour connaître les id à replier
+        ids = db.scalars(insert(Historique).returning(Historique.id), rows).all()
+        queue_rollup(db, ids)
+    else:
+        db.execute(insert(Historique), rows)
+        apply_rollup(db, rows)
+
+
+def bulk_load_history(bind, rows: list[dict]) -> int:
+    """Chargement massif dans l'historique : COPY sur PostgreSQL, insertion groupée (executemany) ailleurs."""
+    if not rows:
+        return 0
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        row.setdefault("date_prediction", now)
+    columns = list(rows[0])
+    if bind.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # COPY contourne les types SQLAlchemy : heures_supp est converti ici en booléen PostgreSQL
+        encoders = {"heures_supp": lambda value: None if value is None else "t" if value == "Oui" else "f"}
+        writer.writerows(
+            [encoders[column](row[column]) if column in encoders else row[column] for column in columns] for row in rows
+        )
+        buffer.seek(0)
+        # COPY ... FROM STDIN : un seul flux pour tout le bloc, agrégats mis à jour dans la même transaction
+        with bind.begin() as connection:
+            with connection.connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {Historique.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+                )
+            if settings.STATS_ROLLUP_ENABLED:
+                apply_rollup(Session(bind=connection), rows)
+    else:
+        with Session(bind) as db:
+            insert_history(db, rows)
+            db.commit()
+    return len(rows)
@@ -0,0 +1,250 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.history import insert_history
+
+logger = logging.getLogger(__name__)
+
+
+class HistorySink:
+    """Écriture différée de l'historique : les requêtes empilent, une tâche de fond insère par lots."""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        policy: str = "spill",
+        spill_path: str = "",
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy  # "block", "drop" ou "spill" quand la file est pleine
+        # Un fichier de débordement par processus (voir spill_path) : les workers ne se marchent pas dessus
+        self._spill_root, self._spill_ext = os.path.splitext(
+            spill_path or os.path.join(tempfile.gettempdir(), "projet5_history_spill.jsonl")
+        )
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._task = None
+        self._spill_pending = False  # Lignes de ce processus en attente sur disque
+        # Compteurs exposés pour le suivi, croissants : spilled compte les débordements, replayed les lignes
+        # relues sur disque et réinsérées
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    # --- Côté requêtes ---
+
+    async def submit(self, rows: list[dict]) -> None:
+        """Met des lignes d'historique en file d'attente, sans toucher à la base."""
+        now = datetime.now(timezone.utc)
+        overflow = []
+        for row in rows:
+            # La date est celle de la prédiction, pas celle de l'insertion différée
+            row.setdefault("date_prediction", now)
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                if self.policy == "block":
+                    await self._put_when_free(row)
+                elif self.policy == "drop":
+                    self.dropped += 1
+                    logger.warning("File d'historique pleine : prédiction non historisée")
+                else:
+                    overflow.append(row)
+        if overflow:
+            # Écriture disque hors de la boucle d'événements, en une fois pour la requête
+            await asyncio.to_thread(self._spill, overflow)
+
+    async def _put_when_free(self, row: dict) -> None:
+        # Attente sans bloquer la boucle d'événements, ni occuper un thread : les threads par défaut
+        # d'asyncio servent aussi à la tâche de vidage, qui doit pouvoir libérer la file
+        while True:
+            await asyncio.sleep(0.01)
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                continue
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    # --- Côté tâche de fond ---
+
+    async def start(self) -> None:
+        """Lance la tâche de vidage (appelé depuis le lifespan de l'API)."""
+        self._stopping.clear()
+        # Ce qui a été débordé sur disque par un processus arrêté (celui-ci avant redémarrage, un ancien worker) repart en base
+        try:
+            await asyncio.to_thread(self._replay_spill, True)
+        except Exception:
+            logger.exception("Échec de la reprise de l'historique débordé sur disque")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête la tâche de fond puis vide tout ce qui reste en file."""
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await asyncio.to_thread(self.drain)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            # Une erreur inattendue ne doit pas arrêter la tâche : l'historique s'accumulerait sans fin dans la file
+            try:
+                written = await asyncio.to_thread(self._flush_next_batch)
+                # La base répond de nouveau : on rejoue ce qui avait débordé sur disque
+                if written and self._spill_pending:
+                    await asyncio.to_thread(self._replay_spill)
+            except Exception:
+                logger.exception("Échec de l'écriture différée de l'historique")
+                await asyncio.sleep(self.flush_interval)
+
+    def _flush_next_batch(self) -> int:
+        """Attend un lot complet ou la fin du délai, puis l'écrit en une seule requête."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stopping.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.1)))
+            except queue.Empty:
+                continue
+        return self._write(batch)
+
+    def drain(self) -> int:
+        """Écrit immédiatement tout le contenu de la file (arrêt de l'API, tests)."""
+        total = 0
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return total
+            total += self._write(batch)
+
+    def _write(self, batch: list[dict]) -> int:
+        if not batch:
+            return 0
+        try:
+            # Un seul INSERT multi-lignes, agrégats de /stats compris, dans une transaction
+            with self.session_factory() as db:
+                insert_history(db, batch)
+                db.commit()
+        except Exception:
+            # Base lente ou indisponible : on garde les lignes sur disque plutôt que de les perdre
+            logger.exception("Échec d'écriture de %d lignes d'historique, débordement sur disque", len(batch))
+            self._spill(batch)
+            return 0
+        self.written += len(batch)
+        return len(batch)
+
+    # --- Débordement sur fichier local ---
+
+    @property
+    def spill_path(self) -> str:
+        # Calculé à chaque appel : un worker créé par fork après l'import n'a pas le PID du processus parent
+        return f"{self._spill_root}.{os.getpid()}{self._spill_ext}"
+
+    def _spill(self, rows: list[dict]) -> None:
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + "\n")
+            self.spilled += len(rows)
+            self._spill_pending = True
+
+    def _claimable(self, orphans: bool) -> list[str]:
+        """Fichiers à rejouer : celui de ce processus, et avec orphans=True ceux des processus arrêtés."""
+        if not orphans:
+            return [self.spill_path]
+        paths = [self._spill_root + self._spill_ext]  # Fichier unique des versions précédentes
+        for path in glob.glob(glob.escape(self._spill_root) + ".*" + glob.escape(self._spill_ext)):
+            pid = path[len(self._spill_root) + 1:].split(".", 1)[0]
+            if pid.isdigit() and (int(pid) == os.getpid() or not _process_alive(int(pid))):
+                paths.append(path)
+        return paths
+
+    def _claim(self, path: str) -> str | None:
+        # Renommage atomique : si deux workers visent le même fichier, un seul l'obtient
+        claimed = f"{self._spill_root}.{os.getpid()}.{time.time_ns()}.replay{self._spill_ext}"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    def _replay_spill(self, orphans: bool = False) -> None:
+        """Réinsère les lignes débordées sur disque, si la base répond de nouveau.
+
+        Le fichier n'est supprimé qu'une fois toutes ses lignes réinsérées, ou débordées de nouveau si la base
+        tombe pendant la reprise : un arrêt brutal peut au pire réinsérer des lignes en double, jamais en perdre.
+        Bloquant (renommage, lecture, INSERT) : appelé via asyncio.to_thread, jamais sur la boucle d'événements.
+        """
+        with self._spill_lock:
+            claimed = [path for path in map(self._claim, self._claimable(orphans)) if path]
+            if not orphans:
+                self._spill_pending = False
+        for path in claimed:
+            batch = []
+            with open(path, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                        row["date_prediction"] = datetime.fromisoformat(row["date_prediction"])
+                    except (ValueError, KeyError, TypeError):
+                        # Ligne tronquée (arrêt pendant l'écriture) ou illisible : on la signale et on continue
+                        logger.error("Ligne %d illisible dans %s, ignorée : %r", number, path, line[:200])
+                        continue
+                    batch.append(row)
+                    if len(batch) >= self.batch_size:
+                        # En cas d'échec, _write déborde le lot dans le fichier de ce processus
+                        self.replayed += self._write(batch)
+                        batch = []
+            self.replayed += self._write(batch)
+            os.remove(path)
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name != "posix":
+        return False  # Sous Windows, os.kill terminerait le processus : le fichier est considéré comme abandonné
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+history_sink = HistorySink(
+    max_queue=settings.HISTORY_QUEUE_SIZE,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+    policy=settings.HISTORY_BACKPRESSURE,
+    spill_path=settings.HISTORY_SPILL_FILE,
+)
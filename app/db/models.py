@@ -1,28 +1,59 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Boolean, Column, Integer, SmallInteger, String, Float, Date, DateTime, Index
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from app.db.database import Base # Note l'import : app.db.database
 
+
+class OuiNon(TypeDecorator):
+    """Booléen en base, "Oui"/"Non" côté Python : l'API et les exports ne voient pas la différence."""
+    impl = Boolean
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return value == "Oui" if isinstance(value, str) else bool(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return "Oui" if value else "Non"
+
+
 class Historique(Base):
+    # Schéma compact (version 4) : entiers courts pour les champs bornés par l'API (âge, notes, prédiction),
+    # booléen pour les heures sup., flottants pour la distance et l'expérience comme dans EmployeeInput.
+    # Sur PostgreSQL, la table est partitionnée par mois sur date_prediction (voir app/db/partitions.py)
     __tablename__ = "historique_predictions"
-    id = Column(Integer, primary_key=True, index=True)
-    date_prediction = Column(DateTime(timezone=True), server_default=func.now()) # On ajoute la date de la prédiction, server_default=func.now() permet de mettre la date actuelle
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True) # INTEGER en SQLite pour garder l'auto-incrément
+    date_prediction = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), default=lambda: datetime.now(timezone.utc)) # On ajoute la date de la prédiction, server_default=func.now() permet de mettre la date actuelle
 
-    # Inputs, data qu'on utilise pour prédire
-    age = Column(Integer)
+    # Inputs, data qu'on utilise pour prédire (mêmes types que EmployeeInput)
+    age = Column(SmallInteger)
     revenu_mensuel = Column(Float)
-    distance_domicile_travail = Column(Integer)
-    satisfaction_environnement = Column(Integer)
-    heures_supp = Column(String)
+    distance_domicile_travail = Column(Float)
+    satisfaction_environnement = Column(SmallInteger)
+    heures_supp = Column(OuiNon)
     annees_promo = Column(Integer)
-    satisfaction_equilibre = Column(Integer)
+    satisfaction_equilibre = Column(SmallInteger)
     pee = Column(Integer)
     poste_actuel = Column(Integer)
     anciennete = Column(Integer)
-    exp_totale = Column(Integer)
+    exp_totale = Column(Float)
 
     # Output, prédiction
-    prediction = Column(Integer)
+    prediction = Column(SmallInteger)
     probability = Column(Float)
+    model_version = Column(String, nullable=True) # Version du modèle qui a produit la prédiction (registre des modèles)
+
+    # Index pour /history : tri par date décroissante et pagination par curseur (date, id) sans tri complet,
+    # y compris filtré sur la prédiction (un index sur prediction seul, 0 ou 1, obligeait à trier)
+    __table_args__ = (
+        Index("ix_historique_predictions_date_id", "date_prediction", "id"),
+        Index("ix_historique_predictions_prediction_date_id", "prediction", "date_prediction", "id"),
+    )
 
 
 class User(Base):
@@ -31,3 +62,34 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+
+
+class SchemaVersion(Base):
+    # Version du schéma appliquée à la base : au démarrage, on saute create_all si elle est à jour
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
+class HistoriqueRollup(Base):
+    # Agrégats de l'historique par jour, tenus à jour à chaque écriture : /stats ne parcourt jamais l'historique
+    __tablename__ = "historique_rollup"
+
+    jour = Column(Date, primary_key=True)
+    metric = Column(String, primary_key=True) # "prediction", "probability", une feature d'entrée ou "proba_bin_<i>"
+    count = Column(Integer, nullable=False)
+    total = Column(Float) # Somme des valeurs (pour "prediction" : nombre de départs prédits)
+    total_sq = Column(Float) # Somme des carrés, pour l'écart-type
+    minimum = Column(Float)
+    maximum = Column(Float)
+
+
+class HistoriqueRollupPending(Base):
+    # Lignes d'historique pas encore comptées dans historique_rollup : insérées dans la transaction de la requête
+    # (clés toutes différentes, aucun verrou partagé), repliées par lot dans les agrégats (app/db/stats.py).
+    # Un worker arrêté brutalement ne perd rien : un autre worker replie ses lignes au passage suivant
+    __tablename__ = "historique_rollup_pending"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False) # id de l'historique
@@ -0,0 +1,186 @@
+"""Partitionnement mensuel de historique_predictions sur PostgreSQL, et rétention par suppression de partitions.
+
+Une partition par mois (historique_predictions_AAAA_MM), créée à l'avance par maintain_history, plus une
+partition par défaut pour ne jamais refuser une écriture. Les requêtes filtrées par date (/history, exports)
+ne lisent que les mois concernés, et la rétention détache puis supprime un mois entier : pas de DELETE
+ligne à ligne, pas de table à vacuumer. Les autres bases gardent une table simple et une rétention par DELETE.
+
+Chaque worker lance la maintenance : elle est sérialisée par un verrou consultatif PostgreSQL pris dans sa
+transaction (lock_maintenance), pour que deux workers n'exécutent jamais le même DDL en même temps.
+"""
+import logging
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Column, Index, MetaData, PrimaryKeyConstraint, Table, delete, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.db.models import Historique
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TABLE = Historique.__tablename__
+DEFAULT_PARTITION = f"{HISTORY_TABLE}_default"
+_PARTITION_NAME = re.compile(rf"^{HISTORY_TABLE}_(\d{{4}})_(\d{{2}})$")
+# Clé du verrou consultatif de la maintenance (partitions, rétention, archivage) : constante propre à l'application
+MAINTENANCE_LOCK_KEY = 5_555_001
+
+
+def lock_maintenance(connection) -> None:
+    """Attend le verrou de maintenance de l'historique, relâché à la fin de la transaction (PostgreSQL uniquement)."""
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+
+def month_start(value: date, offset: int = 0) -> date:
+    """Premier jour du mois de `value`, décalé de `offset` mois."""
+    months = value.year * 12 + value.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{HISTORY_TABLE}_{month:%Y_%m}"
+
+
+def partitioned_history_table() -> Table:
+    """Copie de la table Historique pour PostgreSQL : clé primaire (id, date_prediction), partitionnée par mois.
+
+    La clé de partitionnement doit faire partie de la clé primaire ; le modèle ORM garde `id` seul comme identité.
+    """
+    metadata = MetaData()
+    columns = []
+    for column in Historique.__table__.columns:
+        copy = Column(column.name, column.type, nullable=column.nullable, server_default=column.server_default)
+        if column.name == "id":
+            copy.autoincrement = True  # BIGSERIAL malgré la clé composite
+        columns.append(copy)
+    table = Table(
+        HISTORY_TABLE, metadata, *columns,
+        PrimaryKeyConstraint("id", "date_prediction"),
+        postgresql_partition_by="RANGE (date_prediction)",
+    )
+    for index in Historique.__table__.indexes:
+        Index(index.name, *[table.c[column.name] for column in index.columns])
+    return table
+
+
+def create_history_table(connection) -> None:
+    """Crée historique_predictions et ses index : partitionnée sur PostgreSQL, table simple ailleurs."""
+    if connection.dialect.name != "postgresql":
+        Historique.__table__.create(connection)
+        return
+    table = partitioned_history_table()
+    connection.execute(CreateTable(table))
+    for index in table.indexes:
+        connection.execute(CreateIndex(index))
+    connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {HISTORY_TABLE} DEFAULT"))
+
+
+def _month_bounds(month: date) -> tuple[str, str]:
+    # Bornes en UTC : un mois couvre [1er à 00:00 UTC, 1er du mois suivant à 00:00 UTC)
+    return f"'{month.isoformat()} 00:00:00+00'", f"'{month_start(month, 1).isoformat()} 00:00:00+00'"
+
+
+def create_partitions(connection, first: date, last: date) -> list[str]:
+    """Crée les partitions mensuelles manquantes de `first` à `last` inclus (PostgreSQL uniquement).
+
+    Si la partition par défaut contient déjà des lignes du mois (écrites avant la création de sa partition),
+    PostgreSQL refuse de créer la partition : la partition par défaut est alors détachée le temps de créer celle
+    du mois et d'y déplacer ces lignes, puis rattachée, dans la même transaction.
+    """
+    existing = set(history_partitions(connection))
+    created = []
+    month = month_start(first)
+    while month <= last:
+        name = partition_name(month)
+        lower, upper = _month_bounds(month)
+        if name in existing:
+            month = month_start(month, 1)
+            continue
+        in_month = f"date_prediction >= {lower} AND date_prediction < {upper}"
+        stranded = connection.execute(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})")).scalar()
+        if stranded:
+            connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+        connection.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {HISTORY_TABLE} FOR VALUES FROM ({lower}) TO ({upper})"
+        ))
+        if stranded:
+            moved = connection.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+            connection.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+            connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+            logger.info("%d lignes déplacées de la partition par défaut vers %s", moved.rowcount, name)
+        created.append(name)
+        month = month_start(month, 1)
+    return created
+
+
+def history_partitions(connection) -> dict[str, date]:
+    """Partitions mensuelles existantes : nom -> premier jour du mois."""
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"
+    ), {"table": HISTORY_TABLE}).scalars()
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text(
+        "SELECT count(*) FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+        "WHERE pg_class.relname = :table"
+    ), {"table": HISTORY_TABLE}).scalar() > 0
+
+
+def drop_expired(connection, retention_months: int, today: date | None = None, keep_from: date | None = None) -> list[str]:
+    """Supprime l'historique antérieur aux `retention_months` derniers mois (mois en cours compris).
+
+    PostgreSQL partitionné : DETACH puis DROP des partitions entières, DELETE des lignes de la partition par
+    défaut. Ailleurs : un DELETE sur la date.
+    Rien n'est supprimé à partir du mois `keep_from` (premier mois pas encore archivé, voir app/db/archive.py).
+    Les agrégats de /stats (historique_rollup) sont conservés.
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = month_start(today or datetime.now(timezone.utc).date(), 1 - retention_months)
+    if keep_from is not None and keep_from < cutoff:
+        logger.info("Rétention limitée aux mois archivés : rien n'est supprimé à partir de %s", keep_from)
+        cutoff = keep_from
+    dropped = []
+    if is_partitioned(connection):
+        for name, month in sorted(history_partitions(connection).items(), key=lambda item: item[1]):
+            if month >= cutoff:
+                continue
+            connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {name}"))
+            connection.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    # Table simple, ou lignes restées dans la partition par défaut (mois sans partition) : seule celle-ci est lue
+    limit = datetime(cutoff.year, cutoff.month, 1, tzinfo=timezone.utc)
+    result = connection.execute(delete(Historique).where(Historique.date_prediction < limit))
+    if result.rowcount:
+        dropped.append(f"{result.rowcount} lignes")
+    return dropped
+
+
+def maintain_history(bind, months_ahead: int = 2, retention_months: int = 0, keep_from: date | None = None) -> dict:
+    """Crée les partitions des prochains mois et applique la rétention (au démarrage, puis périodiquement).
+
+    keep_from : premier mois à garder quelle que soit la rétention (voir drop_expired).
+    """
+    today = datetime.now(timezone.utc).date()
+    created = []
+    with bind.begin() as connection:
+        lock_maintenance(connection)
+        if is_partitioned(connection):
+            created = create_partitions(connection, month_start(today), month_start(today, months_ahead))
+        dropped = drop_expired(connection, retention_months, today, keep_from)
+    if dropped:
+        logger.info("Rétention de l'historique : %s supprimé(s)", ", ".join(dropped))
+    return {"partitions": created, "dropped": dropped}
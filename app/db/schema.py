@@ -0,0 +1,143 @@
+"""Migrations du schéma, appliquées au démarrage dans l'ordre à partir de la version enregistrée dans schema_version.
+
+Base vide : le schéma courant est créé d'un coup (historique partitionné sur PostgreSQL). Base existante :
+chaque migration manquante s'exécute dans sa propre transaction, puis sa version est enregistrée.
+"""
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import String, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app.db.database import Base
+from app.db.models import Historique, HistoriqueRollup, HistoriqueRollupPending, SchemaVersion
+from app.db.partitions import HISTORY_TABLE, create_history_table, create_partitions, month_start
+from app.db.stats import rebuild_rollup
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter à chaque évolution des tables ou des index, avec la migration correspondante dans MIGRATIONS
+SCHEMA_VERSION = 5  # 2 : model_version, 3 : historique_rollup, 4 : historique compact et partitionné,
+# 5 : historique_rollup_pending
+
+
+def current_version(bind) -> int:
+    """Version appliquée : 0 pour une base vide, 1 pour un historique antérieur au suivi des versions."""
+    inspector = inspect(bind)
+    version = None
+    if inspector.has_table(SchemaVersion.__tablename__):
+        with Session(bind) as db:
+            version = db.scalar(select(SchemaVersion.version).order_by(SchemaVersion.id.desc()).limit(1))
+    if version is not None:
+        return version
+    return 1 if inspector.has_table(HISTORY_TABLE) else 0
+
+
+def schema_is_current(bind) -> bool:
+    """Vrai si la base porte déjà la version de schéma attendue (une seule requête, pas de réflexion complète)."""
+    if not inspect(bind).has_table(SchemaVersion.__tablename__):
+        return False
+    return current_version(bind) == SCHEMA_VERSION
+
+
+def _create_latest(connection) -> None:
+    # Base vide : tables au dernier format, l'historique à part (partitionné sur PostgreSQL)
+    tables = [table for table in Base.metadata.sorted_tables if table.name != HISTORY_TABLE]
+    Base.metadata.create_all(bind=connection, tables=tables)
+    create_history_table(connection)
+    if connection.dialect.name == "postgresql":
+        today = datetime.now(timezone.utc).date()
+        create_partitions(connection, today, month_start(today, 2))
+
+
+def _migrate_2_model_version(connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns(HISTORY_TABLE)}
+    if "model_version" not in columns:
+        connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} ADD COLUMN model_version VARCHAR"))
+
+
+def _migrate_3_rollup(connection) -> None:
+    # Les agrégats sont recalculés une fois toutes les migrations passées (voir ensure_schema)
+    HistoriqueRollup.__table__.create(connection, checkfirst=True)
+
+
+def _migrate_4_compact_history(connection) -> None:
+    """Recrée l'historique au format compact (et partitionné sur PostgreSQL), données recopiées en une requête."""
+    inspector = inspect(connection)
+    old_table = f"{HISTORY_TABLE}_v3"
+    old_columns = {column["name"]: column["type"] for column in inspector.get_columns(HISTORY_TABLE)}
+    # Les noms d'index et de clé primaire sont globaux au schéma : on libère ceux que la nouvelle table reprend
+    for index in inspector.get_indexes(HISTORY_TABLE):
+        connection.execute(text(f"DROP INDEX {index['name']}"))
+    primary_key = inspector.get_pk_constraint(HISTORY_TABLE).get("name")
+    connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} RENAME TO {old_table}"))
+    if connection.dialect.name == "postgresql" and primary_key:
+        connection.execute(text(f"ALTER TABLE {old_table} RENAME CONSTRAINT {primary_key} TO {old_table}_pkey"))
+
+    create_history_table(connection)
+    if connection.dialect.name == "postgresql":
+        # Une partition par mois déjà présent dans l'historique, plus les mois à venir
+        first = connection.execute(text(f"SELECT min(date_prediction) FROM {old_table}")).scalar()
+        today = datetime.now(timezone.utc).date()
+        create_partitions(connection, first.date() if first else today, month_start(today, 2))
+
+    copied = [column.name for column in Historique.__table__.columns if column.name in old_columns]
+    selected = []
+    for name in copied:
+        if name == "heures_supp" and isinstance(old_columns[name], String):
+            selected.append("heures_supp = 'Oui'")  # "Oui"/"Non" -> booléen
+        elif name == "date_prediction":
+            selected.append("COALESCE(date_prediction, CURRENT_TIMESTAMP)")
+        else:
+            selected.append(name)
+    connection.execute(text(
+        f"INSERT INTO {HISTORY_TABLE} ({', '.join(copied)}) SELECT {', '.join(selected)} FROM {old_table}"
+    ))
+    if connection.dialect.name == "postgresql" and "id" in old_columns:
+        # Les id recopiés sont explicites : la séquence repart après le plus grand
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{HISTORY_TABLE}', 'id'), "
+            f"COALESCE((SELECT max(id) FROM {HISTORY_TABLE}), 0) + 1, false)"
+        ))
+    connection.execute(text(f"DROP TABLE {old_table}"))
+
+
+def _migrate_5_rollup_pending(connection) -> None:
+    # Lignes de /predict en attente de repli dans les agrégats (remplace le cumul en mémoire de chaque worker)
+    HistoriqueRollupPending.__table__.create(connection, checkfirst=True)
+
+
+MIGRATIONS = {
+    2: _migrate_2_model_version,
+    3: _migrate_3_rollup,
+    4: _migrate_4_compact_history,
+    5: _migrate_5_rollup_pending,
+}
+
+
+def ensure_schema(bind) -> bool:
+    """Applique les migrations manquantes et enregistre la version. Renvoie False si rien n'était à faire."""
+    version = current_version(bind)
+    if version == SCHEMA_VERSION:
+        return False
+    if version == 0:
+        with bind.begin() as connection:
+            _create_latest(connection)
+            connection.execute(SchemaVersion.__table__.insert().values(
+                version=SCHEMA_VERSION, applied_at=datetime.now(timezone.utc)
+            ))
+        return True
+    # Tables sans migration propre (users, schema_version) : create_all ne touche pas à l'existant
+    Base.metadata.create_all(bind=bind, tables=[t for t in Base.metadata.sorted_tables if t.name != HISTORY_TABLE])
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        logger.info("Migration du schéma vers la version %s", target)
+        with bind.begin() as connection:
+            MIGRATIONS[target](connection)
+            connection.execute(SchemaVersion.__table__.insert().values(
+                version=target, applied_at=datetime.now(timezone.utc)
+            ))
+    # Table d'agrégats toute neuve sur un historique existant : rattrapage en un parcours
+    if version < 3:
+        with Session(bind) as db:
+            rebuild_rollup(db)
+    return True
@@ -0,0 +1,216 @@
+"""Agrégats de l'historique (table historique_rollup).
+
+Par jour : nombre de prédictions et de départs prédits, somme/min/max des probabilités et des features
+d'entrée, et histogramme des probabilités en PROBABILITY_BINS classes. /stats ne lit que ces lignes :
+son coût dépend du nombre de jours demandés, pas de la taille de l'historique.
+
+Les écritures par lot (écriture différée, scoring en masse) mettent les agrégats à jour dans leur propre
+transaction. Les écritures unitaires de /predict ne le font pas : une quinzaine de lignes d'agrégat du jour,
+partagées par tous les workers, seraient verrouillées à chaque requête. Elles n'ajoutent que l'id de leurs lignes
+à historique_rollup_pending, dans la même transaction ; fold_pending replie ces lignes dans les agrégats toutes
+les STATS_ROLLUP_INTERVAL secondes. Rien ne reste en mémoire : après un arrêt brutal, les lignes en attente sont
+repliées par le prochain passage, de n'importe quel worker.
+"""
+import math
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.db.models import Historique, HistoriqueRollup, HistoriqueRollupPending
+from app.ml.features import INPUT_FIELDS, encode_heures_supp
+
+PROBABILITY_BINS = 10
+VALUE_METRICS = ["prediction", "probability", *INPUT_FIELDS]
+
+
+def _day(value) -> date:
+    if value is None:
+        return datetime.now(timezone.utc).date()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _metric_values(rows: list[dict], metric: str) -> np.ndarray:
+    if metric == "heures_supp":
+        return np.array([encode_heures_supp(row[metric]) for row in rows], dtype=np.float64)
+    return np.array([row[metric] for row in rows], dtype=np.float64)
+
+
+def rollup_deltas(rows: list[dict]) -> list[dict]:
+    """Agrège un lot de lignes d'historique en incréments par (jour, métrique)."""
+    by_day = defaultdict(list)
+    for row in rows:
+        by_day[_day(row.get("date_prediction"))].append(row)
+    deltas = []
+    for day, day_rows in by_day.items():
+        for metric in VALUE_METRICS:
+            values = _metric_values(day_rows, metric)
+            deltas.append({
+                "jour": day, "metric": metric, "count": len(values), "total": float(values.sum()),
+                "total_sq": float(values @ values), "minimum": float(values.min()), "maximum": float(values.max()),
+            })
+        probabilities = _metric_values(day_rows, "probability")
+        bins = np.clip((probabilities * PROBABILITY_BINS).astype(int), 0, PROBABILITY_BINS - 1)
+        for i, count in enumerate(np.bincount(bins, minlength=PROBABILITY_BINS)):
+            if count:
+                deltas.append({"jour": day, "metric": f"proba_bin_{i}", "count": int(count),
+                               "total": None, "total_sq": None, "minimum": None, "maximum": None})
+    return deltas
+
+
+def _upsert_statement(dialect: str):
+    # INSERT ... ON CONFLICT DO UPDATE : l'incrément est atomique, même avec plusieurs workers
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        least, greatest = func.least, func.greatest
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        least, greatest = func.min, func.max  # min/max à plusieurs arguments = fonctions scalaires en SQLite
+    else:
+        return None
+    statement = dialect_insert(HistoriqueRollup)
+    current, new = HistoriqueRollup.__table__.c, statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=["jour", "metric"],
+        set_={
+            "count": current.count + new.count,
+            "total": current.total + new.total,
+            "total_sq": current.total_sq + new.total_sq,
+            "minimum": least(current.minimum, new.minimum),
+            "maximum": greatest(current.maximum, new.maximum),
+        },
+    )
+
+
+def write_deltas(db: Session, deltas: list[dict]) -> None:
+    """Ajoute des incréments aux agrégats, dans la transaction en cours (sans commit)."""
+    if not deltas:
+        return
+    # Toujours le même ordre de verrouillage des lignes d'agrégat : pas d'interblocage entre workers
+    deltas = sorted(deltas, key=lambda delta: (delta["jour"], delta["metric"]))
+    statement = _upsert_statement(db.get_bind().dialect.name)
+    if statement is not None:
+        db.execute(statement, deltas)
+        return
+    # Autres bases : lecture puis mise à jour de chaque ligne d'agrégat
+    for delta in deltas:
+        existing = db.get(HistoriqueRollup, (delta["jour"], delta["metric"]))
+        if existing is None:
+            db.add(HistoriqueRollup(**delta))
+            continue
+        existing.count += delta["count"]
+        if delta["total"] is not None:
+            existing.total += delta["total"]
+            existing.total_sq += delta["total_sq"]
+            existing.minimum = min(existing.minimum, delta["minimum"])
+            existing.maximum = max(existing.maximum, delta["maximum"])
+
+
+def apply_rollup(db: Session, rows: list[dict]) -> None:
+    """Ajoute un lot de lignes d'historique aux agrégats, dans la transaction en cours (sans commit)."""
+    write_deltas(db, rollup_deltas(rows))
+
+
+# Verrou consultatif PostgreSQL du repli des agrégats (voir MAINTENANCE_LOCK_KEY dans app/db/partitions.py)
+FOLD_LOCK_KEY = 5_555_002
+ROLLUP_COLUMNS = ["date_prediction", "prediction", "probability", *INPUT_FIELDS]
+
+
+def queue_rollup(db: Session, ids: list[int]) -> None:
+    """Met des lignes d'historique en attente de repli dans les agrégats, dans la transaction en cours."""
+    if ids:
+        db.execute(insert(HistoriqueRollupPending), [{"id": id_} for id_ in ids])
+
+
+def _try_fold_lock(db: Session) -> bool:
+    # Un seul worker replie à la fois ; les autres passent leur tour au lieu d'attendre les mêmes lignes
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": FOLD_LOCK_KEY})
+
+
+def fold_pending(bind, batch_size: int = 5000) -> int:
+    """Replie les lignes en attente dans les agrégats, `batch_size` par transaction ; renvoie le nombre replié.
+
+    Les id sont réclamés par DELETE ... RETURNING dans la transaction qui écrit les agrégats : un échec les laisse
+    en attente, et deux workers ne peuvent pas compter la même ligne.
+    """
+    pending = HistoriqueRollupPending
+    columns = [getattr(Historique, name) for name in ROLLUP_COLUMNS]
+    total = 0
+    while True:
+        with Session(bind) as db:
+            if not _try_fold_lock(db):
+                return total
+            claimed = select(pending.id).order_by(pending.id).limit(batch_size)
+            ids = db.scalars(delete(pending).where(pending.id.in_(claimed)).returning(pending.id)).all()
+            if ids:
+                # Ligne déjà supprimée par la rétention : plus rien à compter
+                rows = [dict(row) for row in db.execute(select(*columns).where(Historique.id.in_(ids))).mappings()]
+                apply_rollup(db, rows)
+            db.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+
+
+def rebuild_rollup(db: Session, chunk_size: int = 10000) -> int:
+    """Recalcule tous les agrégats depuis l'historique (rattrapage après migration) : parcours complet, par blocs."""
+    db.execute(delete(HistoriqueRollup))
+    db.execute(delete(HistoriqueRollupPending))  # Les lignes en attente sont comptées par le parcours complet
+    columns = [getattr(Historique, name) for name in ROLLUP_COLUMNS]
+    result = db.execute(select(*columns).execution_options(yield_per=chunk_size))
+    total = 0
+    for partition in result.mappings().partitions():
+        rows = [dict(row) for row in partition]
+        apply_rollup(db, rows)
+        total += len(rows)
+    db.commit()
+    return total
+
+
+def read_stats(db: Session, date_from: date | None = None, date_to: date | None = None) -> dict:
+    """Statistiques de l'historique sur [date_from, date_to] (jours inclus), lues dans les seuls agrégats."""
+    query = select(HistoriqueRollup).order_by(HistoriqueRollup.jour)
+    if date_from is not None:
+        query = query.where(HistoriqueRollup.jour >= date_from)
+    if date_to is not None:
+        query = query.where(HistoriqueRollup.jour <= date_to)
+
+    daily = {}
+    histogram = [0] * PROBABILITY_BINS
+    metrics = defaultdict(lambda: {"count": 0, "total": 0.0, "total_sq": 0.0, "minimum": math.inf, "maximum": -math.inf})
+    for row in db.scalars(query):
+        if row.metric.startswith("proba_bin_"):
+            histogram[int(row.metric.rsplit("_", 1)[1])] += row.count
+            continue
+        if row.metric in ("prediction", "probability"):
+            day = daily.setdefault(row.jour, {"date": row.jour.isoformat(), "count": row.count})
+            day["churn_rate" if row.metric == "prediction" else "mean_probability"] = row.total / row.count
+        summary = metrics[row.metric]
+        summary["count"] += row.count
+        summary["total"] += row.total
+        summary["total_sq"] += row.total_sq
+        summary["minimum"] = min(summary["minimum"], row.minimum)
+        summary["maximum"] = max(summary["maximum"], row.maximum)
+
+    def describe(summary):
+        mean = summary["total"] / summary["count"]
+        variance = max(summary["total_sq"] / summary["count"] - mean * mean, 0.0)
+        return {"mean": mean, "std": math.sqrt(variance), "min": summary["minimum"], "max": summary["maximum"]}
+
+    predictions = metrics.get("prediction")
+    return {
+        "total": predictions["count"] if predictions else 0,
+        "churn_rate": predictions["total"] / predictions["count"] if predictions else None,
+        "daily": list(daily.values()),
+        "probability_histogram": [
+            {"bin": f"{i / PROBABILITY_BINS:.1f}-{(i + 1) / PROBABILITY_BINS:.1f}", "count": count}
+            for i, count in enumerate(histogram)
+        ],
+        "features": {metric: describe(metrics[metric]) for metric in INPUT_FIELDS if metric in metrics},
+    }
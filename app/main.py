@@ -1,26 +1,136 @@
-from fastapi import FastAPI, HTTPException, Depends, status
-from fastapi.responses import HTMLResponse
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from pydantic import BaseModel, Field
-from typing import Literal # Pour forcer "Oui" ou "Non"
-import joblib
-import pandas as pd
+from fastapi import FastAPI, HTTPException, Depends, Query, Response, BackgroundTasks, Body, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPBearer, HTTPAuthorizationCredentials
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing import Any, Literal # Pour forcer "Oui" ou "Non"
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import itertools
+import logging
+import math
 import os
+import threading
+import numpy as np
 
 # --- IMPORTS POUR LA BASE DE DONNÉES ---
+from sqlalchemy import exc as sa_exc, select
 from sqlalchemy.orm import Session
-from app.db.database import get_db, engine, Base  # engine et Base pour create_all
-from app.db.models import Historique, User
-from app.core.security import verify_password
+from starlette.concurrency import run_in_threadpool
+from app.db.database import (
+    get_db, get_async_db, get_async_engine, run_db, engine, SessionLocal, db_latency, ping, ping_async, pool_status,
+)
+from app.db.models import User
+from app.db.schema import ensure_schema
+from app.db.partitions import maintain_history
+from app.db.archive import archive_dir, archive_history, archive_summary, archived_before_month, read_manifest, stream_archive_csv, stream_archive_ndjson
+from app.db.history_sink import history_sink
+from app.db.history import history_page, insert_history, stream_history_csv, stream_history_ndjson
+from app.db.stats import fold_pending, read_stats
+from app.core.security import verify_password, credential_cache, create_access_token, verify_access_token
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, observe_stage, registry
+from app.core.admission import AdmissionMiddleware, admission_stats, concurrency_limiter
+from app.ml.features import INPUT_FIELDS, build_feature_matrix, scenario_matrix
+from app.ml.batcher import MicroBatcher
+from app.ml.drift import DriftMonitor
+from app.ml.explain import describe as describe_contributions
+from app.ml.loader import ModelLoader
+from app.ml.model_store import process_memory
+from app.ml.registry import ModelRegistry
+from app.ml.prediction_cache import PredictionCache, model_file_version
 from contextlib import asynccontextmanager
 
+logger = logging.getLogger(__name__)
+
 # Gestionnaire de cycle de vie (Lifespan)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Au démarrage : Crée les tables si elles n'existent pas
-    # C'est l'équivalent de "alembic upgrade head", mais automatique !
-    Base.metadata.create_all(bind=engine)
+    # C'est l'équivalent de "alembic upgrade head", mais automatique ! (sauté si la version du schéma est à jour)
+    ensure_schema(engine)
+    # Partitions des mois à venir et rétention de l'historique, puis un passage par intervalle. Un échec n'empêche
+    # pas le démarrage : la partition par défaut reçoit les écritures, le passage suivant réessaiera
+    try:
+        await run_in_threadpool(run_history_maintenance)
+    except Exception:
+        logger.exception("Échec de la maintenance de l'historique au démarrage")
+    maintenance = (
+        asyncio.create_task(history_maintenance(settings.HISTORY_MAINTENANCE_INTERVAL))
+        if settings.HISTORY_MAINTENANCE_INTERVAL > 0 else None
+    )
+    # Chargement du modèle : bloquant par défaut, en tâche de fond en mode démarrage rapide (voir /ready)
+    if settings.MODEL_BACKGROUND_LOAD:
+        model_loader.start_background()
+    else:
+        await run_in_threadpool(model_loader.load)
+    # Rechargement à chaud : un nouveau model.joblib est chargé, validé et activé sans redémarrer le worker
+    watcher = asyncio.create_task(model_loader.watch(settings.MODEL_WATCH_INTERVAL)) if settings.MODEL_WATCH_INTERVAL > 0 else None
+    global inference_executor, inference_batcher
+    inference_executor = ThreadPoolExecutor(max_workers=settings.INFERENCE_THREADS, thread_name_prefix="inference")
+    # Micro-lots : démarrés une fois le modèle prêt (tout de suite en mode bloquant, plus tard en tâche de fond)
+    batcher_start = None
+    if settings.INFERENCE_BATCHING:
+        if settings.MODEL_BACKGROUND_LOAD:
+            batcher_start = asyncio.create_task(start_batcher())
+        else:
+            await start_batcher()
+    # Référence de dérive : préparée en tâche de fond une fois le modèle prêt
+    drift_start = asyncio.create_task(prepare_drift()) if settings.DRIFT_ENABLED else None
+    # Écriture différée de l'historique : tâche de fond, vidée à l'arrêt
+    if settings.HISTORY_WRITE_BEHIND:
+        await history_sink.start()
+    # Agrégats de /stats des écritures unitaires : repliés une fois par intervalle, pas à chaque requête
+    rollup_flusher = asyncio.create_task(rollup_flush(settings.STATS_ROLLUP_INTERVAL)) if settings.STATS_ROLLUP_ENABLED else None
     yield
+    if maintenance is not None:
+        maintenance.cancel()
+    if watcher is not None:
+        watcher.cancel()
+    if batcher_start is not None:
+        batcher_start.cancel()
+    if drift_start is not None:
+        drift_start.cancel()
+    if inference_batcher is not None:
+        await inference_batcher.stop()
+        inference_batcher = None
+    if settings.HISTORY_WRITE_BEHIND:
+        await history_sink.stop()
+    if rollup_flusher is not None:
+        rollup_flusher.cancel()
+        await run_in_threadpool(run_rollup_flush)
+    inference_executor.shutdown(wait=True)
+    inference_executor = None
+
+def run_history_maintenance():
+    retention, keep_from = settings.HISTORY_RETENTION_MONTHS, None
+    # L'archive passe avant la rétention, qui ne supprime que des mois déjà copiés en Parquet
+    if settings.ARCHIVE_ENABLED:
+        archive_history(engine, archive_dir(), settings.ARCHIVE_AFTER_MONTHS, settings.ARCHIVE_DELETE)
+        keep_from = archived_before_month(read_manifest(archive_dir()))
+        if keep_from is None:
+            retention = 0  # Rien d'archivé : rien à supprimer
+    return maintain_history(engine, settings.HISTORY_PARTITIONS_AHEAD, retention, keep_from)
+
+async def history_maintenance(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(run_history_maintenance)
+        except Exception:
+            logger.exception("Échec de la maintenance de l'historique")
+
+def run_rollup_flush():
+    try:
+        fold_pending(engine)
+    except Exception:
+        logger.exception("Échec d'écriture des agrégats de /stats, nouvel essai au prochain passage")
+
+async def rollup_flush(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(run_rollup_flush)
 
 # Initialisation de l'application
 app = FastAPI(
@@ -29,6 +139,31 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan
 )
+# Limite de débit par utilisateur et concurrence bornée, avant l'authentification (voir app/core/admission.py)
+app.add_middleware(AdmissionMiddleware)
+# Durée et statut de chaque requête, profilage échantillonné (voir app/core/metrics.py) ; compte aussi les refus d'admission
+app.add_middleware(MetricsMiddleware)
+
+# Pool saturé (aucune connexion libre avant DB_POOL_TIMEOUT) ou base injoignable : 503 explicite, jamais d'attente sans fin
+@app.exception_handler(sa_exc.TimeoutError)
+async def pool_exhausted(request, exc):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Base de données saturée, réessayez dans un instant."},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(sa_exc.OperationalError)
+async def database_unavailable(request, exc):
+    # 503 seulement pour une base injoignable : connexion perdue (reconnue par le pilote, connection_invalidated)
+    # ou refusée à l'ouverture (aucune requête envoyée). Verrou, table absente... restent des erreurs 500
+    if not (exc.connection_invalidated or exc.statement is None):
+        raise exc
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Base de données indisponible."},
+        headers={"Retry-After": "5"},
+    )
 
 class EmployeeInput(BaseModel): # ge greater than or equal to, le less than or equal to, et ... ou ellipsis est interprété par pydantic comme un champ requis
     age: int = Field(..., ge=18, le=70, description="L'âge doit être entre 18 et 70 ans")
@@ -53,107 +188,620 @@ class EmployeeInput(BaseModel): # ge greater than or equal to, le less than or e
 
     exp_totale: float = Field(..., ge=0, description="Expérience totale")
 
-# sécurité
-security = HTTPBasic()
+# Session de base de données injectée dans les routes : synchrone par défaut, asynchrone avec DB_ASYNC=true
+# (avec une session synchrone, les requêtes SQL passent par run_db dans le threadpool)
+get_session = get_async_db if settings.DB_ASYNC else get_db
+
+# Exécuteur dédié à l'inférence, créé par le lifespan : le calcul du modèle ne bloque jamais la boucle d'événements
+inference_executor = None
+
+async def run_inference(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, fn, *args)
+
+# Regroupement des /predict concurrents en micro-lots (INFERENCE_BATCHING), créé par le lifespan
+inference_batcher = None
+
+async def start_batcher():
+    global inference_batcher
+    await asyncio.to_thread(model_loader.wait)
+    current = model_registry.active()
+    if current is None:
+        return
+    batcher = MicroBatcher(
+        settings.INFERENCE_BATCH_MAX_SIZE, settings.INFERENCE_BATCH_MAX_WAIT_MS, settings.INFERENCE_PROCESSES,
+        settings.SCORER_ENABLED, settings.SCORER_PATH, settings.MODEL_MMAP,
+    )
+    await batcher.start(current, inference_executor)
+    inference_batcher = batcher
+
+# Dérive des entrées et des scores servis par rapport à l'entraînement (voir app/ml/drift.py)
+drift_monitor = DriftMonitor(settings.DRIFT_BINS, settings.DRIFT_WINDOW_SECONDS, settings.DRIFT_WINDOW_SLOTS)
+
+async def prepare_drift():
+    await asyncio.to_thread(model_loader.wait)
+    current = model_registry.active()
+    if current is not None:
+        await asyncio.to_thread(drift_monitor.prepare, current.engine)
+
+def check_explainer(current):
+    # Explications possibles seulement si le modèle a un score compilé (régression logistique ou arbres)
+    if current.engine.explainer is None:
+        raise HTTPException(status_code=501, detail="Explications indisponibles pour ce modèle.")
+
+async def score_one(current, employee):
+    """Prédit un employé : via les micro-lots s'ils servent cette version du modèle, sinon directement."""
+    batcher = inference_batcher
+    if batcher is not None:
+        if batcher.version == current.version:
+            return await batcher.submit(employee)
+        batcher.follow(current)  # Nouvelle version activée : les micro-lots la chargent en tâche de fond
+    return await run_inference(current.engine.predict_one, employee)
+
+# sécurité : Basic Auth classique, ou jeton signé obtenu via /token
+security = HTTPBasic(auto_error=False)
+bearer = HTTPBearer(auto_error=False)
+
+def _unauthorized(detail: str):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Basic"},
+    )
+
+def _find_user(db: Session, username: str):
+    hashed_password = db.scalar(select(User.hashed_password).where(User.username == username))
+    # Fin de la transaction de lecture : la connexion retourne au pool au lieu d'être gardée pendant bcrypt et le modèle
+    db.rollback()
+    return hashed_password
 
 # fonction de sécurité
-def get_current_username(
-    credentials: HTTPBasicCredentials = Depends(security),
-    db: Session = Depends(get_db)  # On injecte la dépendance DB
+async def get_current_username(
+    credentials: HTTPBasicCredentials | None = Depends(security),
+    token: HTTPAuthorizationCredentials | None = Depends(bearer),
+    db: Session = Depends(get_session)  # On injecte la dépendance DB (la session n'ouvre de connexion qu'à la première requête)
 ):
+    with observe_stage("auth"):
+        return await _authenticate(credentials, token, db)
+
+async def _authenticate(credentials, token, db):
+    # Mode jeton : une simple vérification HMAC, ni bcrypt ni base de données
+    if token is not None and settings.AUTH_TOKEN_ENABLED:
+        username = verify_access_token(token.credentials)
+        if username is None:
+            raise _unauthorized("Jeton invalide ou expiré")
+        return username
+
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+
+    # Identifiants déjà validés récemment : on saute la requête SQL et bcrypt
+    if credential_cache.contains(credentials.username, credentials.password):
+        return credentials.username
+
     # On cherche l'utilisateur dans la base de données
-    user = db.query(User).filter(User.username == credentials.username).first()
+    hashed_password = await run_db(db, _find_user, credentials.username)
 
-    # Si l'utilisateur n'existe pas OU si le mot de passe ne matche pas le hash
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    # Si l'utilisateur n'existe pas OU si le mot de passe ne matche pas le hash (bcrypt hors de la boucle d'événements)
+    if not hashed_password or not await run_in_threadpool(verify_password, credentials.password, hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Identifiant ou mot de passe incorrect",
         )
+    credential_cache.add(credentials.username, credentials.password)
     return credentials.username
 
-# Chargement du modèle
+async def get_basic_username(
+    credentials: HTTPBasicCredentials | None = Depends(security),
+    db: Session = Depends(get_session)
+):
+    """Identifiants Basic uniquement : un jeton ne permet jamais d'en obtenir un autre (il finirait par ne plus expirer)."""
+    with observe_stage("auth"):
+        return await _authenticate(credentials, None, db)
+
+# Route pour obtenir un jeton : on s'authentifie une fois en Basic, puis "Authorization: Bearer <jeton>"
+@app.post("/token")
+def issue_token(username: str = Depends(get_basic_username)):
+    if not settings.AUTH_TOKEN_ENABLED:
+        raise HTTPException(status_code=404, detail="Le mode jeton est désactivé.")
+    return {
+        "access_token": create_access_token(username),
+        "token_type": "bearer",
+        "expires_in": settings.AUTH_TOKEN_TTL,
+    }
+
+# Chargement du modèle : plus à l'import du module (joblib, scikit-learn et pandas coûtaient plusieurs secondes),
+# mais au démarrage via le lifespan, ou en tâche de fond avec MODEL_BACKGROUND_LOAD
 model_path = os.path.join(os.path.dirname(__file__), "../Data/model/model.joblib")
-try:
-    model = joblib.load(model_path)
-except FileNotFoundError:
-    model = None
-    print("Modèle non trouvé")
+features_path = os.path.join(os.path.dirname(__file__), "../Data/model/features.joblib")
+model_dir = os.path.dirname(model_path)
+# Registre : plusieurs versions en mémoire, la version active est remplacée d'un bloc (voir app/ml/registry.py)
+model_registry = ModelRegistry(settings.MODEL_REGISTRY_SIZE)
+model_loader = ModelLoader(
+    model_path, features_path, settings.SCORER_ENABLED, settings.SCORER_PATH, model_registry, settings.MODEL_MMAP
+)
+
+def get_model():
+    """Version active du modèle, sinon 503 pendant le chargement et 500 si le modèle est absent."""
+    if model_loader.state in ("pending", "loading"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Le modèle est en cours de chargement.",
+            headers={"Retry-After": "1"},
+        )
+    current = model_registry.active() # Lue une seule fois : une bascule en cours de requête n'a pas d'effet sur elle
+    if current is None:
+        raise HTTPException(status_code=500, detail="Le modèle n'est pas chargé.") # Le code 500 signifie qu'il y a eu une erreur, c'est normalisé
+    return current
+
+@app.get("/ready")
+def ready(response: Response): # Sonde de disponibilité : 200 quand le modèle est chargé, 503 sinon
+    if not model_loader.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": model_loader.state, "load_seconds": model_loader.load_seconds, "memory": model_loader.memory}
+
+@app.get("/health")
+async def health(response: Response): # État de la base : pool de connexions, latence des dernières requêtes SQL, ping
+    # Avec DB_ASYNC=true, les routes passent par l'engine asynchrone : c'est son pool qu'on décrit et qu'on sonde
+    bind = get_async_engine() if settings.DB_ASYNC else engine
+    pool = pool_status(bind)
+    database = {"pool": pool, "latency": db_latency.summary()}
+    if pool.get("checked_out", 0) >= pool.get("capacity", float("inf")):
+        # Toutes les connexions sont prises : on le dit sans attendre une connexion libre
+        state = "saturated"
+    else:
+        try:
+            database["ping_ms"] = await ping_async(bind) if settings.DB_ASYNC else await run_in_threadpool(ping, bind)
+            state = "ok"
+        except sa_exc.SQLAlchemyError:
+            state = "unavailable"
+    if state != "ok":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": state, "model": model_loader.state, "database": database, "admission": admission_stats()}
+
+# Cache des prédictions, vidé automatiquement si le fichier modèle change
+prediction_cache = PredictionCache(settings.PREDICTION_CACHE_SIZE, settings.PREDICTION_CACHE_TTL, model_path)
+
+def _insert_history(db: Session, rows: list[dict]):
+    # Agrégats de /stats hors des lignes partagées : la requête n'inscrit que ses id en attente, repliés par rollup_flush
+    insert_history(db, rows, defer_rollup=True)
+    db.commit()
+
+async def save_history(db, rows: list[dict]):
+    """Historise des prédictions : file d'écriture différée si activée, sinon insertion groupée immédiate."""
+    if settings.HISTORY_WRITE_BEHIND:
+        await history_sink.submit(rows)
+        return
+    await run_db(db, _insert_history, rows)
 
 # Route pour la prédiction
 @app.post("/predict") # Le @ signifie que c'est une route, post est la méthode HTTP utilisée, ici l'envoi de données
-def predict_churn( # le post défini juste au dessus défini l'URL et la méthode HTTP, ici /predict et POST
+async def predict_churn( # le post défini juste au dessus défini l'URL et la méthode HTTP, ici /predict et POST
     data: EmployeeInput, # On définit les données attendues avec pydantic
-    db: Session = Depends(get_db), # On injecte la dépendance DB
+    background_tasks: BackgroundTasks, # Scoring fantôme après l'envoi de la réponse
+    explain: bool = Query(False, description="Ajouter la contribution de chaque feature"),
+    db: Session = Depends(get_session), # On injecte la dépendance DB
     username: str = Depends(get_current_username) # On injecte la dépendance de sécurité
     ):  # on rajoute un paramètre pour se connecter à la base de données
     # Vérification que le modèle est bien là
-    if model is None:
-        raise HTTPException(status_code=500, detail="Le modèle n'est pas chargé.") # Le code 500 signifie qu'il y a eu une erreur, c'est normalisé
-
-    # Feature Engineering
-    hp_sup = 1 if data.heures_supp == "Oui" else 0 # 1 si Oui, 0 si Non pour rappel
+    current = get_model()
+    if explain:
+        check_explainer(current)
+
+    # Profil déjà scoré récemment avec ce modèle : on renvoie directement le résultat en cache
+    with observe_stage("cache_lookup"):
+        cached = prediction_cache.get(data, current.version)
+    if cached is not None:
+        prediction, probability = cached
+    else:
+        # Feature Engineering + Prédiction : la ligne de features est remplie dans un tampon NumPy réutilisé,
+        # le DataFrame pandas ne sert plus que de secours pour les modèles qui exigent les noms de colonnes
+        prediction, probability = await score_one(current, data) # 0, peu de risque de départ, 1, risque élevé
+        prediction_cache.put(data, prediction, probability, current.version)
+    drift_monitor.observe(data, probability) # Quelques incréments d'histogramme, sans rien conserver de la requête
+
+    # Modèle candidat en fantôme sur une part du trafic : comparé au résultat servi, sans effet sur la réponse
+    shadow = model_registry.sample_shadow()
+    if shadow is not None:
+        background_tasks.add_task(model_registry.score_shadow, shadow, data, prediction, probability)
 
-    # Attention aux divisions par zéro
-    anciennete = data.anciennete if data.anciennete > 0 else 1 # On évite les divisions par zéro
-    ratio_stagnation = data.poste_actuel / anciennete
+    # On ajoute la prédiction et la probabilité dans la base de données
+    # Les champs sont les mêmes que dans le modèle, plus la prédiction et la probabilité en sortie
+    if cached is None or settings.PREDICTION_CACHE_WRITE_HISTORY:
+        with observe_stage("history"):
+            await save_history(db, [{
+                **data.model_dump(),
+                "prediction": int(prediction),
+                "probability": float(probability),
+                "model_version": current.version,
+            }])
 
-    exp_totale = data.exp_totale if data.exp_totale > 0 else 1 # On évite les divisions par zéro
-    revenu_par_exp = data.revenu_mensuel / exp_totale
+    # Réponse simple pour commencer
+    response = {
+        "prediction": int(prediction), # 0 ou 1
+        "probability": float(probability),
+        "message": "Risque de départ élevé" if prediction == 1 else "Employé stable"
+    }
+    if explain:
+        # Contributions préparées au chargement du modèle : quelques microsecondes, même sur un résultat en cache
+        with observe_stage("explain"):
+            response.update(describe_contributions(current.engine.explainer, current.engine.explain_one(data)))
+    return response
 
-    # Création du DataFrame pour le modèle, on respecte les noms des colonnes attendus par le modèle
-    input_df = pd.DataFrame([{
-        'revenu_mensuel': data.revenu_mensuel,
-        'age': data.age,
-        'distance_domicile_travail': data.distance_domicile_travail,
-        'satisfaction_employee_environnement': data.satisfaction_environnement,
-        'heure_supplementaires': hp_sup,
-        'annees_depuis_la_derniere_promotion': data.annees_promo,
-        'satisfaction_employee_equilibre_pro_perso': data.satisfaction_equilibre,
-        'nombre_participation_pee': data.pee,
-        'ratio_stagnation': ratio_stagnation,
-        'revenu_par_annee_exp': revenu_par_exp
-    }])
+employee_list = TypeAdapter(list[EmployeeInput])
 
-    # Prédiction
-    prediction = model.predict(input_df)[0] # 0, peu de risque de départ, 1, risque élevé
-    probability = 0.0
-    if hasattr(model, "predict_proba"): # Au cas où j'essaye un autre modèle plus tard, ce que je ne ferai sans doute pas
-        probability = model.predict_proba(input_df)[0][1] # On regarde le premier résultat de la liste, il y en a qu'un de toute façon, et on récupère la probabilité, qui est la deuxième valeur [1]
+def batch_employees(data: list[Any] = Body(...)) -> list[EmployeeInput]:
+    """Corps de /predict/batch : taille du lot vérifiée avant de construire le moindre EmployeeInput."""
+    if len(data) > settings.PREDICT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Lot trop volumineux : {settings.PREDICT_BATCH_MAX_SIZE} employés maximum par appel.",
+        )
+    try:
+        return employee_list.validate_python(data)
+    except ValidationError as error:
+        # Même réponse 422 que la validation automatique de FastAPI
+        raise RequestValidationError([{**e, "loc": ("body", *e["loc"])} for e in error.errors(include_url=False)])
+
+# Route pour la prédiction par lot (jobs RH nocturnes)
+@app.post("/predict/batch", openapi_extra={"requestBody": {"content": {"application/json": {"schema": {
+    "type": "array", "items": {"$ref": "#/components/schemas/EmployeeInput"}, "title": "Data",
+}}}}})
+async def predict_churn_batch(
+    data: list[EmployeeInput] = Depends(batch_employees), # Une liste d'employés, même format que /predict
+    explain: bool = Query(False, description="Ajouter la contribution de chaque feature"),
+    db: Session = Depends(get_session),
+    username: str = Depends(get_current_username)
+    ):
+    current = get_model()
+    if explain:
+        check_explainer(current)
+
+    if not data:
+        return []
+
+    # Feature Engineering vectorisé sur tout le lot, puis un seul appel au modèle
+    def score_batch():
+        with observe_stage("batch_feature_engineering"):
+            matrix = build_feature_matrix(data)
+        with observe_stage("batch_inference"):
+            predictions, probabilities = current.engine.predict(matrix)
+        drift_monitor.observe_batch(matrix, probabilities)
+        # Contributions de tout le lot en une opération vectorisée
+        with observe_stage("batch_explain"):
+            contributions = current.engine.explain(matrix) if explain else None
+        return predictions, probabilities, contributions
+    predictions, probabilities, contributions = await run_inference(score_batch)
+
+    # Insertion groupée de tout l'historique en une seule requête
+    rows = [
+        {
+            **employee.model_dump(),
+            "prediction": int(prediction),
+            "probability": float(probability),
+            "model_version": current.version,
+        }
+        for employee, prediction, probability in zip(data, predictions, probabilities)
+    ]
+    with observe_stage("batch_history"):
+        await save_history(db, rows)
+
+    results = [
+        {
+            "prediction": row["prediction"],
+            "probability": row["probability"],
+            "message": "Risque de départ élevé" if row["prediction"] == 1 else "Employé stable"
+        }
+        for row in rows
+    ]
+    if contributions is not None:
+        for result, row_contributions in zip(results, contributions):
+            result.update(describe_contributions(current.engine.explainer, row_contributions))
+    return results
+
+class WhatIfRequest(BaseModel):
+    employee: EmployeeInput
+    variations: dict[str, list[float | Literal["Oui", "Non"]]] = Field(
+        ..., description="Valeurs à essayer par champ, par ex. {\"revenu_mensuel\": [3000, 3500], \"heures_supp\": [\"Non\"]}"
+    )
 
+# Route de simulation : combien le risque baisse si on change le salaire, les heures sup., la promotion...
+@app.post("/predict/whatif")
+async def predict_what_if(
+    request: WhatIfRequest,
+    username: str = Depends(get_current_username)
+    ):
+    current = get_model()
+    base = request.employee.model_dump()
+    for field, values in request.variations.items():
+        if field not in INPUT_FIELDS:
+            raise HTTPException(status_code=422, detail=f"Champ inconnu : {field}")
+        if not values:
+            raise HTTPException(status_code=422, detail=f"Aucune valeur pour {field}")
+    # Taille de la grille vérifiée avant de valider la moindre valeur : un appel démesuré est refusé tout de suite
+    shape = [len(values) for values in request.variations.values()]
+    if math.prod(shape) > settings.WHATIF_MAX_SCENARIOS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Trop de scénarios : {settings.WHATIF_MAX_SCENARIOS} maximum par appel.",
+        )
+    variations = {}
+    for field, values in request.variations.items():
+        # Mêmes contraintes que /predict, vérifiées une fois par valeur et non par scénario
+        try:
+            variations[field] = [getattr(EmployeeInput.model_validate({**base, field: value}), field) for value in values]
+        except ValidationError as error:
+            raise HTTPException(status_code=422, detail=f"Valeur invalide pour {field} : {error.errors()[0]['msg']}")
+
+    # Toute la grille en une passe de feature engineering, plus l'employé tel quel en première ligne,
+    # puis un seul appel au modèle. Rien n'est historisé : ce sont des hypothèses, pas des prédictions servies
+    def score_scenarios():
+        with observe_stage("whatif_feature_engineering"):
+            matrix = np.vstack([build_feature_matrix([request.employee]), scenario_matrix(request.employee, variations)])
+        with observe_stage("whatif_inference"):
+            return current.engine.predict(matrix)
+    _, probabilities = await run_inference(score_scenarios)
+
+    surface = probabilities[1:]
+    best = int(np.argmin(surface))
+    best_values = np.unravel_index(best, shape) if shape else ()
+    return {
+        "probability": float(probabilities[0]),
+        "variations": variations,
+        "shape": shape,
+        "probabilities": surface.reshape(shape).tolist(),
+        "lowest": {
+            "probability": float(surface[best]),
+            "values": {field: variations[field][i] for field, i in zip(variations, best_values)},
+        },
+        "model_version": current.version,
+    }
 
+def _model_info():
+    current = model_registry.active()
+    if current is None:
+        return prediction_cache.model_version, model_loader.state
+    return current.version, current.engine.backend
+
+def _drift_metrics():
+    report = drift_monitor.report()
+    if not report["ready"]:
+        return {}
+    return {**report["features"], "probability": report["probability"]}
+
+# Jauges lues à chaque scrape : version du modèle, pool de connexions, files d'attente, cache
+registry.gauge(
+    "churn_model_info", "Modèle chargé (version = signature du fichier, backend = chemin d'inférence)",
+    ["version", "backend"],
+    lambda: {_model_info(): 1},
+)
+registry.gauge(
+    "churn_microbatch", "Micro-lots : lots scorés, lignes scorées et requêtes en attente", ["metric"],
+    lambda: {
+        ("batches",): inference_batcher.batches if inference_batcher else 0,
+        ("rows",): inference_batcher.rows if inference_batcher else 0,
+        ("pending",): inference_batcher.pending if inference_batcher else 0,
+    },
+)
+registry.gauge(
+    "churn_shadow_predictions", "Scoring fantôme : prédictions comparées, concordantes et en erreur", ["outcome"],
+    lambda: {
+        ("scored",): model_registry.shadow_stats["scored"],
+        ("agree",): model_registry.shadow_stats["agree"],
+        ("errors",): model_registry.shadow_stats["errors"],
+    },
+)
+registry.gauge(
+    "churn_drift_psi", "PSI de chaque feature et de la probabilité sur la fenêtre glissante", ["feature"],
+    lambda: {(name,): value["psi"] for name, value in _drift_metrics().items() if value["psi"] is not None},
+)
+registry.gauge(
+    "churn_process_memory_bytes", "Mémoire du worker (pss = part des pages partagées, dont le modèle en mmap)", ["kind"],
+    lambda: {(kind,): value for kind, value in process_memory().items()},
+)
+registry.gauge(
+    "churn_db_pool_connections", "Connexions du pool SQLAlchemy par état", ["state"],
+    lambda: {
+        ("checked_out",): engine.pool.checkedout(),
+        ("checked_in",): engine.pool.checkedin(),
+        ("overflow",): engine.pool.overflow(),
+        ("size",): engine.pool.size(),
+    },
+)
+registry.gauge(
+    "churn_db_latency_ms", "Latence des dernières requêtes SQL (allers-retours avec la base)", ["quantile"],
+    lambda: {(key[:-3],): value for key, value in db_latency.summary().items() if key.endswith("_ms")},
+)
+registry.gauge(
+    "churn_queue_depth", "Profondeur des files d'attente internes", ["queue"],
+    lambda: {("history",): history_sink.qsize(), ("admission",): concurrency_limiter.queued},
+)
+registry.gauge(
+    "churn_admission_active", "Requêtes en cours de traitement après le contrôle d'admission",
+    callback=lambda: {(): concurrency_limiter.active},
+)
+registry.gauge(
+    "churn_history_sink_rows", "Lignes traitées par l'écriture différée de l'historique", ["outcome"],
+    lambda: {
+        ("written",): history_sink.written, ("dropped",): history_sink.dropped,
+        ("spilled",): history_sink.spilled, ("replayed",): history_sink.replayed,
+    },
+)
+registry.gauge(
+    "churn_prediction_cache", "Cache des prédictions : taille et compteurs", ["metric"],
+    lambda: {(key,): value for key, value in prediction_cache.stats().items() if key != "model_version"},
+)
 
-    # On ajoute la prédiction et la probabilité dans la base de données
-    historique = Historique(
-        # Les champs sont les mêmes que dans le modèle
-        age=data.age,
-        revenu_mensuel=data.revenu_mensuel,
-        distance_domicile_travail=data.distance_domicile_travail,
-        satisfaction_environnement=data.satisfaction_environnement,
-        heures_supp=data.heures_supp,
-        annees_promo=data.annees_promo,
-        satisfaction_equilibre=data.satisfaction_equilibre,
-        pee=data.pee,
-        poste_actuel=data.poste_actuel,
-        anciennete=data.anciennete,
-        exp_totale=data.exp_totale,
-        # Les 2 champs restants sont les prédictions et la probabilité en sortie
-        prediction=int(prediction),
-        probability=float(probability)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métriques désactivées.")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+def get_cache_stats(): # Compteurs du cache de prédictions (succès, échecs, évictions)
+    return prediction_cache.stats()
+
+class ModelLoadRequest(BaseModel):
+    path: str = Field(..., description="Fichier joblib, relatif à Data/model")
+    version: str | None = Field(None, description="Nom de la version (défaut : signature du fichier)")
+    activate: bool = Field(False, description="Activer la version dès qu'elle est chargée et validée")
+    shadow_rate: float | None = Field(None, ge=0, le=1, description="Scorer ce modèle en fantôme sur cette part du trafic")
+
+class ShadowRequest(BaseModel):
+    version: str
+    rate: float = Field(..., ge=0, le=1)
+
+def _model_file(path: str) -> str:
+    # Seuls les fichiers du dossier des modèles peuvent être chargés
+    full_path = os.path.realpath(os.path.join(model_dir, path))
+    if os.path.commonpath([full_path, os.path.realpath(model_dir)]) != os.path.realpath(model_dir):
+        raise HTTPException(status_code=400, detail="Le modèle doit se trouver dans Data/model.")
+    if not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="Fichier modèle introuvable.")
+    return full_path
+
+@app.get("/models")
+def list_models(username: str = Depends(get_current_username)): # Versions en mémoire, version active et fantôme
+    return model_registry.describe()
+
+@app.post("/models/load", status_code=status.HTTP_202_ACCEPTED)
+def load_model(request: ModelLoadRequest, username: str = Depends(get_current_username)):
+    # Chargement et validation en tâche de fond : les requêtes continuent sur la version active
+    full_path = _model_file(request.path)
+    version = request.version or model_file_version(full_path)
+    thread = model_registry.load_background(
+        full_path, features_path, version, request.activate,
+        scorer_enabled=settings.SCORER_ENABLED, mmap=settings.MODEL_MMAP,
     )
-    db.add(historique)
-    db.commit()
+    if request.shadow_rate is not None:
+        def enable_shadow():
+            thread.join()
+            if version not in model_registry.loading:
+                model_registry.set_shadow(version, request.shadow_rate)
+        threading.Thread(target=enable_shadow, daemon=True).start()
+    return {"version": version, "status": "loading"}
+
+@app.post("/models/{version}/activate")
+def activate_model(version: str, username: str = Depends(get_current_username)):
+    try:
+        model_registry.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Version inconnue ou pas encore chargée.")
+    return model_registry.describe()
+
+@app.put("/models/shadow")
+def set_shadow_model(request: ShadowRequest, username: str = Depends(get_current_username)):
+    try:
+        model_registry.set_shadow(request.version, request.rate)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Version inconnue ou pas encore chargée.")
+    return model_registry.describe()
+
+@app.delete("/models/shadow")
+def clear_shadow_model(username: str = Depends(get_current_username)):
+    model_registry.clear_shadow()
+    return model_registry.describe()
+
+@app.get("/stats")
+async def get_stats( # Statistiques de l'historique lues dans les agrégats : même coût quelle que soit la taille de la table
+    db: Session = Depends(get_session),
+    date_from: date | None = Query(None, description="Premier jour inclus"),
+    date_to: date | None = Query(None, description="Dernier jour inclus"),
+):
+    return await run_db(db, read_stats, date_from, date_to)
 
-    # Réponse simple pour commencer
-    return {
-        "prediction": int(prediction), # 0 ou 1
-        "probability": float(probability),
-        "message": "Risque de départ élevé" if prediction == 1 else "Employé stable"
-    }
+@app.get("/drift")
+def get_drift(): # PSI et KS par feature et pour la probabilité, sur les prédictions récentes de ce worker
+    if not settings.DRIFT_ENABLED:
+        raise HTTPException(status_code=404, detail="Suivi de dérive désactivé.")
+    return drift_monitor.report()
 
 @app.get("/history")
-def get_history(db: Session = Depends(get_db), limit: int = 10): # Je voulais consulter les prédicitions faite dans la base de données
-    return db.query(Historique).order_by(Historique.date_prediction.desc()).limit(limit).all()
+async def get_history( # Je voulais consulter les prédicitions faite dans la base de données
+    response: Response,
+    db: Session = Depends(get_session),
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: str | None = Query(None, description="Curseur X-Next-Cursor renvoyé par la page précédente"),
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    prediction: int | None = Query(None, ge=0, le=1),
+):
+    try:
+        rows, next_cursor = await run_db(
+            db, history_page, limit, cursor, date_from=date_from, date_to=date_to, prediction=prediction
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide.")
+    # La liste reste la réponse, le curseur de la page suivante passe dans un en-tête
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+@app.get("/history/export")
+def export_history( # Export complet en flux, la mémoire reste constante quelle que soit la taille
+    format: Literal["ndjson", "csv"] = "ndjson",
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    prediction: int | None = Query(None, ge=0, le=1),
+    username: str = Depends(get_current_username),
+):
+    stream = stream_history_csv if format == "csv" else stream_history_ndjson
+
+    # La session doit vivre aussi longtemps que le flux : on l'ouvre dans le générateur
+    def generate():
+        with SessionLocal() as db:
+            yield from stream(db, date_from=date_from, date_to=date_to, prediction=prediction)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=historique.{format}"},
+    )
+
+# Archive Parquet : analyses sur des mois d'historique sans requête sur la base
+@app.get("/archive")
+def get_archive(): # Mois archivés, lignes et taille des fichiers
+    return read_manifest(archive_dir())
+
+@app.get("/archive/stats")
+def get_archive_stats( # Lit seulement les mois demandés et trois colonnes de l'archive
+    group_by: Literal["month", "day", "model_version"] = "month",
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    prediction: int | None = Query(None, ge=0, le=1),
+    model_version: str | None = None,
+):
+    return archive_summary(
+        archive_dir(), group_by, date_from=date_from, date_to=date_to, prediction=prediction, model_version=model_version
+    )
+
+@app.get("/archive/export")
+def export_archive( # Export en flux des colonnes demandées, lot par lot
+    format: Literal["ndjson", "csv"] = "ndjson",
+    columns: str | None = Query(None, description="Colonnes séparées par des virgules (toutes par défaut)"),
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    prediction: int | None = Query(None, ge=0, le=1),
+    model_version: str | None = None,
+    username: str = Depends(get_current_username),
+):
+    selected = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
+    stream = stream_archive_csv if format == "csv" else stream_archive_ndjson
+    chunks = stream(
+        archive_dir(), selected, date_from=date_from, date_to=date_to, prediction=prediction, model_version=model_version
+    )
+    try:
+        # Premier lot lu tout de suite : une colonne inconnue donne une 400 plutôt qu'un flux interrompu
+        first = next(chunks, "")
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        itertools.chain([first], chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=archive.{format}"},
+    )
 
 # Page d'accueil avec choix de la documentation
 
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.core.metrics import observe_stage
+from app.ml.features import FEATURE_COLUMNS, fill_feature_row
+
+logger = logging.getLogger(__name__)
+
+# Moteur d'inférence propre à chaque processus du pool, chargé une fois par _init_worker
+_worker_engine = None
+
+
+def _init_worker(model_path: str, features_path: str, scorer_enabled: bool, scorer_path: str, mmap: bool) -> None:
+    global _worker_engine
+    from app.ml.loader import build_engine
+
+    _worker_engine = build_engine(model_path, features_path, scorer_enabled, scorer_path, mmap)
+
+
+def _score_in_worker(matrix: np.ndarray):
+    return _worker_engine.predict(matrix)
+
+
+def _ping() -> bool:
+    return _worker_engine is not None
+
+
+class MicroBatcher:
+    """Regroupe les /predict concurrents en micro-lots : un seul appel au modèle pour plusieurs requêtes.
+
+    Un lot part dès qu'il atteint `max_batch_size` lignes, ou `max_wait_ms` après sa première ligne.
+    Avec `processes` > 0, les lots sont scorés dans un pool de processus où le modèle est préchargé
+    (le calcul échappe au GIL du worker uvicorn) ; sinon dans l'exécuteur d'inférence du processus.
+    """
+
+    def __init__(self, max_batch_size: int = 32, max_wait_ms: float = 2.0, processes: int = 0,
+                 scorer_enabled: bool = True, scorer_path: str = "", mmap: bool = False):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.processes = processes
+        self.load_options = (scorer_enabled, scorer_path, mmap)  # Mêmes options de chargement que le registre
+        self.version = None  # Version du modèle chargée dans le pool de processus
+        self._pool = None
+        self._executor = None
+        self._engine = None
+        self._pending = []  # (ligne de features, future) en attente du prochain lot
+        self._timer = None
+        self._switching = None  # Passage à une nouvelle version du modèle en cours
+        self._failed_version = None  # Version dont le chargement a échoué : pas de nouvel essai à chaque requête
+        # Compteurs exposés pour le suivi
+        self.batches = 0
+        self.rows = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def start(self, model_version, executor=None) -> None:
+        """Prépare le scoring pour `model_version` (registre) ; avec des processus, précharge le modèle dans chacun."""
+        self._executor = executor
+        self._pool = await self._open_pool(model_version)
+        self._engine = model_version.engine
+        self.version = model_version.version
+
+    async def _open_pool(self, model_version):
+        if self.processes <= 0:
+            return None
+        # spawn : pas de fork d'un processus qui a déjà des threads et une boucle d'événements
+        pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_version.path, model_version.features_path, *self.load_options),
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            # Un appel par processus : le modèle est chargé avant la première vraie requête
+            await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.processes)))
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        return pool
+
+    def follow(self, model_version) -> None:
+        """Suit la version active du registre : après une activation (/models/.../activate, surveillance du fichier),
+        le lot passe au nouveau modèle en tâche de fond ; en attendant, score_one prédit directement."""
+        if model_version.version in (self.version, self._failed_version) or self._switching is not None:
+            return
+        self._switching = asyncio.get_running_loop().create_task(self._switch(model_version))
+
+    async def _switch(self, model_version) -> None:
+        try:
+            pool = await self._open_pool(model_version)
+        except Exception:
+            logger.exception("Micro-lots : échec du chargement de la version %s", model_version.version)
+            self._failed_version = model_version.version
+            return
+        finally:
+            self._switching = None
+        # Le lot en cours part avec l'ancien modèle, celui qui a accepté ses lignes
+        if self._pending:
+            self._flush()
+        old_pool, self._pool = self._pool, pool
+        self._engine, self.version = model_version.engine, model_version.version
+        if old_pool is not None:
+            old_pool.shutdown(wait=False)  # Les lots déjà envoyés se terminent
+        logger.info("Micro-lots : version %s du modèle", self.version)
+
+    async def stop(self) -> None:
+        if self._switching is not None:
+            self._switching.cancel()
+            self._switching = None
+        if self._pending:
+            self._flush()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def submit(self, employee):
+        """Ajoute un employé au lot courant et attend son résultat : (classe, probabilité)."""
+        row = np.empty(len(FEATURE_COLUMNS), dtype=np.float64)
+        with observe_stage("feature_engineering"):
+            fill_feature_row(row, employee)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        with observe_stage("inference"):
+            return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Modèle figé à l'envoi du lot : un changement de version ensuite ne touche pas ce lot
+            asyncio.get_running_loop().create_task(self._score(batch, self._pool, self._engine))
+
+    async def _score(self, batch, pool, engine) -> None:
+        # Fortran : même disposition mémoire que build_feature_matrix, résultats identiques au bit près
+        matrix = np.asfortranarray(np.stack([row for row, _ in batch]))
+        loop = asyncio.get_running_loop()
+        try:
+            if pool is not None:
+                predictions, probabilities = await loop.run_in_executor(pool, _score_in_worker, matrix)
+            else:
+                predictions, probabilities = await loop.run_in_executor(self._executor, engine.predict, matrix)
+        except Exception as exc:
+            logger.exception("Échec du scoring d'un micro-lot de %d lignes", len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), prediction, probability in zip(batch, predictions, probabilities):
+            # Requête annulée entre-temps (client déconnecté) : rien à renvoyer
+            if not future.done():
+                future.set_result((int(prediction), float(probability)))
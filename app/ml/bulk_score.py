@@ -0,0 +1,216 @@
+"""Scoring en masse hors API : fichier CSV ou Parquet lu par blocs, prédictions écrites au fil de l'eau.
+
+Usage :
+    uv run python -m app.ml.bulk_score employes.parquet predictions.parquet
+    uv run python -m app.ml.bulk_score Data/model/data/master_dataset.csv scores.csv --workers 4 --to-db
+
+Colonnes d'entrée : celles de /predict (age, revenu_mensuel, heures_supp...) ou celles de master_dataset.csv.
+Le fichier de sortie reprend les colonnes d'entrée, plus prediction, probability, model_version et invalid_fields.
+Chaque ligne passe les contraintes de /predict (EmployeeInput) : une ligne incomplète ou hors bornes n'est ni
+scorée ni historisée, elle sort avec prediction et probability vides et la liste des champs refusés.
+La mémoire reste bornée : au plus --chunksize lignes par bloc et deux blocs en cours par processus.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.ml.features import (
+    HEURES_SUPP_LABELS, INPUT_CONSTRAINTS, INPUT_FIELDS, compute_features, frame_input_matrix, invalid_inputs,
+    to_input_frame,
+)
+
+logger = logging.getLogger(__name__)
+
+# Moteur d'inférence du processus courant (principal ou worker du pool)
+_engine = None
+
+
+def _init_engine(model_path: str, features_path: str, scorer_enabled: bool) -> None:
+    global _engine
+    from app.ml.loader import build_engine
+
+    _engine = build_engine(model_path, features_path, scorer_enabled)
+
+
+def score_chunk(raw):
+    """Feature engineering vectorisé puis prédiction d'un tableau brut déjà validé : renvoie (classes, probabilités)."""
+    if not len(raw):
+        return np.empty(0, dtype=int), np.empty(0, dtype=np.float64)
+    return _engine.predict(compute_features(raw))
+
+
+def prepare_chunk(chunk):
+    """Valide un bloc comme /predict : renvoie (bloc, tableau brut des lignes valides, masque des lignes valides, erreurs).
+
+    Les erreurs donnent, pour chaque ligne du bloc, les champs refusés séparés par des virgules ("" si la ligne
+    est valide). Une ligne refusée n'est ni scorée ni historisée.
+    """
+    raw = frame_input_matrix(to_input_frame(chunk))
+    invalid = invalid_inputs(raw)
+    valid = ~invalid.any(axis=1)
+    errors = np.full(len(chunk), "", dtype=object)
+    fields = np.array(INPUT_FIELDS)
+    for i in np.flatnonzero(~valid):
+        errors[i] = ",".join(fields[invalid[i]])
+    return chunk, np.ascontiguousarray(raw[valid]), valid, errors
+
+
+def history_rows(raw, predictions, probabilities, version: str) -> list[dict]:
+    """Lignes d'historique des employés scorés, au format de /predict (heures_supp en "Oui"/"Non", entiers)."""
+    rows = []
+    for values, prediction, probability in zip(raw.tolist(), predictions.tolist(), probabilities.tolist()):
+        row = {
+            field: int(value) if INPUT_CONSTRAINTS[field][2] else value for field, value in zip(INPUT_FIELDS, values)
+        }
+        row["heures_supp"] = HEURES_SUPP_LABELS[row["heures_supp"]]
+        rows.append({**row, "prediction": int(prediction), "probability": probability, "model_version": version})
+    return rows
+
+
+def iter_chunks(path: str, chunksize: int):
+    """Lit un CSV ou un Parquet bloc par bloc (DataFrames d'au plus `chunksize` lignes)."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        import pandas as pd
+
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class ChunkWriter:
+    """Écrit les blocs de sortie l'un après l'autre, en CSV ou en Parquet selon l'extension."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = None
+        self._first = True
+
+    def write(self, frame) -> None:
+        if self.path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def bounded_map(executor, fn, iterable, max_in_flight: int, key=None):
+    """Comme executor.map, dans l'ordre, mais sans lire plus de `max_in_flight` éléments d'avance.
+
+    `key` extrait de chaque élément l'argument envoyé à `fn` (l'élément entier par défaut).
+    """
+    in_flight = deque()
+    for item in iterable:
+        in_flight.append((item, executor.submit(fn, item if key is None else key(item))))
+        if len(in_flight) >= max_in_flight:
+            item, future = in_flight.popleft()
+            yield item, future.result()
+    while in_flight:
+        item, future = in_flight.popleft()
+        yield item, future.result()
+
+
+def bulk_score(input_path: str, output_path: str, model_path: str, features_path: str, chunksize: int = 100_000,
+               workers: int = 0, to_db: bool = False, scorer_enabled: bool = True) -> dict:
+    """Score tout un fichier ; renvoie un résumé (lignes, lignes refusées, blocs, durée, version du modèle)."""
+    import pandas as pd
+
+    from app.ml.prediction_cache import model_file_version
+
+    version = model_file_version(model_path)
+    start = time.perf_counter()
+    options = (model_path, features_path, scorer_enabled)
+    # Validation dans le processus principal : seules les lignes valides partent vers les workers
+    prepared = (prepare_chunk(chunk) for chunk in iter_chunks(input_path, chunksize))
+    if workers > 0:
+        import multiprocessing
+
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_engine, initargs=options,
+        )
+        results = bounded_map(executor, score_chunk, prepared, 2 * workers, key=lambda item: item[1])
+    else:
+        executor = None
+        _init_engine(*options)
+        results = ((item, score_chunk(item[1])) for item in prepared)
+
+    if to_db:
+        from app.db.database import engine
+        from app.db.history import bulk_load_history
+        from app.db.schema import ensure_schema
+
+        ensure_schema(engine)
+
+    writer = ChunkWriter(output_path)
+    rows = chunks = rejected = 0
+    try:
+        for (chunk, raw, valid, errors), (predictions, probabilities) in results:
+            # Ligne refusée : classe et probabilité vides, jamais une classe 0 par défaut
+            classes = np.full(len(chunk), None, dtype=object)
+            classes[valid] = predictions.astype(int)
+            scores = np.full(len(chunk), np.nan)
+            scores[valid] = probabilities
+            chunk = chunk.assign(
+                prediction=pd.array(classes, dtype="Int64"), probability=scores, model_version=version,
+                invalid_fields=errors,
+            )
+            writer.write(chunk)
+            if to_db:
+                bulk_load_history(engine, history_rows(raw, predictions, probabilities, version))
+            rows += len(chunk)
+            rejected += int(len(chunk) - valid.sum())
+            chunks += 1
+    finally:
+        writer.close()
+        if executor is not None:
+            executor.shutdown()
+    if rejected:
+        logger.warning("%s ligne(s) refusée(s) : champs manquants ou hors des bornes de /predict (colonne invalid_fields)",
+                       rejected)
+    return {"rows": rows, "rejected": rejected, "chunks": chunks, "seconds": round(time.perf_counter() - start, 3),
+            "model_version": version}
+
+
+def main(argv=None) -> int:
+    from app.ml.scorer import MODEL_DIR
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Fichier .csv ou .parquet à scorer")
+    parser.add_argument("output", help="Fichier de sortie .csv ou .parquet")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Lignes par bloc")
+    parser.add_argument("--workers", type=int, default=0, help="Processus de scoring en parallèle (0 = dans ce processus)")
+    parser.add_argument("--to-db", action="store_true", help="Charger aussi les prédictions dans historique_predictions")
+    parser.add_argument("--model", default=os.path.join(MODEL_DIR, "model.joblib"))
+    parser.add_argument("--features", default=os.path.join(MODEL_DIR, "features.joblib"))
+    parser.add_argument("--no-scorer", action="store_true", help="Désactiver le score compilé")
+    args = parser.parse_args(argv)
+
+    summary = bulk_score(
+        args.input, args.output, args.model, args.features, args.chunksize, args.workers, args.to_db, not args.no_scorer,
+    )
+    print(f"{summary['rows'] - summary['rejected']} lignes scorées en {summary['chunks']} blocs ({summary['seconds']} s), "
+          f"{summary['rejected']} refusées, modèle {summary['model_version']} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Suivi de la dérive des entrées et des scores par rapport aux données d'entraînement (master_dataset.csv).
+
+Référence : pour chaque feature du modèle et pour la probabilité, des classes fixées sur les quantiles
+des données d'entraînement et la proportion de lignes dans chacune. En service, chaque prédiction
+incrémente un histogramme à classes fixes (coût constant, mémoire bornée), réparti en tranches de temps
+pour ne garder que la fenêtre récente. /drift compare les deux : PSI et KS (sur les classes) par feature.
+
+Export de la référence (à l'entraînement) : uv run python -m app.ml.drift
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.ml.features import FEATURE_COLUMNS, fill_feature_row
+
+logger = logging.getLogger(__name__)
+
+DRIFT_METRICS = [*FEATURE_COLUMNS, "probability"]
+# Seuils usuels du PSI : < 0,1 stable, < 0,25 dérive modérée, au-delà dérive significative
+PSI_THRESHOLDS = (0.1, 0.25)
+_EPSILON = 1e-4  # Évite log(0) quand une classe est vide d'un côté
+
+
+def reference_path() -> str:
+    from app.ml.scorer import MODEL_DIR
+
+    return os.path.join(MODEL_DIR, "drift_reference.npz")
+
+
+def compute_reference(engine, validation_data: str | None = None, bins: int = 10):
+    """Bornes des classes (quantiles) et proportions de référence, sur master_dataset.csv scoré par le modèle."""
+    import pandas as pd
+    from app.ml.features import dataset_feature_matrix
+    from app.ml.scorer import DEFAULT_VALIDATION_DATA
+
+    X = dataset_feature_matrix(pd.read_csv(validation_data or DEFAULT_VALIDATION_DATA))
+    _, probabilities = engine.predict(X)
+    values = np.column_stack([X, probabilities])
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    edges = np.full((values.shape[1], bins - 1), np.inf)
+    for j in range(values.shape[1]):
+        # Features discrètes (notes de 1 à 4, heures supplémentaires) : moins de bornes distinctes, classes en trop vides
+        inner = np.unique(np.quantile(values[:, j], quantiles))
+        edges[j, :len(inner)] = inner
+    counts = _bin_counts(edges, values, bins)
+    return edges, counts / counts.sum(axis=1, keepdims=True)
+
+
+def _bin_indices(edges: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # values (m, k) -> indice de classe (m, k) : nombre de bornes strictement inférieures à la valeur
+    return (values[:, :, None] > edges[None, :, :]).sum(axis=2)
+
+
+def _bin_counts(edges: np.ndarray, values: np.ndarray, bins: int) -> np.ndarray:
+    counts = np.zeros((edges.shape[0], bins), dtype=np.int64)
+    np.add.at(counts, (np.arange(edges.shape[0])[None, :], _bin_indices(edges, values)), 1)
+    return counts
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    expected = np.clip(expected, _EPSILON, None)
+    actual = np.clip(actual, _EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(expected: np.ndarray, actual: np.ndarray) -> float:
+    # KS sur les fonctions de répartition par classe : approximation bornée par la finesse des classes
+    return float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected))))
+
+
+class DriftMonitor:
+    """Histogrammes glissants des features et des scores servis, comparés à la référence d'entraînement."""
+
+    def __init__(self, bins: int = 10, window_seconds: float = 86400, slots: int = 24):
+        self.bins = bins
+        self.slots = slots
+        self.slot_seconds = window_seconds / slots
+        self.edges = None
+        self.reference = None
+        self._counts = np.zeros((slots, len(DRIFT_METRICS), bins), dtype=np.int64)
+        self._slot_epochs = np.full(slots, -1, dtype=np.int64)  # Tranche de temps contenue dans chaque case
+        self._rows = np.arange(len(DRIFT_METRICS))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def ready(self) -> bool:
+        return self.edges is not None
+
+    def set_reference(self, edges: np.ndarray, reference: np.ndarray) -> None:
+        self.edges, self.reference = edges, reference
+
+    def prepare(self, engine, path: str | None = None) -> None:
+        """Charge la référence exportée à l'entraînement, sinon la calcule (appelé une fois le modèle chargé)."""
+        path = path or reference_path()
+        try:
+            if os.path.exists(path):
+                with np.load(path) as arrays:
+                    if arrays["edges"].shape == (len(DRIFT_METRICS), self.bins - 1):
+                        self.set_reference(arrays["edges"], arrays["reference"])
+                        return
+            self.set_reference(*compute_reference(engine, bins=self.bins))
+        except Exception:
+            logger.exception("Référence de dérive indisponible : suivi désactivé")
+
+    def _current_slot(self) -> np.ndarray:
+        # Appelé sous verrou : une case dont la tranche est périmée est remise à zéro avant réutilisation
+        epoch = int(time.monotonic() // self.slot_seconds)
+        index = epoch % self.slots
+        if self._slot_epochs[index] != epoch:
+            self._counts[index] = 0
+            self._slot_epochs[index] = epoch
+        return self._counts[index]
+
+    def observe(self, employee, probability: float) -> None:
+        """Ajoute une prédiction : O(1), quelques microsecondes sur le chemin de /predict."""
+        if self.edges is None:
+            return
+        values = getattr(self._local, "values", None)
+        if values is None:
+            values = self._local.values = np.empty(len(DRIFT_METRICS), dtype=np.float64)
+        fill_feature_row(values, employee)
+        values[-1] = probability
+        indices = (values[:, None] > self.edges).sum(axis=1)
+        with self._lock:
+            self._current_slot()[self._rows, indices] += 1
+
+    def observe_batch(self, matrix: np.ndarray, probabilities: np.ndarray) -> None:
+        if self.edges is None or len(matrix) == 0:
+            return
+        indices = _bin_indices(self.edges, np.column_stack([matrix, probabilities]))
+        with self._lock:
+            np.add.at(self._current_slot(), (self._rows[None, :], indices), 1)
+
+    def window_counts(self) -> np.ndarray:
+        current = int(time.monotonic() // self.slot_seconds)
+        with self._lock:
+            live = self._slot_epochs > current - self.slots
+            return self._counts[live].sum(axis=0)
+
+    def report(self) -> dict:
+        """PSI et KS par feature (et pour la probabilité) sur la fenêtre glissante."""
+        if self.edges is None:
+            return {"ready": False}
+        counts = self.window_counts()
+        total = int(counts[0].sum())
+        metrics = {}
+        for j, name in enumerate(DRIFT_METRICS):
+            if total == 0:
+                metrics[name] = {"psi": None, "ks": None, "status": "no_data"}
+                continue
+            actual = counts[j] / total
+            value = psi(self.reference[j], actual)
+            status = "stable" if value < PSI_THRESHOLDS[0] else "moderate" if value < PSI_THRESHOLDS[1] else "significant"
+            metrics[name] = {"psi": round(value, 6), "ks": round(ks(self.reference[j], actual), 6), "status": status}
+        return {
+            "ready": True,
+            "window_seconds": self.slot_seconds * self.slots,
+            "count": total,
+            "features": {name: metrics[name] for name in FEATURE_COLUMNS},
+            "probability": metrics["probability"],
+        }
+
+
+if __name__ == "__main__":
+    from app.ml.loader import build_engine
+    from app.ml.scorer import MODEL_DIR
+
+    engine = build_engine(os.path.join(MODEL_DIR, "model.joblib"), os.path.join(MODEL_DIR, "features.joblib"))
+    edges, reference = compute_reference(engine)
+    np.savez(reference_path(), edges=edges, reference=reference)
+    print(f"Référence de dérive exportée dans {reference_path()}")
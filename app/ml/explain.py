@@ -0,0 +1,102 @@
+"""Contributions de chaque feature à une prédiction, préparées au chargement du modèle.
+
+Régression logistique (LinearScorer) : contributions exactes en log-odds, w_i · (x_i - moyenne_i), la moyenne
+étant celle de master_dataset.csv. C'est la valeur de Shapley exacte d'un modèle linéaire à features
+indépendantes ; base_value + somme des contributions = log-odds de la prédiction.
+
+Arbres (TreeEnsembleScorer) : attribution par chemin (Saabas). Chaque nœud porte à l'avance l'écart de
+probabilité avec son parent et la feature qui y a mené ; une prédiction additionne ces écarts le long de
+son chemin. base_value + somme des contributions = probabilité.
+"""
+import os
+
+import numpy as np
+
+from app.ml.features import FEATURE_COLUMNS
+from app.ml.model_store import share_arrays
+
+
+class LinearExplainer:
+    units = "log_odds"
+
+    def __init__(self, weights: np.ndarray, bias: float, background: np.ndarray):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.background = np.asarray(background, dtype=np.float64)
+        self.base_value = float(self.background @ self.weights + bias)
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        return (X - self.background) * self.weights
+
+
+class TreeExplainer:
+    units = "probability"
+
+    def __init__(self, scorer, shared_dir: str = ""):
+        self.scorer = scorer
+        if shared_dir:
+            # Tables projetées depuis des .npy, comme celles du score : communes à tous les workers
+            tables = share_arrays(os.path.join(shared_dir, "explain"), lambda: self.tables(scorer))
+        else:
+            tables = self.tables(scorer)
+        self.split_feature = tables["split_feature"]
+        self.delta = tables["delta"]
+        self.base_value = float(scorer.value[scorer.roots].mean())
+
+    @staticmethod
+    def tables(scorer) -> dict:
+        # Pour chaque nœud : feature de la décision qui y mène et écart de probabilité avec le parent
+        split_feature = np.zeros(len(scorer.value), dtype=np.int64)
+        delta = np.zeros(len(scorer.value), dtype=np.float64)
+        internal = np.flatnonzero(scorer.left >= 0)
+        for children in (scorer.left[internal], scorer.right[internal]):
+            split_feature[children] = scorer.feature[internal]
+            delta[children] = scorer.value[children] - scorer.value[internal]
+        return {"split_feature": split_feature, "delta": delta}
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        scorer = self.scorer
+        Z = ((X - scorer.mean) / scorer.scale).astype(np.float32)  # Même descente que TreeEnsembleScorer
+        n_rows, n_trees = X.shape[0], len(scorer.roots)
+        rows = np.repeat(np.arange(n_rows), n_trees)
+        nodes = np.tile(scorer.roots, n_rows)
+        visited_rows, visited_nodes = [], []
+        active = scorer.left[nodes] >= 0
+        while active.any():
+            current = nodes[active]
+            go_left = Z[rows[active], scorer.feature[current]] <= scorer.threshold[current]
+            nodes[active] = np.where(go_left, scorer.left[current], scorer.right[current])
+            visited_rows.append(rows[active])
+            visited_nodes.append(nodes[active])
+            active = scorer.left[nodes] >= 0
+        if not visited_nodes:
+            return np.zeros(X.shape, dtype=np.float64)
+        # Un seul cumul pour tous les nœuds traversés : écart de probabilité ajouté à la feature de la décision
+        visited = np.concatenate(visited_nodes)
+        cells = np.concatenate(visited_rows) * X.shape[1] + self.split_feature[visited]
+        totals = np.bincount(cells, weights=self.delta[visited], minlength=n_rows * X.shape[1])
+        return totals.reshape(n_rows, X.shape[1]) / n_trees
+
+
+def build_explainer(scorer, background: np.ndarray | None = None, shared_dir: str = ""):
+    """Explicateur du score compilé, ou None si le modèle n'en a pas (chemin scikit-learn seul).
+
+    Avec shared_dir, les tables des arbres sont lues par mmap depuis ce dossier (voir model_store.share_arrays).
+    """
+    if scorer is None:
+        return None
+    if scorer.kind == "linear":
+        if background is None:
+            return None
+        return LinearExplainer(scorer.weights, scorer.bias, background)
+    if scorer.kind == "trees":
+        return TreeExplainer(scorer, shared_dir)
+    return None
+
+
+def describe(explainer, contributions: np.ndarray) -> dict:
+    """Réponse JSON d'une ligne de contributions."""
+    return {
+        "base_value": explainer.base_value,
+        "units": explainer.units,
+        "contributions": dict(zip(FEATURE_COLUMNS, contributions.tolist())),
+    }
@@ -0,0 +1,232 @@
+"""Feature engineering partagé par l'API, les chemins par lot, le scoring en masse et l'entraînement.
+
+Une seule définition des features dérivées (`derived_features`, division protégée `safe_ratio`) et de l'encodage
+des heures supplémentaires, utilisable sur un employé, un tableau NumPy brut ou un DataFrame, avec les mêmes
+garde-fous partout : une ancienneté ou une expérience nulle (ou négative, ou manquante) est remplacée par 1.
+"""
+import numpy as np
+
+# Ordre des colonnes attendu par le modèle (identique à Data/model/features.joblib)
+FEATURE_COLUMNS = [
+    'revenu_mensuel',
+    'age',
+    'distance_domicile_travail',
+    'satisfaction_employee_environnement',
+    'heure_supplementaires',
+    'annees_depuis_la_derniere_promotion',
+    'satisfaction_employee_equilibre_pro_perso',
+    'nombre_participation_pee',
+    'ratio_stagnation',
+    'revenu_par_annee_exp',
+]
+
+# Colonnes d'entrée de l'API (EmployeeInput, historique_predictions) et leurs équivalents dans master_dataset.csv
+INPUT_FIELDS = [
+    'age',
+    'revenu_mensuel',
+    'distance_domicile_travail',
+    'satisfaction_environnement',
+    'heures_supp',
+    'annees_promo',
+    'satisfaction_equilibre',
+    'pee',
+    'poste_actuel',
+    'anciennete',
+    'exp_totale',
+]
+DATASET_TO_INPUT = {
+    'age': 'age',
+    'revenu_mensuel': 'revenu_mensuel',
+    'distance_domicile_travail': 'distance_domicile_travail',
+    'satisfaction_employee_environnement': 'satisfaction_environnement',
+    'heure_supplementaires': 'heures_supp',
+    'annees_depuis_la_derniere_promotion': 'annees_promo',
+    'satisfaction_employee_equilibre_pro_perso': 'satisfaction_equilibre',
+    'nombre_participation_pee': 'pee',
+    'annees_dans_le_poste_actuel': 'poste_actuel',
+    'annees_dans_l_entreprise': 'anciennete',
+    'annee_experience_totale': 'exp_totale',
+}
+
+# Contraintes de EmployeeInput (app/main.py) : (minimum, maximum, entier), None = pas de borne.
+# heures_supp est déjà encodé en 0/1 ; un test vérifie que la table suit le modèle pydantic.
+INPUT_CONSTRAINTS = {
+    'age': (18, 70, True),
+    'revenu_mensuel': (0, None, False),
+    'distance_domicile_travail': (0, None, False),
+    'satisfaction_environnement': (1, 4, True),
+    'heures_supp': (0, 1, True),
+    'annees_promo': (0, None, True),
+    'satisfaction_equilibre': (1, 4, True),
+    'pee': (0, None, True),
+    'poste_actuel': (0, None, True),
+    'anciennete': (0, None, True),
+    'exp_totale': (0, None, False),
+}
+
+# Position dans INPUT_FIELDS des 8 features reprises telles quelles, dans l'ordre de FEATURE_COLUMNS
+_BASE_FEATURES = [1, 0, 2, 3, 4, 5, 6, 7]
+_POSTE, _ANCIENNETE, _EXP = 8, 9, 10
+
+
+# Codes acceptés pour heures_supp dans un fichier : libellés de l'API ou 0/1 déjà encodés
+HEURES_SUPP_CODES = {"Oui": 1.0, "Non": 0.0, 1: 1.0, 0: 0.0}
+HEURES_SUPP_LABELS = ("Non", "Oui")  # Décodage inverse, indexé par le code 0/1
+
+
+def encode_heures_supp(value) -> float:
+    """Heures supplémentaires : "Oui" -> 1.0, tout le reste -> 0.0."""
+    return 1.0 if value == "Oui" else 0.0
+
+
+def safe_ratio(numerator, denominator):
+    """Division protégée, sur des scalaires comme sur des tableaux : un dénominateur nul, négatif ou manquant vaut 1."""
+    if isinstance(denominator, np.ndarray):
+        return numerator / np.where(denominator > 0, denominator, 1.0)
+    return numerator / (denominator if denominator > 0 else 1.0)
+
+
+def derived_features(poste_actuel, anciennete, revenu_mensuel, exp_totale):
+    """ratio_stagnation et revenu_par_annee_exp : la seule définition des deux ratios, scalaire ou vectorisée."""
+    return safe_ratio(poste_actuel, anciennete), safe_ratio(revenu_mensuel, exp_totale)
+
+
+def compute_features(raw) -> np.ndarray:
+    """Matrice (n, 10) des features à partir d'un tableau brut (n, 11) dans l'ordre INPUT_FIELDS.
+
+    heures_supp doit déjà valoir 0/1. Le résultat est en ordre Fortran, comme un DataFrame pandas : les produits
+    matriciels du modèle se font alors dans le même ordre et les probabilités sont identiques au bit près.
+    """
+    raw = np.asarray(raw, dtype=np.float64).reshape(-1, len(INPUT_FIELDS))
+    matrix = np.empty((raw.shape[0], len(FEATURE_COLUMNS)), dtype=np.float64, order="F")
+    matrix[:, :8] = raw[:, _BASE_FEATURES]
+    matrix[:, 8], matrix[:, 9] = derived_features(raw[:, _POSTE], raw[:, _ANCIENNETE], raw[:, 1], raw[:, _EXP])
+    return matrix
+
+
+def input_row(e) -> tuple:
+    """Champs bruts d'un EmployeeInput dans l'ordre INPUT_FIELDS, heures supplémentaires encodées en 0/1."""
+    return (
+        e.age,
+        e.revenu_mensuel,
+        e.distance_domicile_travail,
+        e.satisfaction_environnement,
+        encode_heures_supp(e.heures_supp),
+        e.annees_promo,
+        e.satisfaction_equilibre,
+        e.pee,
+        e.poste_actuel,
+        e.anciennete,
+        e.exp_totale,
+    )
+
+
+def build_feature_matrix(employees) -> np.ndarray:
+    """Construit la matrice (n, 10) des features pour une liste d'EmployeeInput, sans boucle de calcul."""
+    # Une seule passe Python pour extraire les champs bruts, tout le reste est vectorisé
+    raw = np.array([input_row(e) for e in employees], dtype=np.float64)
+    return compute_features(raw)
+
+
+def scenario_matrix(employee, variations: dict) -> np.ndarray:
+    """Features (n, 10) de tous les scénarios : produit cartésien des variations autour d'un employé.
+
+    `variations` associe un champ de INPUT_FIELDS à ses valeurs ("Oui"/"Non" pour heures_supp). Les lignes
+    suivent l'ordre C de la grille (la dernière variation change le plus vite), comme un reshape NumPy.
+    """
+    axes = [
+        [encode_heures_supp(v) for v in values] if field == "heures_supp" else values
+        for field, values in variations.items()
+    ]
+    grids = np.meshgrid(*[np.asarray(values, dtype=np.float64) for values in axes], indexing="ij")
+    raw = np.tile(np.asarray(input_row(employee), dtype=np.float64), (grids[0].size if grids else 1, 1))
+    for field, grid in zip(variations, grids):
+        raw[:, INPUT_FIELDS.index(field)] = grid.ravel()
+    return compute_features(raw)
+
+
+def fill_feature_row(row: np.ndarray, e) -> np.ndarray:
+    """Remplit en place une ligne float64 préallouée avec les features d'un seul EmployeeInput.
+
+    Chemin scalaire de /predict (quelques microsecondes, sans tableau intermédiaire) : les ratios viennent de
+    derived_features, comme pour compute_features ; le test de parité vérifie l'égalité au bit près.
+    """
+    row[0] = e.revenu_mensuel
+    row[1] = e.age
+    row[2] = e.distance_domicile_travail
+    row[3] = e.satisfaction_environnement
+    row[4] = encode_heures_supp(e.heures_supp)
+    row[5] = e.annees_promo
+    row[6] = e.satisfaction_equilibre
+    row[7] = e.pee
+    row[8], row[9] = derived_features(e.poste_actuel, e.anciennete, e.revenu_mensuel, e.exp_totale)
+    return row
+
+
+def to_input_frame(df):
+    """Ramène un DataFrame aux colonnes de l'API : déjà au bon format, ou colonnes brutes de master_dataset.csv."""
+    if all(field in df.columns for field in INPUT_FIELDS):
+        return df[INPUT_FIELDS]
+    if all(column in df.columns for column in DATASET_TO_INPUT):
+        return df[list(DATASET_TO_INPUT)].rename(columns=DATASET_TO_INPUT)[INPUT_FIELDS]
+    missing = [field for field in INPUT_FIELDS if field not in df.columns]
+    raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+
+
+def frame_input_matrix(df) -> np.ndarray:
+    """Tableau brut (n, 11) d'un DataFrame aux colonnes de l'API, heures supplémentaires encodées en 0/1.
+
+    Une valeur manquante ou illisible (texte dans une colonne numérique, heures_supp autre que "Oui"/"Non"/0/1)
+    devient NaN : invalid_inputs la signale au lieu de la laisser passer pour un 0.
+    """
+    import pandas as pd
+
+    raw = np.empty((len(df), len(INPUT_FIELDS)), dtype=np.float64, order="F")
+    for j, field in enumerate(INPUT_FIELDS):
+        column = df[field]
+        numeric = column.dtype.kind in "biuf"
+        if field == "heures_supp" and not numeric:
+            # Colonne texte "Oui"/"Non" (0/1 acceptés aussi, comme dans le notebook d'entraînement)
+            raw[:, j] = column.map(HEURES_SUPP_CODES).to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            raw[:, j] = column.to_numpy(dtype=np.float64) if numeric else \
+                pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return raw
+
+
+def invalid_inputs(raw) -> np.ndarray:
+    """Masque (n, 11) des valeurs qui ne passeraient pas la validation de /predict (INPUT_CONSTRAINTS)."""
+    raw = np.asarray(raw, dtype=np.float64).reshape(-1, len(INPUT_FIELDS))
+    invalid = ~np.isfinite(raw)
+    with np.errstate(invalid="ignore"):
+        for j, field in enumerate(INPUT_FIELDS):
+            minimum, maximum, integer = INPUT_CONSTRAINTS[field]
+            column = raw[:, j]
+            if minimum is not None:
+                invalid[:, j] |= column < minimum
+            if maximum is not None:
+                invalid[:, j] |= column > maximum
+            if integer:
+                invalid[:, j] |= column != np.floor(column)
+    return invalid
+
+
+def frame_feature_matrix(df) -> np.ndarray:
+    """Matrice des features d'un DataFrame aux colonnes de l'API, vectorisée (même logique que /predict)."""
+    return compute_features(frame_input_matrix(df))
+
+
+def dataset_feature_matrix(df) -> np.ndarray:
+    """Construit la matrice des features à partir des colonnes brutes de master_dataset.csv (même logique que le notebook)."""
+    return frame_feature_matrix(to_input_frame(df))
+
+
+def add_derived_features(df):
+    """Ajoute ratio_stagnation et revenu_par_annee_exp à un DataFrame au format master_dataset.csv (entraînement)."""
+    df['ratio_stagnation'], df['revenu_par_annee_exp'] = derived_features(
+        df['annees_dans_le_poste_actuel'].to_numpy(dtype=np.float64),
+        df['annees_dans_l_entreprise'].to_numpy(dtype=np.float64),
+        df['revenu_mensuel'].to_numpy(dtype=np.float64),
+        df['annee_experience_totale'].to_numpy(dtype=np.float64),
+    )
+    return df
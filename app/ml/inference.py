@@ -0,0 +1,144 @@
+import copy
+import logging
+import threading
+
+import numpy as np
+
+from app.core.metrics import observe_stage
+from app.ml.features import FEATURE_COLUMNS, fill_feature_row
+
+logger = logging.getLogger(__name__)
+
+
+def _strip_feature_names(estimator) -> None:
+    """Retire feature_names_in_ d'un estimateur et de ses étapes, pour l'appeler sur un tableau NumPy nu."""
+    # Sur un Pipeline, feature_names_in_ est une propriété qui délègue à la première étape
+    if "feature_names_in_" in vars(estimator):
+        del estimator.feature_names_in_
+    for _, step in getattr(estimator, "steps", []):
+        if step not in (None, "passthrough"):
+            _strip_feature_names(step)
+
+
+def _shared_arrays(obj, memo=None, depth=0) -> dict:
+    """Mémo pour deepcopy : les tableaux NumPy de l'estimateur sont réutilisés tels quels, pas dupliqués.
+
+    Les tableaux appris ne sont jamais modifiés à la prédiction ; les partager garde la copie rapide légère
+    et, avec un modèle chargé par mmap, laisse ses tableaux dans le cache de pages commun aux workers.
+    """
+    memo = {} if memo is None else memo
+    if isinstance(obj, np.ndarray):
+        memo[id(obj)] = obj
+    elif depth < 10:
+        if isinstance(obj, dict):
+            children = obj.values()
+        elif isinstance(obj, (list, tuple)):
+            children = obj
+        else:
+            children = vars(obj).values() if hasattr(obj, "__dict__") else ()
+        for child in children:
+            _shared_arrays(child, memo, depth + 1)
+    return memo
+
+
+class InferenceEngine:
+    """Encapsule le modèle : score compilé, puis chemin rapide NumPy, puis DataFrame pandas en secours."""
+
+    def __init__(self, model, feature_names=None, scorer=None):
+        self.model = model
+        self.scorer = scorer  # Score compilé (app.ml.scorer), déjà validé contre scikit-learn
+        self.explainer = None  # Contributions des features (app.ml.explain), préparées au chargement
+        self.metadata = None  # <modèle>.meta.json écrit par Data/model/train.py, s'il existe
+        self.feature_names = list(feature_names) if feature_names is not None else list(FEATURE_COLUMNS)
+        self.has_proba = hasattr(model, "predict_proba")
+        self._local = threading.local()  # Un tampon de ligne par thread worker
+        self.fast_model = self._prepare_fast_model()
+
+    @property
+    def fast_path(self) -> bool:
+        return self.fast_model is not None
+
+    @property
+    def backend(self) -> str:
+        """Chemin utilisé pour les prédictions : "compiled", "numpy" ou "pandas"."""
+        if self.scorer is not None:
+            return "compiled"
+        return "numpy" if self.fast_model is not None else "pandas"
+
+    def _prepare_fast_model(self):
+        # L'ordre des colonnes doit être exactement celui de features.joblib, sinon on reste sur pandas
+        if self.feature_names != FEATURE_COLUMNS:
+            logger.warning("Ordre des features inattendu : chemin rapide désactivé")
+            return None
+        fitted_names = getattr(self.model, "feature_names_in_", None)
+        if fitted_names is not None and list(fitted_names) != self.feature_names:
+            logger.warning("Le modèle a été entraîné sur d'autres colonnes : chemin rapide désactivé")
+            return None
+
+        # Copie sans noms de colonnes : on l'appelle directement sur des float64
+        fast_model = copy.deepcopy(self.model, _shared_arrays(self.model))
+        _strip_feature_names(fast_model)
+
+        # Contrôle de parité : un modèle qui a besoin des noms (ColumnTransformer...) garde pandas
+        probe = np.array([[3000, 30, 10, 3, 0, 2, 3, 1, 1.0, 375.0],
+                          [8000, 50, 1, 1, 1, 10, 1, 0, 0.2, 400.0]], dtype=np.float64)
+        try:
+            fast = self._raw_scores(fast_model, probe)
+            reference = self._raw_scores(self.model, self._to_frame(probe))
+        except Exception:
+            logger.warning("Le modèle refuse les tableaux NumPy : chemin rapide désactivé")
+            return None
+        # Même tolérance que le score compilé (app.ml.scorer.validate_scorer) : le DataFrame arrive dans
+        # scikit-learn en colonnes (ordre Fortran), ce qui peut décaler le produit matriciel d'un ulp
+        if fast.shape != reference.shape or not np.allclose(fast, reference, rtol=1e-9, atol=1e-12):
+            logger.warning("Résultats différents sans noms de colonnes : chemin rapide désactivé")
+            return None
+        return fast_model
+
+    def _to_frame(self, matrix: np.ndarray):
+        import pandas as pd  # Import différé : pandas ne sert qu'au chemin de secours
+
+        return pd.DataFrame(matrix, columns=self.feature_names)
+
+    def _raw_scores(self, model, X):
+        return model.predict_proba(X) if self.has_proba else model.predict(X)
+
+    def _row_buffer(self) -> np.ndarray:
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(self.feature_names)), dtype=np.float64)
+        return row
+
+    def predict(self, matrix: np.ndarray, use_fast_path: bool = True):
+        """Prédit un lot (n, 10) : renvoie (classes, probabilités de départ)."""
+        if use_fast_path and self.scorer is not None:
+            scores = self.scorer.predict_proba(matrix)
+        elif use_fast_path and self.fast_model is not None:
+            scores = self._raw_scores(self.fast_model, matrix)
+        else:
+            scores = self._raw_scores(self.model, self._to_frame(matrix))
+        # Un seul appel au modèle : les classes sont déduites des probabilités
+        if self.has_proba:
+            return self.model.classes_[np.argmax(scores, axis=1)], scores[:, 1]
+        return scores, np.zeros(len(scores))
+
+    def predict_one(self, employee):
+        """Prédit un seul employé via le tampon préalloué du thread : renvoie (classe, probabilité)."""
+        row = self._row_buffer()
+        with observe_stage("feature_engineering"):
+            fill_feature_row(row[0], employee)
+        with observe_stage("inference"):
+            predictions, probabilities = self.predict(row)
+        return int(predictions[0]), float(probabilities[0])
+
+    def explain(self, matrix: np.ndarray) -> np.ndarray:
+        """Contributions (n, 10) de chaque feature pour un lot ; lève LookupError sans explicateur."""
+        if self.explainer is None:
+            raise LookupError("Pas d'explications pour ce modèle")
+        return self.explainer.contributions(matrix)
+
+    def explain_one(self, employee) -> np.ndarray:
+        """Contributions d'un seul employé, via le tampon de ligne du thread (quelques microsecondes)."""
+        row = self._row_buffer()
+        fill_feature_row(row[0], employee)
+        return self.explain(row)[0]
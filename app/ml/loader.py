@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from app.ml.model_store import process_memory
+from app.ml.prediction_cache import model_file_version
+from app.ml.registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def build_engine(model_path: str, features_path: str, scorer_enabled: bool = True, scorer_path: str = "",
+                 mmap: bool = False):
+    """Charge un modèle joblib et prépare son moteur d'inférence (joblib et scikit-learn ne sont importés qu'ici)."""
+    import joblib
+    from app.ml.explain import build_explainer
+    from app.ml.inference import InferenceEngine
+    from app.ml.model_store import load_metadata, load_model, prune_shared, shared_dir
+    from app.ml.scorer import DEFAULT_SCORER_PATH, MODEL_DIR, load_validated_scorer, validation_matrix
+
+    # Avec mmap, les tableaux que scikit-learn ne recopie pas au chargement sont partagés via le cache de pages
+    model = load_model(model_path, mmap)
+    # On vérifie l'ordre des colonnes contre features.joblib pour activer le chemin rapide NumPy
+    feature_names = joblib.load(features_path) if os.path.exists(features_path) else None
+    engine = InferenceEngine(model, feature_names)
+    # Métadonnées d'entraînement (Data/model/train.py) : un ordre de features différent refuse le modèle
+    engine.metadata = load_metadata(model_path, engine.feature_names)
+    # Score compilé, gardé seulement s'il reproduit scikit-learn sur master_dataset.csv. Même désactivé pour
+    # les prédictions (SCORER_ENABLED=false), il sert aux explications de /predict?explain=true
+    if engine.fast_path:
+        if not scorer_path:
+            # scorer.npz correspond à model.joblib ; pour un autre fichier, <modèle>.scorer.npz ou compilation à la volée
+            default_model = os.path.join(MODEL_DIR, "model.joblib")
+            same_model = os.path.abspath(model_path) == os.path.abspath(default_model)
+            scorer_path = DEFAULT_SCORER_PATH if same_model else os.path.splitext(model_path)[0] + ".scorer.npz"
+        # Avec mmap, score et explicateur sont lus depuis <modèle>.shared/ en .npy : ce sont eux qui portent les
+        # nœuds des arbres, que scikit-learn garde en copie privée dans chaque worker
+        shared = shared_dir(model_path, scorer_path) if mmap else ""
+        scorer = load_validated_scorer(model, engine.feature_names, scorer_path, shared_dir=shared)
+        if scorer_enabled:
+            engine.scorer = scorer
+        if scorer is not None:
+            engine.explainer = build_explainer(scorer, validation_matrix().mean(axis=0), shared)
+        if shared and os.path.isdir(shared):
+            prune_shared(shared)
+    return engine
+
+
+class ModelLoader:
+    """Charge le modèle hors du chemin d'import : au démarrage, ou en tâche de fond avec suivi d'état pour /ready."""
+
+    def __init__(self, model_path: str, features_path: str, scorer_enabled: bool = True, scorer_path: str = "",
+                 registry: ModelRegistry | None = None, mmap: bool = False):
+        self.model_path = model_path
+        self.features_path = features_path
+        self.scorer_enabled = scorer_enabled
+        self.scorer_path = scorer_path
+        self.registry = registry if registry is not None else ModelRegistry()
+        self.mmap = mmap
+        self.memory = {}  # Mémoire du worker avant et après le chargement (app.ml.model_store.process_memory)
+        self.state = "pending"  # pending -> loading -> ready | absent | failed
+        self.load_seconds = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        """Moteur de la version active du registre (change lors d'un rechargement à chaud)."""
+        active = self.registry.active()
+        return active.engine if active is not None else None
+
+    def load(self):
+        """Charge le modèle de démarrage et l'active dans le registre."""
+        with self._lock:
+            if self._ready.is_set():
+                return self.engine
+            self.state = "loading"
+            start = time.perf_counter()
+            self.memory["before"] = process_memory()
+            try:
+                self.registry.load(
+                    self.model_path, self.features_path, activate=True,
+                    scorer_enabled=self.scorer_enabled, scorer_path=self.scorer_path, mmap=self.mmap,
+                )
+                self.state = "ready"
+            except FileNotFoundError:
+                self.state = "absent"
+                print("Modèle non trouvé")
+            except Exception:
+                self.state = "failed"
+                logger.exception("Échec du chargement du modèle %s", self.model_path)
+            finally:
+                self.load_seconds = time.perf_counter() - start
+                self.memory["after"] = process_memory()
+                self._ready.set()
+            return self.engine
+
+    def start_background(self) -> threading.Thread:
+        """Lance le chargement dans un thread : le serveur accepte les connexions pendant ce temps."""
+        thread = threading.Thread(target=self.load, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def watch(self, interval: float) -> None:
+        """Surveille le fichier modèle : s'il est remplacé, la nouvelle version est chargée, validée puis activée.
+
+        Chaque worker uvicorn a sa propre boucle de surveillance : un déploiement se propage à tous sans redémarrage.
+        """
+        seen = model_file_version(self.model_path)
+        while True:
+            await asyncio.sleep(interval)
+            current = model_file_version(self.model_path)
+            if current == seen or current == "absent":
+                continue
+            seen = current
+            logger.info("Nouveau fichier modèle détecté (%s), rechargement en tâche de fond", current)
+            self.registry.load_background(
+                self.model_path, self.features_path, current, activate=True,
+                scorer_enabled=self.scorer_enabled, scorer_path=self.scorer_path, mmap=self.mmap,
+            )
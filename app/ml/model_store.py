@@ -0,0 +1,193 @@
+"""Modèle partagé entre workers : copie non compressée lue par mmap, métadonnées d'entraînement, mémoire du processus.
+
+Export : uv run python -m app.ml.model_store  (écrit Data/model/model.mmap.joblib à côté du modèle)
+
+Le mmap du pickle ne partage que les tableaux que scikit-learn garde tels quels (coefficients d'une régression
+logistique). Les arbres sont recopiés par Tree.__setstate__ au chargement : pour eux, ce sont les tableaux du
+score compilé et de l'explicateur, écrits en .npy dans <modèle>.shared/ (share_arrays), qui sont partagés.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def mmap_model_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + ".mmap.joblib"
+
+
+def export_mmap(model_path: str, out_path: str | None = None) -> str:
+    """Réécrit le modèle avec compress=0 : ses tableaux NumPy deviennent projetables en mémoire (mmap_mode='r')."""
+    import joblib
+
+    out_path = out_path or mmap_model_path(model_path)
+    model = joblib.load(model_path)
+    # Écriture dans un fichier temporaire puis os.replace : un autre worker ne lit jamais un fichier à moitié écrit
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp_path, compress=0)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return out_path
+
+
+def load_model(model_path: str, mmap: bool = False):
+    """Charge le modèle ; avec mmap, les tableaux que scikit-learn ne recopie pas restent dans le cache de pages."""
+    import joblib
+
+    if not mmap:
+        return joblib.load(model_path)
+    mmap_path = mmap_model_path(model_path)
+    # Copie absente ou plus ancienne que le modèle : on la (re)génère
+    if not os.path.exists(mmap_path) or os.path.getmtime(mmap_path) < os.path.getmtime(model_path):
+        export_mmap(model_path, mmap_path)
+    return joblib.load(mmap_path, mmap_mode="r")
+
+
+def shared_dir(model_path: str, *sources: str) -> str:
+    """Dossier des tableaux partagés d'un modèle : <modèle>.shared/<empreinte du modèle et des fichiers sources>.
+
+    Un nouveau modèle donne un nouveau dossier : un dossier existant est toujours complet et à jour.
+    """
+    digest = hashlib.sha256()
+    for path in (model_path, *sources):
+        if os.path.exists(path):
+            digest.update(file_sha256(path).encode())
+    return os.path.join(os.path.splitext(model_path)[0] + ".shared", digest.hexdigest()[:16])
+
+
+def share_arrays(directory: str, compute) -> dict | None:
+    """Tableaux lus en lecture seule par mmap depuis directory/<nom>.npy : leurs pages sont communes aux workers.
+
+    Seul le premier worker appelle compute() et écrit les fichiers ; les suivants les projettent sans rien
+    recalculer, donc sans copie privée même temporaire. None si compute() renvoie None.
+    """
+    import numpy as np
+
+    if not os.path.isdir(directory):
+        arrays = compute()
+        if arrays is None:
+            return None
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+        # Écriture dans un dossier temporaire puis renommage : un autre worker ne lit jamais un dossier à moitié écrit
+        tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(array))
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # Un autre worker vient d'écrire les mêmes tableaux
+    return {
+        name[:-4]: np.load(os.path.join(directory, name), mmap_mode="r")
+        for name in os.listdir(directory) if name.endswith(".npy")
+    }
+
+
+def prune_shared(directory: str) -> None:
+    """Supprime les tableaux partagés des versions précédentes du modèle (voir shared_dir)."""
+    root, keep = os.path.split(directory)
+    for name in os.listdir(root):
+        if name != keep and not name.startswith("."):
+            # Les workers qui projettent encore ces fichiers les gardent jusqu'à leur prochain chargement
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def metadata_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + ".meta.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_model(model, model_path: str, metadata: dict) -> dict:
+    """Écrit le modèle et <modèle>.meta.json sous des noms temporaires, puis les renomme, métadonnées en dernier.
+
+    Un worker qui surveille le dossier ne lit jamais un fichier partiel. Entre les deux renommages, il trouve au
+    pire le nouveau modèle avec les anciennes métadonnées, qu'il ignore (SHA-256 différent).
+    """
+    import joblib
+
+    directory = os.path.dirname(model_path) or "."
+    staged = []
+    try:
+        fd, tmp_model = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        staged.append(tmp_model)
+        joblib.dump(model, tmp_model)
+        metadata = {**metadata, "model_sha256": file_sha256(tmp_model)}
+        fd, tmp_meta = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        staged.append(tmp_meta)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_model, model_path)
+        os.replace(tmp_meta, metadata_path(model_path))
+    finally:
+        for tmp_path in staged:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    return metadata
+
+
+def load_metadata(model_path: str, feature_names) -> dict | None:
+    """Métadonnées du modèle, vérifiées au chargement. None si absentes ou écrites pour un autre fichier modèle.
+
+    Lève ValueError si l'ordre des features diffère de celui de l'API : le modèle ne doit pas être activé.
+    """
+    path = metadata_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        metadata = json.load(f)
+    if metadata.get("model_sha256") != file_sha256(model_path):
+        logger.warning("Métadonnées %s ignorées : elles décrivent un autre fichier modèle", path)
+        return None
+    if list(metadata.get("features", [])) != list(feature_names):
+        raise ValueError(f"Ordre des features du modèle différent de celui de l'API : {metadata.get('features')}")
+    # Un pickle scikit-learn d'une autre version se charge parfois mais peut prédire autrement
+    import sklearn
+
+    trained_with = metadata.get("versions", {}).get("scikit-learn")
+    if trained_with and trained_with != sklearn.__version__:
+        logger.warning("Modèle entraîné avec scikit-learn %s, chargé avec %s", trained_with, sklearn.__version__)
+    return metadata
+
+
+def process_memory() -> dict:
+    """Mémoire du processus courant en octets : rss, pss (part proportionnelle des pages partagées), anonyme, fichiers."""
+    fields = {"Rss": "rss", "Pss": "pss", "Pss_Anon": "anon", "Pss_File": "file"}
+    try:
+        # Linux : smaps_rollup compte les pages partagées au prorata, c'est la bonne mesure pour plusieurs workers
+        with open("/proc/self/smaps_rollup") as f:
+            memory = {}
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    memory[fields[key]] = int(value.split()[0]) * 1024
+            return memory
+    except OSError:
+        import resource
+        import sys
+
+        # Ailleurs : pic de RSS seulement (en octets sur macOS, en kilo-octets ailleurs)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss": peak if sys.platform == "darwin" else peak * 1024}
+
+
+if __name__ == "__main__":
+    from app.ml.scorer import MODEL_DIR
+
+    path = export_mmap(os.path.join(MODEL_DIR, "model.joblib"))
+    print(f"Modèle non compressé exporté dans {path}")
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def model_file_version(path: str) -> str:
+    """Version d'un fichier modèle, dérivée de sa date de modification et de sa taille."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "absent"
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+class PredictionCache:
+    """Cache LRU des prédictions (taille bornée + TTL), clé = profil employé canonique + version du modèle."""
+
+    def __init__(self, maxsize: int, ttl: float, model_path: str, check_interval: float = 1.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.model_path = model_path
+        self.check_interval = check_interval
+        self.model_version = model_file_version(model_path)
+        self._next_check = time.monotonic() + check_interval
+        self._entries = OrderedDict()  # clé -> (prédiction, probabilité, date d'expiration)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def canonical_key(employee) -> tuple:
+        # 3000 et 3000.0 désignent le même profil : tous les nombres sont ramenés en float
+        return tuple(
+            float(value) if isinstance(value, (int, float)) else value
+            for value in employee.model_dump().values()
+        )
+
+    def _check_model_file(self, now: float) -> None:
+        # Au plus un stat() par intervalle : si le fichier modèle change, tout le cache est périmé
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        version = model_file_version(self.model_path)
+        if version != self.model_version:
+            self._entries.clear()
+            self.model_version = version
+
+    def get(self, employee, version: str | None = None):
+        """Renvoie (prédiction, probabilité) si le profil est en cache, sinon None.
+
+        `version` : version du modèle qui sert la requête (registre) ; par défaut, la signature du fichier modèle.
+        """
+        if self.maxsize <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_model_file(now)
+            key = (version or self.model_version, self.canonical_key(employee))
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < now:
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, employee, prediction: int, probability: float, version: str | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            key = (version or self.model_version, self.canonical_key(employee))
+            self._entries[key] = (prediction, probability, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "model_version": self.model_version,
+        }
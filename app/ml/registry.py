@@ -0,0 +1,180 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.ml.prediction_cache import model_file_version
+
+logger = logging.getLogger(__name__)
+
+
+class ModelVersion:
+    """Une version chargée en mémoire : moteur d'inférence prêt et fichier d'origine."""
+
+    def __init__(self, version: str, engine, path: str, features_path: str = ""):
+        self.version = version
+        self.engine = engine
+        self.path = path
+        self.features_path = features_path
+        self.file_version = model_file_version(path)
+        self.loaded_at = time.time()
+
+    def describe(self) -> dict:
+        description = {
+            "version": self.version,
+            "path": os.path.basename(self.path),
+            "backend": self.engine.backend,
+            "loaded_at": self.loaded_at,
+        }
+        metadata = getattr(self.engine, "metadata", None)
+        if metadata:
+            description["training"] = {key: metadata.get(key) for key in ("trained_at", "estimator", "metrics")}
+        return description
+
+
+def validate_engine(engine, validation_data: str | None = None) -> None:
+    """Contrôle d'un candidat avant activation : classes 0/1 et probabilités finies dans [0, 1]. Lève ValueError sinon."""
+    from app.ml.scorer import DEFAULT_VALIDATION_DATA
+
+    validation_data = validation_data or DEFAULT_VALIDATION_DATA
+    if os.path.exists(validation_data):
+        import pandas as pd
+        from app.ml.features import dataset_feature_matrix
+
+        X = dataset_feature_matrix(pd.read_csv(validation_data))
+    else:
+        X = np.array([[3000, 30, 10, 3, 0, 2, 3, 1, 1.0, 375.0]], dtype=np.float64)
+    predictions, probabilities = engine.predict(X)
+    if len(predictions) != len(X) or not set(np.unique(predictions)) <= {0, 1}:
+        raise ValueError("Le modèle candidat renvoie des classes inattendues")
+    if not (np.all(np.isfinite(probabilities)) and np.all((probabilities >= 0) & (probabilities <= 1))):
+        raise ValueError("Le modèle candidat renvoie des probabilités hors de [0, 1]")
+
+
+class ModelRegistry:
+    """Plusieurs versions du modèle en mémoire, bascule atomique de la version active et scoring fantôme.
+
+    Une requête lit `active()` une seule fois et garde cette version jusqu'au bout : la bascule remplace
+    une référence, sans verrou sur le chemin de prédiction et sans requête perdue.
+    """
+
+    def __init__(self, max_versions: int = 3, validation_data: str | None = None):
+        self.max_versions = max_versions
+        self.validation_data = validation_data
+        self._versions = OrderedDict()  # version -> ModelVersion, de la plus ancienne à la plus récente
+        self._active = None
+        self._shadow = None  # (ModelVersion, taux d'échantillonnage)
+        self._lock = threading.Lock()
+        self.loading = {}  # version -> "loading" | message d'erreur, pour les chargements en tâche de fond
+        self.shadow_stats = {"scored": 0, "agree": 0, "abs_diff_sum": 0.0, "errors": 0}
+
+    def active(self) -> ModelVersion | None:
+        return self._active
+
+    def get(self, version: str) -> ModelVersion:
+        return self._versions[version]
+
+    def load(self, model_path: str, features_path: str, version: str | None = None, activate: bool = False,
+             scorer_enabled: bool = True, scorer_path: str = "", mmap: bool = False) -> ModelVersion:
+        """Charge et valide un modèle, l'ajoute au registre et l'active si demandé."""
+        from app.ml.loader import build_engine
+
+        version = version or model_file_version(model_path)
+        engine = build_engine(model_path, features_path, scorer_enabled, scorer_path, mmap)
+        validate_engine(engine, self.validation_data)
+        loaded = ModelVersion(version, engine, model_path, features_path)
+        with self._lock:
+            self._versions[version] = loaded
+            self._versions.move_to_end(version)
+            if activate:
+                self._active = loaded
+            self._evict()
+        logger.info("Modèle %s chargé%s", version, " et activé" if activate else "")
+        return loaded
+
+    def load_background(self, model_path: str, features_path: str, version: str | None = None,
+                        activate: bool = False, **options) -> threading.Thread:
+        """Même chose que load() dans un thread : les requêtes continuent sur la version active pendant ce temps."""
+        version = version or model_file_version(model_path)
+        self.loading[version] = "loading"
+
+        def run():
+            try:
+                self.load(model_path, features_path, version, activate, **options)
+                self.loading.pop(version, None)
+            except Exception as exc:
+                logger.exception("Échec du chargement de la version %s", version)
+                self.loading[version] = f"failed: {exc}"
+
+        thread = threading.Thread(target=run, name=f"model-load-{version}", daemon=True)
+        thread.start()
+        return thread
+
+    def _evict(self) -> None:
+        # Au-delà de max_versions, on libère les plus anciennes, jamais l'active ni la fantôme
+        protected = {self._active, self._shadow[0] if self._shadow else None}
+        for version in list(self._versions):
+            if len(self._versions) <= self.max_versions:
+                break
+            if self._versions[version] not in protected:
+                del self._versions[version]
+
+    def activate(self, version: str) -> ModelVersion:
+        """Bascule atomique vers une version déjà chargée ; KeyError si elle est inconnue."""
+        with self._lock:
+            loaded = self._versions[version]
+            self._active = loaded
+            if self._shadow is not None and self._shadow[0] is loaded:
+                self._shadow = None
+        logger.info("Version active : %s", version)
+        return loaded
+
+    def set_shadow(self, version: str, rate: float) -> None:
+        """Score aussi une part `rate` du trafic avec `version`, sans effet sur les réponses."""
+        with self._lock:
+            self._shadow = (self._versions[version], rate)
+            self.shadow_stats = {"scored": 0, "agree": 0, "abs_diff_sum": 0.0, "errors": 0}
+
+    def clear_shadow(self) -> None:
+        self._shadow = None
+
+    def sample_shadow(self) -> ModelVersion | None:
+        """Version fantôme à utiliser pour cette requête (tirage selon le taux), sinon None."""
+        shadow = self._shadow
+        if shadow is None or random.random() >= shadow[1]:
+            return None
+        return shadow[0]
+
+    def score_shadow(self, shadow: ModelVersion, employee, prediction: int, probability: float) -> None:
+        """Prédit avec la version fantôme et compare au résultat servi ; appelé après l'envoi de la réponse."""
+        try:
+            shadow_prediction, shadow_probability = shadow.engine.predict_one(employee)
+        except Exception:
+            logger.exception("Échec du scoring fantôme (%s)", shadow.version)
+            self.shadow_stats["errors"] += 1
+            return
+        stats = self.shadow_stats
+        stats["scored"] += 1
+        stats["agree"] += int(shadow_prediction == prediction)
+        stats["abs_diff_sum"] += abs(shadow_probability - probability)
+
+    def describe(self) -> dict:
+        shadow = self._shadow
+        stats = self.shadow_stats
+        return {
+            "active": self._active.version if self._active else None,
+            "versions": [loaded.describe() for loaded in self._versions.values()],
+            "loading": dict(self.loading),
+            "shadow": {
+                "version": shadow[0].version,
+                "rate": shadow[1],
+                "scored": stats["scored"],
+                "agreement": stats["agree"] / stats["scored"] if stats["scored"] else None,
+                "mean_abs_diff": stats["abs_diff_sum"] / stats["scored"] if stats["scored"] else None,
+                "errors": stats["errors"],
+            } if shadow else None,
+        }
@@ -0,0 +1,240 @@
+"""Score "compilé" du modèle de churn : quelques tableaux NumPy au lieu de la mécanique scikit-learn.
+
+Export : uv run python -m app.ml.scorer  (écrit Data/model/scorer.npz à côté du modèle)
+"""
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "../../Data/model")
+DEFAULT_SCORER_PATH = os.path.join(MODEL_DIR, "scorer.npz")
+DEFAULT_VALIDATION_DATA = os.path.join(MODEL_DIR, "data/master_dataset.csv")
+
+
+def check_finite(X: np.ndarray) -> None:
+    """Refuse NaN et infini comme les estimateurs scikit-learn remplacés (ValueError)."""
+    if not np.isfinite(X).all():
+        raise ValueError("Input X contains NaN or infinity.")
+
+
+class LinearScorer:
+    """Régression logistique binaire, standardisation repliée dans les coefficients : sigmoïde(X·w + b)."""
+
+    kind = "linear"
+
+    def __init__(self, weights: np.ndarray, bias: float, classes: np.ndarray):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.classes = np.asarray(classes)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        check_finite(X)
+        proba = 1.0 / (1.0 + np.exp(-(X @ self.weights + self.bias)))
+        return np.column_stack([1.0 - proba, proba])
+
+    def to_arrays(self) -> dict:
+        return {"weights": self.weights, "bias": np.array(self.bias)}
+
+    @classmethod
+    def from_arrays(cls, arrays, classes):
+        return cls(arrays["weights"], arrays["bias"], classes)
+
+
+class TreeEnsembleScorer:
+    """Arbres de décision aplatis dans des tableaux de nœuds, parcourus en parallèle pour toutes les lignes."""
+
+    kind = "trees"
+
+    def __init__(self, mean, scale, left, right, feature, threshold, value, roots, classes):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.value = np.asarray(value, dtype=np.float64)  # Probabilité de départ de chaque nœud
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.classes = np.asarray(classes)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        check_finite(X)  # NaN partirait toujours à droite sans erreur
+        # Comme scikit-learn, les arbres comparent les valeurs converties en float32 aux seuils
+        X = ((X - self.mean) / self.scale).astype(np.float32)
+        n_rows = X.shape[0]
+        # Un curseur par (ligne, arbre), tous descendent en même temps jusqu'aux feuilles
+        rows = np.repeat(np.arange(n_rows), len(self.roots))
+        nodes = np.tile(self.roots, n_rows)
+        active = self.left[nodes] >= 0
+        while active.any():
+            current = nodes[active]
+            go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+            active = self.left[nodes] >= 0
+        proba = self.value[nodes].reshape(n_rows, len(self.roots)).mean(axis=1)
+        return np.column_stack([1.0 - proba, proba])
+
+    def to_arrays(self) -> dict:
+        return {name: getattr(self, name) for name in
+                ("mean", "scale", "left", "right", "feature", "threshold", "value", "roots")}
+
+    @classmethod
+    def from_arrays(cls, arrays, classes):
+        return cls(**{name: arrays[name] for name in
+                      ("mean", "scale", "left", "right", "feature", "threshold", "value", "roots")}, classes=classes)
+
+
+SCORER_TYPES = {LinearScorer.kind: LinearScorer, TreeEnsembleScorer.kind: TreeEnsembleScorer}
+
+
+def _flatten_trees(trees, mean, scale, classes):
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        is_leaf = t.children_left < 0
+        roots.append(offset)
+        # Les indices des enfants sont décalés pour pointer dans les tableaux concaténés
+        left.append(np.where(is_leaf, -1, t.children_left + offset))
+        right.append(np.where(is_leaf, -1, t.children_right + offset))
+        feature.append(np.where(is_leaf, 0, t.feature))
+        threshold.append(t.threshold)
+        counts = t.value[:, 0, :]
+        value.append(counts[:, 1] / counts.sum(axis=1))
+        offset += t.node_count
+    return TreeEnsembleScorer(mean, scale, np.concatenate(left), np.concatenate(right),
+                              np.concatenate(feature), np.concatenate(threshold),
+                              np.concatenate(value), np.array(roots), classes)
+
+
+def compile_scorer(model, n_features: int = 10):
+    """Transforme le modèle entraîné en score autonome, ou renvoie None si sa structure n'est pas prise en charge."""
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.tree import DecisionTreeClassifier
+
+    steps = [step for _, step in getattr(model, "steps", [("model", model)])]
+    final = steps[-1]
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    for step in steps[:-1]:
+        if step in (None, "passthrough") or hasattr(step, "fit_resample"):
+            continue  # Les rééchantillonneurs (SMOTE) ne servent qu'à l'entraînement
+        if isinstance(step, StandardScaler):
+            # Deux standardisations successives se composent en une seule : (x - m) / s
+            if step.mean_ is not None:
+                mean = mean + step.mean_ * scale
+            if step.scale_ is not None:
+                scale = scale * step.scale_
+            continue
+        return None
+
+    classes = getattr(final, "classes_", None)
+    if classes is None or len(classes) != 2:
+        return None
+    if isinstance(final, LogisticRegression) and final.coef_.shape[0] == 1:
+        # w·(x - m)/s + b  =  x·(w/s) + (b - w·m/s)
+        weights = final.coef_[0] / scale
+        bias = final.intercept_[0] - weights @ mean
+        return LinearScorer(weights, bias, classes)
+    if isinstance(final, DecisionTreeClassifier):
+        return _flatten_trees([final], mean, scale, classes)
+    if isinstance(final, (RandomForestClassifier, ExtraTreesClassifier)):
+        return _flatten_trees(final.estimators_, mean, scale, classes)
+    return None
+
+
+def save_scorer(scorer, path: str = DEFAULT_SCORER_PATH) -> None:
+    np.savez(path, kind=scorer.kind, classes=scorer.classes, **scorer.to_arrays())
+
+
+def load_scorer(path: str = DEFAULT_SCORER_PATH):
+    with np.load(path) as arrays:
+        return SCORER_TYPES[str(arrays["kind"])].from_arrays(arrays, arrays["classes"])
+
+
+def load_shared_scorer(model, n_features: int, path: str, directory: str):
+    """Score dont les tableaux sont lus par mmap depuis directory/*.npy : une seule copie pour tous les workers.
+
+    scorer.npz ne s'y prête pas (np.load ne projette pas les membres d'une archive) : le premier worker le lit,
+    ou compile le modèle, et écrit les .npy.
+    """
+    from app.ml.model_store import share_arrays
+
+    def compute():
+        scorer = load_scorer(path) if os.path.exists(path) else compile_scorer(model, n_features)
+        if scorer is None:
+            return None
+        return {"kind": np.array(scorer.kind), "classes": scorer.classes, **scorer.to_arrays()}
+
+    arrays = share_arrays(directory, compute)
+    if arrays is None:
+        return None
+    return SCORER_TYPES[str(arrays["kind"])].from_arrays(arrays, np.asarray(arrays["classes"]))
+
+
+@lru_cache(maxsize=4)
+def validation_matrix(path: str = DEFAULT_VALIDATION_DATA) -> np.ndarray:
+    """Features de master_dataset.csv, lues une fois par processus (validation du score, explications)."""
+    import pandas as pd
+    from app.ml.features import dataset_feature_matrix
+
+    X = dataset_feature_matrix(pd.read_csv(path))
+    X.flags.writeable = False  # Partagée entre appelants
+    return X
+
+
+def validate_scorer(scorer, model, X: np.ndarray, feature_names) -> bool:
+    """Vérifie que le score compilé reproduit scikit-learn (probabilités et classes) sur X."""
+    import pandas as pd
+
+    expected = model.predict_proba(pd.DataFrame(X, columns=feature_names))
+    actual = scorer.predict_proba(X)
+    return (
+        np.allclose(actual, expected, rtol=1e-9, atol=1e-12)
+        and np.array_equal(np.argmax(actual, axis=1), np.argmax(expected, axis=1))
+    )
+
+
+def load_validated_scorer(model, feature_names, path: str = DEFAULT_SCORER_PATH,
+                          validation_data: str = DEFAULT_VALIDATION_DATA, shared_dir: str = ""):
+    """Charge (ou compile) le score et le valide sur master_dataset.csv ; None = on reste sur scikit-learn.
+
+    Avec shared_dir, le score est lu par mmap depuis shared_dir/scorer (voir load_shared_scorer).
+    """
+    try:
+        if shared_dir:
+            scorer = load_shared_scorer(model, len(feature_names), path, os.path.join(shared_dir, "scorer"))
+        else:
+            scorer = load_scorer(path) if os.path.exists(path) else compile_scorer(model, len(feature_names))
+    except Exception:
+        logger.exception("Score compilé illisible : %s", path)
+        return None
+    if scorer is None:
+        logger.info("Modèle non pris en charge par le score compilé, on reste sur scikit-learn")
+        return None
+    try:
+        X = validation_matrix(validation_data)
+        valid = validate_scorer(scorer, model, X, feature_names)
+    except Exception:
+        logger.exception("Impossible de valider le score compilé")
+        return None
+    if not valid:
+        logger.warning("Le score compilé ne reproduit pas scikit-learn sur %s, on reste sur scikit-learn", validation_data)
+        return None
+    return scorer
+
+
+if __name__ == "__main__":
+    import joblib
+
+    model = joblib.load(os.path.join(MODEL_DIR, "model.joblib"))
+    scorer = compile_scorer(model)
+    if scorer is None:
+        raise SystemExit("Ce modèle ne peut pas être compilé (structure non prise en charge).")
+    save_scorer(scorer)
+    print(f"Score '{scorer.kind}' exporté dans {DEFAULT_SCORER_PATH}")
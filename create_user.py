@@ -1,11 +1,12 @@
-from app.db.database import SessionLocal, engine, Base
+from app.db.database import SessionLocal, engine
+from app.db.schema import ensure_schema
 from app.db.models import User
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash, invalidate_credentials
 from app.core.config import settings
 
 def create_admin_user():
-    # EQUIVALENT ALEMBIC : On s'assure que les tables existent avant d'ajouter l'user
-    Base.metadata.create_all(bind=engine)
+    # EQUIVALENT ALEMBIC : On s'assure que les tables existent avant d'ajouter l'user (rien à faire si le schéma est à jour)
+    ensure_schema(engine)
 
     db = SessionLocal()
 
@@ -25,6 +26,8 @@ def create_admin_user():
         print(f"L'utilisateur '{username}' existe déjà. Mise à jour du mot de passe...")
         existing_user.hashed_password = get_password_hash(password)
         db.commit()
+        # L'API garde en cache les identifiants vérifiés : on les invalide (et on révoque les jetons)
+        invalidate_credentials(username)
         print(f"Mot de passe pour '{username}' mis à jour avec succès !")
         db.close()
         return
@@ -0,0 +1,117 @@
+import asyncio
+import base64
+
+import pytest
+
+from app.core.admission import ConcurrencyLimiter, Overloaded, RateLimiter, client_key, concurrency_limiter, rate_limiter
+from app.core.config import settings
+from app.core.security import create_access_token, credential_cache
+
+AUTH = ("test_admin", "pomme23")
+
+
+def scope_with(authorization: bytes | None):
+    headers = [(b"authorization", authorization)] if authorization else []
+    return {"headers": headers, "client": ("10.0.0.1", 1234)}
+
+
+def test_client_key_trusts_only_verified_identities(monkeypatch):
+    monkeypatch.setattr(credential_cache, "maxsize", 100)
+    credential_cache.invalidate()
+    basic = b"Basic " + base64.b64encode(b"alice:secret")
+    assert client_key(scope_with(basic)) == "ip:10.0.0.1"  # Pas encore vérifié par bcrypt
+    credential_cache.add("alice", "secret")
+    assert client_key(scope_with(basic)) == "user:alice"
+    assert client_key(scope_with(b"Basic " + base64.b64encode(b"alice:faux"))) == "ip:10.0.0.1"
+    assert client_key(scope_with(b"Bearer " + create_access_token("bob").encode())) == "user:bob"
+    forged = create_access_token("bob")[:-4] + "AAAA"
+    assert client_key(scope_with(b"Bearer " + forged.encode())) == "ip:10.0.0.1"
+    assert client_key(scope_with(None)) == "ip:10.0.0.1"
+    assert client_key(scope_with(b"Basic %%%")) == "ip:10.0.0.1"
+    credential_cache.invalidate()
+
+
+def test_token_bucket_allows_burst_then_refills(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("app.core.admission.time.monotonic", lambda: clock[0])
+    limiter = RateLimiter()
+    assert limiter.acquire("a", rate=2, burst=2) == 0
+    assert limiter.acquire("a", rate=2, burst=2) == 0
+    assert limiter.acquire("a", rate=2, burst=2) == pytest.approx(0.5)
+    assert limiter.acquire("b", rate=2, burst=2) == 0  # Un seau par utilisateur
+    clock[0] += 0.5
+    assert limiter.acquire("a", rate=2, burst=2) == 0
+
+
+def test_concurrency_limiter_queues_then_sheds():
+    async def scenario():
+        limiter = ConcurrencyLimiter()
+        assert await limiter.acquire(1, 1, 1.0) == 0
+        waiting = asyncio.create_task(limiter.acquire(1, 1, 1.0))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as full:
+            await limiter.acquire(1, 1, 1.0)
+        assert full.value.reason == "queue_full"
+        limiter.release()  # La place passe à la requête en attente
+        assert await waiting > 0
+        assert (limiter.active, limiter.queued) == (1, 0)
+        with pytest.raises(Overloaded) as late:
+            await limiter.acquire(1, 1, 0.01)
+        assert late.value.reason == "queue_timeout"
+        limiter.release()
+        assert (limiter.active, limiter.queued) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_rate_limited_client_gets_429_before_bcrypt(client, payload, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_SECOND", 0.01)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 2)
+    rate_limiter.clear()
+    checks = []
+    monkeypatch.setattr("app.main.verify_password", lambda *args: checks.append(args) or False)
+    try:
+        statuses = [client.post("/predict", auth=("test_admin", "MAUVAIS"), json=payload).status_code for _ in range(3)]
+        assert statuses == [401, 401, 429]
+        assert len(checks) == 2  # La requête refusée n'a coûté ni bcrypt ni requête SQL
+        response = client.post("/predict", auth=("inconnu", "x"), json=payload)  # Même adresse, autre nom
+        assert response.status_code == 429 and int(response.headers["Retry-After"]) >= 1
+        assert client.get("/health").status_code == 200  # Les sondes ne sont jamais limitées
+    finally:
+        rate_limiter.clear()
+    assert 'churn_admission_shed_total{reason="rate_limited"}' in client.get("/metrics").text
+
+
+def test_forged_headers_do_not_drain_a_user_bucket(client, payload, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_SECOND", 0.01)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 2)
+    monkeypatch.setattr(credential_cache, "maxsize", 100)
+    rate_limiter.clear()
+    try:
+        token = client.post("/token", auth=AUTH).json()["access_token"]  # Identifiants vérifiés, donc en cache
+        rate_limiter.clear()
+        # Un tiers se fait passer pour test_admin : il ne vide que le seau de son adresse
+        for _ in range(3):
+            client.post("/predict", auth=("test_admin", "MAUVAIS"), json=payload)
+            client.post("/predict", headers={"Authorization": f"Bearer {token[:-4]}AAAA"}, json=payload)
+        assert client.post("/predict", auth=AUTH, json=payload).status_code == 200
+        assert client.post("/predict", headers={"Authorization": f"Bearer {token}"}, json=payload).status_code == 200
+    finally:
+        rate_limiter.clear()
+        credential_cache.invalidate()
+
+
+def test_saturated_worker_sheds_with_503(client, payload, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 0)
+    concurrency_limiter.active += 1  # Une requête occupe déjà l'unique place
+    try:
+        response = client.post("/predict", auth=AUTH, json=payload)
+        assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+        assert client.get("/health").json()["admission"]["shed"]["queue_full"] >= 1
+    finally:
+        concurrency_limiter.active -= 1
+    assert client.post("/predict", auth=AUTH, json=payload).status_code == 200
+    body = client.get("/metrics").text
+    assert "churn_admission_wait_seconds_count" in body
+    assert 'churn_queue_depth{queue="admission"} 0' in body
@@ -1,57 +1,7 @@
 import pytest
-from fastapi.testclient import TestClient
-from app.db.database import Base, get_db, engine, SessionLocal
-from app.main import app
-from app.core.security import get_password_hash
 # On importe les modèles pour être sûr qu'ils sont enregistrés dans Base
 from app.db import models
-
-# La Fixture qui gère la BDD
-@pytest.fixture(scope="function")
-def db_session():
-    # NETTOYAGE PRÉVENTIF : On supprime tout pour partir d'une feuille blanche
-    # (Évite les erreurs si une exécution précédente a crashé sans nettoyer)
-    Base.metadata.drop_all(bind=engine)
-
-    # Crée les tables sur la vraie base
-    Base.metadata.create_all(bind=engine)
-
-    session = SessionLocal()
-
-    # --- CRÉATION DE L'UTILISATEUR DE TEST ---
-    # On utilise des données FIXES pour les tests, indépendantes du .env
-    # C'est une meilleure pratique ("Isolation")
-    test_username = "test_admin"
-    test_password = "pomme23"
-
-    hashed_pwd = get_password_hash(test_password)
-    user = models.User(username=test_username, hashed_password=hashed_pwd)
-    session.add(user)
-    session.commit()
-    # -----------------------------------------
-
-    try:
-        yield session
-    finally:
-        session.close()
-        # Supprime les tables après le test pour nettoyer
-        Base.metadata.drop_all(bind=engine)
-
-# La Fixture CLIENT
-@pytest.fixture(scope="function")
-def client(db_session):
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
-
-    app.dependency_overrides[get_db] = override_get_db
-
-    with TestClient(app) as c:
-        yield c
-
-    app.dependency_overrides.clear()
+# Les fixtures db_session et client sont partagées dans tests/conftest.py
 
 # Payload à la base pour faciliter le multi test
 base_payload = {
@@ -156,3 +106,40 @@ def test_authentication_failed(client):
     )
     assert response.status_code == 401
     assert response.json()["detail"] == "Identifiant ou mot de passe incorrect"
+
+
+def test_predict_batch(client, db_session):
+    """Le lot renvoie une prédiction par employé, identique à /predict, et historise tout"""
+    payloads = [base_payload, {**base_payload, "heures_supp": "Oui", "anciennete": 0, "exp_totale": 0}]
+    response = client.post("/predict/batch", auth=("test_admin", "pomme23"), json=payloads)
+    assert response.status_code == 200
+    results = response.json()
+    assert len(results) == 2
+
+    # Chaque résultat du lot doit correspondre à l'appel unitaire
+    for payload, result in zip(payloads, results):
+        single = client.post("/predict", auth=("test_admin", "pomme23"), json=payload).json()
+        assert result["prediction"] == single["prediction"]
+        assert result["probability"] == pytest.approx(single["probability"])
+
+    assert db_session.query(models.Historique).count() == 4
+
+
+def test_predict_batch_too_large(client, monkeypatch):
+    """Un lot au-delà de la taille maximale est refusé"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "PREDICT_BATCH_MAX_SIZE", 1)
+    response = client.post("/predict/batch", auth=("test_admin", "pomme23"), json=[base_payload] * 2)
+    assert response.status_code == 413
+
+
+def test_predict_batch_size_checked_before_validation(client, monkeypatch):
+    """Le lot trop volumineux est refusé avant la validation de chaque employé ; un employé invalide reste en 422"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "PREDICT_BATCH_MAX_SIZE", 1)
+    # Employés invalides, mais trop nombreux : 413 et non 422
+    response = client.post("/predict/batch", auth=("test_admin", "pomme23"), json=[{"age": 17}] * 2)
+    assert response.status_code == 413
+    response = client.post("/predict/batch", auth=("test_admin", "pomme23"), json=[{**base_payload, "age": 17}])
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", 0, "age"]
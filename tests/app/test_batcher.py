@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+
+from app.core.config import settings
+from app.main import EmployeeInput, model_registry
+from app.ml.batcher import MicroBatcher
+
+
+def employees(payload, n):
+    return [EmployeeInput.model_validate({**payload, "revenu_mensuel": 1000 + 500 * i}) for i in range(n)]
+
+
+def run_concurrently(batcher, people):
+    async def scenario():
+        await batcher.start(model_registry.active())
+        try:
+            return await asyncio.gather(*(batcher.submit(e) for e in people))
+        finally:
+            await batcher.stop()
+    return asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_batches(client, payload):
+    # client : le lifespan a chargé le modèle dans le registre
+    people = employees(payload, 10)
+    batcher = MicroBatcher(max_batch_size=4, max_wait_ms=50)
+    results = run_concurrently(batcher, people)
+    # 10 requêtes simultanées, lots de 4 au plus : 4 + 4 puis 2 au bout du délai d'attente
+    assert (batcher.batches, batcher.rows) == (3, 10)
+
+    engine = model_registry.active().engine
+    expected = [engine.predict_one(e) for e in people]
+    assert [r[0] for r in results] == [e[0] for e in expected]
+    np.testing.assert_allclose([r[1] for r in results], [e[1] for e in expected], rtol=1e-12)
+
+
+def test_process_pool_scoring(client, payload):
+    people = employees(payload, 6)
+    batcher = MicroBatcher(max_batch_size=32, max_wait_ms=20, processes=1)
+    results = run_concurrently(batcher, people)
+    assert batcher.batches == 1
+    expected = model_registry.active().engine.predict_one(people[-1])
+    assert results[-1][0] == expected[0]
+    np.testing.assert_allclose(results[-1][1], expected[1], rtol=1e-12)
+
+
+def test_predict_through_microbatches(db_session, payload, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app, prediction_cache
+    import app.main as main
+
+    monkeypatch.setattr(settings, "INFERENCE_BATCHING", True)
+    prediction_cache.clear()
+    with TestClient(app) as c:
+        response = c.post("/predict", auth=("test_admin", "pomme23"), json=payload)
+        assert response.status_code == 200
+        assert main.inference_batcher.rows == 1
+    assert main.inference_batcher is None
+
+
+def test_microbatches_follow_model_activation(db_session, payload, tmp_path, monkeypatch):
+    import shutil
+    import time
+    from fastapi.testclient import TestClient
+    from app.main import app, model_loader, prediction_cache
+    import app.main as main
+
+    monkeypatch.setattr(settings, "INFERENCE_BATCHING", True)
+    prediction_cache.clear()
+    shutil.copy(model_loader.model_path, tmp_path / "v2.joblib")
+    auth = ("test_admin", "pomme23")
+    with TestClient(app) as c:
+        initial = model_registry.active()
+        try:
+            assert c.post("/predict", auth=auth, json=payload).status_code == 200
+            model_registry.load(str(tmp_path / "v2.joblib"), model_loader.features_path, "v2", activate=True)
+            # Première requête après l'activation : prédite directement, les micro-lots passent à v2 en tâche de fond
+            assert c.post("/predict", auth=auth, json={**payload, "age": 31}).status_code == 200
+            deadline = time.monotonic() + 10
+            while main.inference_batcher.version != "v2" and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert main.inference_batcher.version == "v2"
+            before = main.inference_batcher.batches
+            assert c.post("/predict", auth=auth, json={**payload, "age": 32}).status_code == 200
+            assert main.inference_batcher.batches == before + 1
+        finally:
+            model_registry.activate(initial.version)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from app.db import models
+from app.main import model_loader
+from app.ml.bulk_score import bulk_score
+from app.ml.features import dataset_feature_matrix, frame_feature_matrix, to_input_frame
+from app.ml.scorer import DEFAULT_VALIDATION_DATA
+
+
+def sample_dataset(tmp_path, n=300):
+    path = tmp_path / "employes.csv"
+    pd.read_csv(DEFAULT_VALIDATION_DATA).head(n).to_csv(path, index=False)
+    return path
+
+
+def run(input_path, output_path, **options):
+    return bulk_score(str(input_path), str(output_path), model_loader.model_path, model_loader.features_path, **options)
+
+
+def test_input_frame_matches_dataset_features():
+    df = pd.read_csv(DEFAULT_VALIDATION_DATA)
+    np.testing.assert_array_equal(frame_feature_matrix(to_input_frame(df)), dataset_feature_matrix(df))
+
+
+def test_bulk_score_csv_in_chunks(client, tmp_path):
+    input_path = sample_dataset(tmp_path)
+    summary = run(input_path, tmp_path / "scores.csv", chunksize=64)
+    assert (summary["rows"], summary["chunks"]) == (300, 5)
+
+    scores = pd.read_csv(tmp_path / "scores.csv")
+    df = pd.read_csv(input_path)
+    predictions, probabilities = model_loader.engine.predict(dataset_feature_matrix(df))
+    assert list(scores["id_employee"]) == list(df["id_employee"])
+    np.testing.assert_array_equal(scores["prediction"], predictions)
+    np.testing.assert_allclose(scores["probability"], probabilities, rtol=1e-12)
+
+
+def test_bulk_score_parquet_parallel_to_db(db_session, tmp_path):
+    input_path = tmp_path / "employes.parquet"
+    pd.read_csv(sample_dataset(tmp_path)).to_parquet(input_path)
+    summary = run(input_path, tmp_path / "scores.parquet", chunksize=100, workers=2, to_db=True)
+
+    sequential = run(input_path, tmp_path / "sequential.parquet", chunksize=100)
+    parallel = pd.read_parquet(tmp_path / "scores.parquet")
+    pd.testing.assert_frame_equal(parallel, pd.read_parquet(tmp_path / "sequential.parquet"))
+    assert db_session.query(models.Historique).count() == summary["rows"] == sequential["rows"] == 300
+    assert db_session.query(models.Historique).first().model_version == summary["model_version"]
+
+
+def test_bulk_score_numeric_heures_supp_to_db(db_session, tmp_path):
+    # Heures supplémentaires déjà encodées en 1/0 : historisées en "Oui"/"Non", comptées dans les agrégats
+    df = pd.read_csv(DEFAULT_VALIDATION_DATA).head(50)
+    overtime = int((df["heure_supplementaires"] == "Oui").sum())
+    input_path = tmp_path / "numerique.csv"
+    df.assign(heure_supplementaires=(df["heure_supplementaires"] == "Oui").astype(int)).to_csv(input_path, index=False)
+    run(input_path, tmp_path / "scores.csv", to_db=True)
+
+    scores = pd.read_csv(tmp_path / "scores.csv")
+    _, probabilities = model_loader.engine.predict(dataset_feature_matrix(df))
+    np.testing.assert_allclose(scores["probability"], probabilities, rtol=1e-12)
+    stored = [row.heures_supp for row in db_session.query(models.Historique).order_by(models.Historique.id)]
+    assert stored == list(df["heure_supplementaires"])
+    total = db_session.query(models.HistoriqueRollup).filter_by(metric="heures_supp").one().total
+    assert total == overtime
+
+
+def test_bulk_score_reports_invalid_rows(db_session, tmp_path):
+    df = pd.read_csv(DEFAULT_VALIDATION_DATA).head(20)
+    df["revenu_mensuel"] = df["revenu_mensuel"].astype(float)
+    df.loc[3, "revenu_mensuel"] = np.nan
+    df.loc[5, "age"] = 12
+    df.loc[7, "heure_supplementaires"] = "Peut-être"
+    input_path = tmp_path / "invalides.csv"
+    df.to_csv(input_path, index=False)
+
+    for options in ({}, {"scorer_enabled": False}):
+        summary = run(input_path, tmp_path / "scores.csv", to_db=True, **options)
+        assert (summary["rows"], summary["rejected"]) == (20, 3)
+        scores = pd.read_csv(tmp_path / "scores.csv", keep_default_na=False, na_values=[""])
+        assert list(scores.loc[[3, 5, 7], "invalid_fields"]) == ["revenu_mensuel", "age", "heures_supp"]
+        assert scores.loc[[3, 5, 7], ["prediction", "probability"]].isna().all().all()
+        assert scores.drop(index=[3, 5, 7])["prediction"].notna().all()
+    # Les lignes refusées ne sont jamais historisées
+    assert db_session.query(models.Historique).count() == 2 * 17
@@ -0,0 +1,63 @@
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from app.main import EmployeeInput, drift_monitor, model_loader
+from app.ml.drift import DRIFT_METRICS, DriftMonitor, compute_reference
+from app.ml.features import build_feature_matrix, dataset_feature_matrix
+from app.ml.scorer import DEFAULT_VALIDATION_DATA
+
+
+def reference_monitor(**options):
+    monitor = DriftMonitor(**options)
+    monitor.set_reference(*compute_reference(model_loader.load()))
+    return monitor
+
+
+def test_reference_traffic_is_stable():
+    monitor = reference_monitor()
+    X = dataset_feature_matrix(pd.read_csv(DEFAULT_VALIDATION_DATA))
+    _, probabilities = model_loader.engine.predict(X)
+    monitor.observe_batch(X, probabilities)
+    report = monitor.report()
+    assert report["count"] == len(X)
+    # Le trafic identique aux données d'entraînement retrouve exactement la référence
+    assert all(m["psi"] < 1e-6 and m["ks"] < 1e-9 for m in report["features"].values())
+    assert report["probability"]["status"] == "stable"
+
+
+def test_shifted_feature_is_detected(payload):
+    monitor = reference_monitor()
+    engine = model_loader.engine
+    for age in range(18, 22):  # Uniquement de très jeunes salariés
+        employee = EmployeeInput(**{**payload, "age": age})
+        monitor.observe(employee, engine.predict_one(employee)[1])
+    report = monitor.report()
+    assert report["features"]["age"]["status"] == "significant"
+    assert report["features"]["age"]["ks"] > 0.5
+
+
+def test_observe_matches_batch_and_window_expires(payload):
+    single, batch = reference_monitor(window_seconds=60, slots=6), reference_monitor(window_seconds=60, slots=6)
+    employee = EmployeeInput(**payload)
+    _, probability = model_loader.engine.predict_one(employee)
+    single.observe(employee, probability)
+    batch.observe_batch(build_feature_matrix([employee]), np.array([probability]))
+    np.testing.assert_array_equal(single.window_counts(), batch.window_counts())
+    assert single.window_counts().shape == (len(DRIFT_METRICS), 10)  # Mémoire bornée : slots x metrics x classes
+
+    with patch("app.ml.drift.time.monotonic", return_value=time.monotonic() + 61):
+        assert single.report()["count"] == 0
+        assert single.report()["features"]["age"]["status"] == "no_data"
+
+
+def test_drift_endpoint(client, payload):
+    drift_monitor.prepare(model_loader.load())
+    before = client.get("/drift").json()["count"]
+    client.post("/predict", auth=("test_admin", "pomme23"), json=payload)
+    report = client.get("/drift").json()
+    assert report["ready"] is True
+    assert report["count"] == before + 1
+    assert set(report["features"]) == set(DRIFT_METRICS[:-1])
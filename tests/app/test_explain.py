@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.main import EmployeeInput, model_loader
+from app.ml.explain import TreeExplainer, build_explainer
+from app.ml.features import FEATURE_COLUMNS, build_feature_matrix
+from app.ml.scorer import DEFAULT_VALIDATION_DATA, compile_scorer, validation_matrix
+
+AUTH = ("test_admin", "pomme23")
+
+
+def logit(p):
+    return np.log(p / (1 - p))
+
+
+def test_linear_contributions_are_exact():
+    engine = model_loader.load()
+    X = validation_matrix()
+    _, probabilities = engine.predict(X)
+    contributions = engine.explain(X)
+    assert contributions.shape == (len(X), 10)
+    np.testing.assert_allclose(engine.explainer.base_value + contributions.sum(axis=1), logit(probabilities), atol=1e-9)
+    # En moyenne sur les données de référence, chaque contribution est nulle
+    np.testing.assert_allclose(contributions.mean(axis=0), 0, atol=1e-9)
+
+
+def test_tree_contributions_add_up_to_probability():
+    X = validation_matrix()
+    y = (pd.read_csv(DEFAULT_VALIDATION_DATA)["a_quitte_l_entreprise"] == "Oui").astype(int).to_numpy()
+    forest = Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", RandomForestClassifier(n_estimators=10, max_depth=6, random_state=42)),
+    ]).fit(pd.DataFrame(X, columns=FEATURE_COLUMNS), y)
+    explainer = build_explainer(compile_scorer(forest))
+    assert isinstance(explainer, TreeExplainer)
+    contributions = explainer.contributions(X)
+    np.testing.assert_allclose(explainer.base_value + contributions.sum(axis=1), forest.predict_proba(X)[:, 1], atol=1e-9)
+
+
+def test_predict_with_explanation(client, payload):
+    engine = model_loader.load()
+    body = client.post("/predict", params={"explain": "true"}, auth=AUTH, json=payload).json()
+    assert list(body["contributions"]) == FEATURE_COLUMNS
+    assert body["units"] == "log_odds"
+    assert body["base_value"] + sum(body["contributions"].values()) == pytest.approx(logit(body["probability"]))
+    np.testing.assert_array_equal(
+        list(body["contributions"].values()), engine.explain(build_feature_matrix([EmployeeInput(**payload)]))[0]
+    )
+    assert "contributions" not in client.post("/predict", auth=AUTH, json=payload).json()
+
+    batch = client.post("/predict/batch", params={"explain": "true"}, auth=AUTH,
+                        json=[payload, {**payload, "heures_supp": "Oui"}]).json()
+    assert batch[0]["contributions"] == body["contributions"]
+    assert batch[1]["contributions"]["heure_supplementaires"] > batch[0]["contributions"]["heure_supplementaires"]
+
+
+def test_explain_unavailable_without_compiled_model(client, payload, monkeypatch):
+    monkeypatch.setattr(model_loader.load(), "explainer", None)
+    response = client.post("/predict", params={"explain": "true"}, auth=AUTH, json=payload)
+    assert response.status_code == 501
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from app.main import EmployeeInput
+from app.ml.features import (
+    FEATURE_COLUMNS,
+    INPUT_CONSTRAINTS,
+    INPUT_FIELDS,
+    add_derived_features,
+    build_feature_matrix,
+    compute_features,
+    dataset_feature_matrix,
+    encode_heures_supp,
+    fill_feature_row,
+    frame_feature_matrix,
+    frame_input_matrix,
+    invalid_inputs,
+    safe_ratio,
+)
+from app.ml.scorer import DEFAULT_VALIDATION_DATA
+
+
+def profiles(payload):
+    # Cas limites compris : ancienneté et expérience nulles (garde-fous contre la division par zéro)
+    return [
+        EmployeeInput.model_validate({**payload, "revenu_mensuel": 1000 + 777 * i, "heures_supp": "Oui" if i % 2 else "Non",
+                                      "anciennete": i % 3, "exp_totale": (i % 4) * 1.5})
+        for i in range(12)
+    ]
+
+
+def test_record_batch_numpy_and_frame_agree(payload):
+    employees = profiles(payload)
+    rows = np.array([fill_feature_row(np.empty(len(FEATURE_COLUMNS)), e) for e in employees])
+    batch = build_feature_matrix(employees)
+
+    frame = pd.DataFrame([e.model_dump() for e in employees])
+    raw = frame[INPUT_FIELDS].assign(heures_supp=(frame["heures_supp"] == "Oui").astype(float)).to_numpy()
+
+    # Égalité au bit près entre les quatre entrées possibles
+    np.testing.assert_array_equal(rows, batch)
+    np.testing.assert_array_equal(compute_features(raw), batch)
+    np.testing.assert_array_equal(frame_feature_matrix(frame), batch)
+    assert batch.flags.f_contiguous
+
+
+def test_zero_guards():
+    raw = np.array([[30, 3000, 10, 3, 1, 2, 3, 1, 4, 0, 0]], dtype=np.float64)
+    features = compute_features(raw)[0]
+    assert features[8] == 4.0 and features[9] == 3000.0  # Dénominateurs nuls remplacés par 1
+    # Même garde-fou en scalaire (fill_feature_row) et en tableau, y compris négatif et manquant
+    denominators = [0, -2, float("nan"), 0.5, 3]
+    vectorised = safe_ratio(np.full(5, 7.0), np.array(denominators, dtype=np.float64))
+    np.testing.assert_array_equal([safe_ratio(7, d) for d in denominators], vectorised)
+
+
+def test_training_features_match_api():
+    df = pd.read_csv(DEFAULT_VALIDATION_DATA)
+    # Comme le notebook : heures supplémentaires encodées par encode_heures_supp avant l'ajout des ratios
+    training = add_derived_features(df.assign(heure_supplementaires=df["heure_supplementaires"].map(encode_heures_supp)))
+    np.testing.assert_array_equal(training[FEATURE_COLUMNS].to_numpy(dtype=np.float64), dataset_feature_matrix(df))
+
+
+def test_input_constraints_follow_employee_input():
+    # La validation vectorisée du scoring en masse reprend les bornes de /predict
+    for field, (minimum, maximum, integer) in INPUT_CONSTRAINTS.items():
+        if field == "heures_supp":
+            continue
+        info = EmployeeInput.model_fields[field]
+        bounds = {type(m).__name__: m for m in info.metadata}
+        assert (bounds["Ge"].ge if "Ge" in bounds else None) == minimum, field
+        assert (bounds["Le"].le if "Le" in bounds else None) == maximum, field
+        assert (info.annotation is int) == integer, field
+
+
+def test_invalid_inputs_flags_what_predict_rejects(payload):
+    frame = pd.DataFrame([payload, {**payload, "age": 17}, {**payload, "revenu_mensuel": None},
+                          {**payload, "heures_supp": "Peut-être"}, {**payload, "pee": 1.5}])
+    invalid = invalid_inputs(frame_input_matrix(frame))
+    assert [list(np.array(INPUT_FIELDS)[row]) for row in invalid] == [
+        [], ["age"], ["revenu_mensuel"], ["heures_supp"], ["pee"],
+    ]
@@ -0,0 +1,68 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.main import EmployeeInput
+from app.ml.features import FEATURE_COLUMNS, build_feature_matrix
+from app.ml.inference import InferenceEngine
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "../../Data/model")
+
+
+@pytest.fixture(scope="module")
+def model():
+    return joblib.load(os.path.join(MODEL_DIR, "model.joblib"))
+
+
+@pytest.fixture(scope="module")
+def employees():
+    # Quelques profils variés, dont les cas de division par zéro
+    rng = np.random.default_rng(42)
+    return [
+        EmployeeInput(
+            age=int(rng.integers(18, 71)),
+            revenu_mensuel=float(rng.uniform(1000, 20000)),
+            distance_domicile_travail=float(rng.integers(0, 30)),
+            satisfaction_environnement=int(rng.integers(1, 5)),
+            heures_supp=str(rng.choice(["Oui", "Non"])),
+            annees_promo=int(rng.integers(0, 15)),
+            satisfaction_equilibre=int(rng.integers(1, 5)),
+            pee=int(rng.integers(0, 4)),
+            poste_actuel=int(rng.integers(0, 15)),
+            anciennete=int(rng.integers(0, 20)),
+            exp_totale=float(rng.integers(0, 40)),
+        )
+        for _ in range(50)
+    ]
+
+
+def test_features_match_model_columns():
+    assert joblib.load(os.path.join(MODEL_DIR, "features.joblib")) == FEATURE_COLUMNS
+
+
+def test_fast_path_parity(model, employees):
+    """Le chemin NumPy donne exactement les mêmes probabilités que le DataFrame pandas"""
+    engine = InferenceEngine(model, FEATURE_COLUMNS)
+    assert engine.fast_path
+
+    matrix = build_feature_matrix(employees)
+    fast_labels, fast_probas = engine.predict(matrix)
+    slow_labels, slow_probas = engine.predict(matrix, use_fast_path=False)
+    np.testing.assert_array_equal(fast_probas, slow_probas)
+    np.testing.assert_array_equal(fast_labels, slow_labels)
+
+    # Et une ligne à la fois, via le tampon préalloué, contre l'ancien DataFrame d'une ligne
+    reference = [
+        model.predict_proba(pd.DataFrame([dict(zip(FEATURE_COLUMNS, row))]))[0][1]
+        for row in matrix
+    ]
+    singles = [engine.predict_one(e)[1] for e in employees]
+    np.testing.assert_array_equal(singles, reference)
+
+
+def test_fallback_when_feature_order_differs(model, employees):
+    engine = InferenceEngine(model, list(reversed(FEATURE_COLUMNS)))
+    assert not engine.fast_path
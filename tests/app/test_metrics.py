@@ -0,0 +1,35 @@
+from app.core.config import settings
+from app.core.metrics import Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_duration_seconds", "test", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5.0, "a")
+    lines = list(histogram.render())
+    assert 'test_duration_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_duration_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_duration_seconds_count{stage="a"} 3' in lines
+
+
+def test_metrics_endpoint_exposes_stages_and_requests(client, payload):
+    client.post("/predict", auth=("test_admin", "pomme23"), json=payload)
+    client.post("/predict", auth=("test_admin", "MAUVAIS"), json=payload)
+    body = client.get("/metrics").text
+
+    for stage in ("auth", "cache_lookup", "feature_engineering", "inference", "history"):
+        assert f'churn_stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert 'churn_http_requests_total{route="/predict",method="POST",status="200"}' in body
+    assert 'churn_http_requests_total{route="/predict",method="POST",status="401"}' in body
+    assert 'churn_queue_depth{queue="history"} 0' in body
+    assert "churn_model_info{" in body
+    assert 'churn_db_pool_connections{state="checked_out"}' in body
+
+
+def test_sampled_profiling_writes_traces(client, payload, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    client.post("/predict", auth=("test_admin", "pomme23"), json=payload)
+    assert len(list(tmp_path.iterdir())) == 1
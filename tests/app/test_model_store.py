@@ -0,0 +1,64 @@
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.main import model_loader
+from app.ml.loader import build_engine
+from app.ml.model_store import load_model, mmap_model_path, process_memory, shared_dir
+from app.ml.scorer import validation_matrix
+
+
+def test_mmap_model_shares_arrays(tmp_path):
+    model_path = tmp_path / "model.joblib"
+    shutil.copy(model_loader.model_path, model_path)
+
+    model = load_model(str(model_path), mmap=True)
+    assert os.path.exists(mmap_model_path(str(model_path)))
+    assert isinstance(model.named_steps["model"].coef_, np.memmap)
+
+    # Même résultat qu'un chargement classique, et la copie rapide réutilise les tableaux projetés
+    engine = build_engine(str(model_path), model_loader.features_path, scorer_enabled=False, mmap=True)
+    reference = build_engine(str(model_path), model_loader.features_path, scorer_enabled=False)
+    assert engine.fast_model.named_steps["model"].coef_ is engine.model.named_steps["model"].coef_
+    X = np.array([[3000, 30, 10, 3, 0, 2, 3, 1, 1.0, 375.0]])
+    np.testing.assert_array_equal(engine.predict(X)[1], reference.predict(X)[1])
+
+
+def test_mmap_shares_tree_scorer_and_explainer_arrays(tmp_path):
+    # scikit-learn recopie les nœuds des arbres au chargement : ce sont le score et l'explicateur qui sont projetés
+    feature_names = joblib.load(model_loader.features_path)
+    X = validation_matrix()
+    forest = Pipeline([("scaler", StandardScaler()), ("model", RandomForestClassifier(n_estimators=5, random_state=0))])
+    forest.fit(pd.DataFrame(X, columns=feature_names), X[:, 0] > np.median(X[:, 0]))
+    model_path = tmp_path / "forest.joblib"
+    joblib.dump(forest, model_path)
+
+    engine = build_engine(str(model_path), model_loader.features_path, mmap=True)
+    assert engine.backend == "compiled"
+    assert isinstance(engine.scorer.left.base, np.memmap) and isinstance(engine.scorer.threshold.base, np.memmap)
+    assert isinstance(engine.explainer.delta, np.memmap)
+    shared = shared_dir(str(model_path), str(tmp_path / "forest.scorer.npz"))
+    assert sorted(os.listdir(shared)) == ["explain", "scorer"]
+
+    reference = build_engine(str(model_path), model_loader.features_path)
+    np.testing.assert_array_equal(engine.predict(X[:50])[1], reference.predict(X[:50])[1])
+    np.testing.assert_array_equal(engine.explainer.contributions(X[:5]), reference.explainer.contributions(X[:5]))
+    # Second chargement (autre worker) : mêmes fichiers, rien n'est réécrit
+    mtime = os.path.getmtime(os.path.join(shared, "scorer", "left.npy"))
+    build_engine(str(model_path), model_loader.features_path, mmap=True)
+    assert os.path.getmtime(os.path.join(shared, "scorer", "left.npy")) == mtime
+    # Nouveau modèle : nouveau dossier, l'ancien est supprimé
+    forest.set_params(model__n_estimators=3).fit(pd.DataFrame(X, columns=feature_names), X[:, 1] > np.median(X[:, 1]))
+    joblib.dump(forest, model_path)
+    build_engine(str(model_path), model_loader.features_path, mmap=True)
+    assert os.listdir(os.path.dirname(shared)) == [os.path.basename(shared_dir(str(model_path)))]
+
+
+def test_process_memory_reports_rss():
+    assert process_memory()["rss"] > 0
@@ -0,0 +1,60 @@
+import os
+import time
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.db import models
+from app.main import EmployeeInput, prediction_cache
+from app.ml.prediction_cache import PredictionCache
+
+
+def test_cache_lru_ttl_and_counters(payload, tmp_path):
+    model_file = tmp_path / "model.joblib"
+    model_file.write_bytes(b"v1")
+    cache = PredictionCache(maxsize=2, ttl=60, model_path=str(model_file))
+    a = EmployeeInput(**payload)
+    b = EmployeeInput(**{**payload, "age": 40})
+    c = EmployeeInput(**{**payload, "age": 50})
+
+    assert cache.get(a) is None
+    cache.put(a, 0, 0.2)
+    # 3000 et 3000.0 donnent la même clé canonique
+    assert cache.get(EmployeeInput(**{**payload, "revenu_mensuel": 3000.0})) == (0, 0.2)
+
+    cache.put(b, 1, 0.8)
+    assert cache.get(a) == (0, 0.2)  # a redevient le plus récemment utilisé
+    cache.put(c, 1, 0.9)  # b est donc évincé
+    assert cache.get(b) is None
+    assert cache.stats()["evictions"] == 1
+
+    with patch("app.ml.prediction_cache.time.monotonic", return_value=time.monotonic() + 61):
+        assert cache.get(a) is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_cache_cleared_when_model_file_changes(payload, tmp_path):
+    model_file = tmp_path / "model.joblib"
+    model_file.write_bytes(b"v1")
+    cache = PredictionCache(maxsize=10, ttl=60, model_path=str(model_file), check_interval=0)
+    employee = EmployeeInput(**payload)
+    cache.put(employee, 0, 0.2)
+    assert cache.get(employee) == (0, 0.2)
+
+    model_file.write_bytes(b"modele re-entraine")
+    os.utime(model_file, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert cache.get(employee) is None
+
+
+def test_predict_served_from_cache(client, db_session, payload, monkeypatch):
+    first = client.post("/predict", auth=("test_admin", "pomme23"), json=payload).json()
+    with patch("app.main.model_loader.engine.predict_one") as predict_one:
+        second = client.post("/predict", auth=("test_admin", "pomme23"), json=payload).json()
+        predict_one.assert_not_called()
+    assert first == second
+    assert client.get("/cache/stats").json()["hits"] == prediction_cache.hits
+    assert db_session.query(models.Historique).count() == 2
+
+    # Option : les réponses servies depuis le cache ne sont pas historisées
+    monkeypatch.setattr(settings, "PREDICTION_CACHE_WRITE_HISTORY", False)
+    client.post("/predict", auth=("test_admin", "pomme23"), json=payload)
+    assert db_session.query(models.Historique).count() == 2
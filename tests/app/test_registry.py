@@ -0,0 +1,83 @@
+import shutil
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app.db import models
+from app.db.schema import ensure_schema
+from app.main import model_registry, model_loader
+from app.ml.registry import ModelRegistry, validate_engine
+
+
+def load_copy(registry, tmp_path, version, **options):
+    # Copie du modèle livré : un autre fichier, donc une version distincte
+    path = tmp_path / f"{version}.joblib"
+    shutil.copy(model_loader.model_path, path)
+    return registry.load(str(path), model_loader.features_path, version, **options)
+
+
+def test_registry_swap_and_eviction(tmp_path):
+    registry = ModelRegistry(max_versions=2)
+    load_copy(registry, tmp_path, "v1", activate=True)
+    before = registry.active()
+    load_copy(registry, tmp_path, "v2")
+    assert registry.active() is before  # Chargée mais pas encore active
+
+    registry.activate("v2")
+    assert registry.active().version == "v2"
+    assert before.engine.predict_one  # L'ancienne version reste utilisable par les requêtes en cours
+
+    load_copy(registry, tmp_path, "v3")
+    assert [v["version"] for v in registry.describe()["versions"]] == ["v2", "v3"]
+    with pytest.raises(KeyError):
+        registry.activate("v1")
+
+
+def test_validate_engine_rejects_bad_probabilities():
+    class BrokenEngine:
+        def predict(self, X):
+            return np.zeros(len(X), dtype=int), np.full(len(X), 1.5)
+
+    with pytest.raises(ValueError):
+        validate_engine(BrokenEngine())
+
+
+def test_hot_swap_through_api(client, db_session, payload, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.main.model_dir", str(tmp_path))
+    shutil.copy(model_loader.model_path, tmp_path / "candidat.joblib")
+    initial = model_registry.active()
+    auth = ("test_admin", "pomme23")
+    try:
+        response = client.post("/models/load", auth=auth, json={"path": "candidat.joblib", "version": "candidat", "shadow_rate": 1.0})
+        assert response.status_code == 202
+        deadline = time.monotonic() + 60
+        while model_registry.describe()["shadow"] is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        # Candidat en fantôme : la réponse vient toujours de la version active
+        client.post("/predict", auth=auth, json=payload)
+        stats = client.get("/models", auth=auth).json()["shadow"]
+        assert stats["scored"] == 1 and stats["agreement"] == 1.0
+        assert db_session.query(models.Historique).one().model_version == initial.version
+
+        assert client.post("/models/candidat/activate", auth=auth).json()["active"] == "candidat"
+        client.post("/predict", auth=auth, json={**payload, "age": 40})
+        latest = db_session.query(models.Historique).order_by(models.Historique.id.desc()).first()
+        assert latest.model_version == "candidat"
+
+        assert client.post("/models/inconnu/activate", auth=auth).status_code == 404
+        assert client.post("/models/load", auth=auth, json={"path": "../../etc/passwd"}).status_code == 400
+    finally:
+        model_registry.activate(initial.version)
+        model_registry.clear_shadow()
+
+
+def test_schema_upgrade_adds_model_version(tmp_path):
+    bind = create_engine(f"sqlite:///{tmp_path / 'ancienne.db'}")
+    with bind.begin() as connection:
+        connection.execute(text("CREATE TABLE historique_predictions (id INTEGER PRIMARY KEY, prediction INTEGER)"))
+    ensure_schema(bind)
+    columns = {column["name"] for column in inspect(bind).get_columns("historique_predictions")}
+    assert "model_version" in columns
@@ -0,0 +1,81 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.ml.features import FEATURE_COLUMNS, dataset_feature_matrix
+from app.ml.scorer import (
+    DEFAULT_VALIDATION_DATA,
+    LinearScorer,
+    TreeEnsembleScorer,
+    compile_scorer,
+    load_scorer,
+    load_validated_scorer,
+    save_scorer,
+    validate_scorer,
+)
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "../../Data/model")
+
+
+@pytest.fixture(scope="module")
+def model():
+    return joblib.load(os.path.join(MODEL_DIR, "model.joblib"))
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    df = pd.read_csv(DEFAULT_VALIDATION_DATA)
+    return dataset_feature_matrix(df), (df["a_quitte_l_entreprise"] == "Oui").astype(int).to_numpy()
+
+
+def test_linear_scorer_matches_sklearn(model, dataset, tmp_path):
+    X, _ = dataset
+    scorer = compile_scorer(model)
+    assert isinstance(scorer, LinearScorer)
+    assert validate_scorer(scorer, model, X, FEATURE_COLUMNS)
+
+    # Aller-retour sur disque
+    path = str(tmp_path / "scorer.npz")
+    save_scorer(scorer, path)
+    np.testing.assert_array_equal(load_scorer(path).predict_proba(X), scorer.predict_proba(X))
+
+
+def test_tree_scorer_matches_sklearn(dataset):
+    X, y = dataset
+    forest = Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", RandomForestClassifier(n_estimators=10, max_depth=6, random_state=42)),
+    ]).fit(pd.DataFrame(X, columns=FEATURE_COLUMNS), y)
+    scorer = compile_scorer(forest)
+    assert isinstance(scorer, TreeEnsembleScorer)
+    assert validate_scorer(scorer, forest, X, FEATURE_COLUMNS)
+
+
+def test_invalid_scorer_falls_back(model, tmp_path):
+    """Un score exporté qui ne reproduit plus le modèle est écarté au chargement"""
+    scorer = compile_scorer(model)
+    scorer.weights = scorer.weights * 1.01
+    path = str(tmp_path / "scorer.npz")
+    save_scorer(scorer, path)
+    assert load_validated_scorer(model, FEATURE_COLUMNS, path) is None
+    assert load_validated_scorer(model, FEATURE_COLUMNS, str(tmp_path / "absent.npz")) is not None
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf, -np.inf])
+def test_scorers_reject_non_finite_input(model, dataset, bad):
+    X, y = dataset
+    forest = RandomForestClassifier(n_estimators=3, max_depth=3, random_state=42).fit(X, y)
+    row = X[:2].copy()
+    row[1, 3] = bad
+    # Même refus que le modèle scikit-learn remplacé
+    with pytest.raises(ValueError):
+        model.predict_proba(pd.DataFrame(row, columns=FEATURE_COLUMNS))
+    for scorer in (compile_scorer(model), compile_scorer(forest)):
+        with pytest.raises(ValueError, match="NaN or infinity"):
+            scorer.predict_proba(row)
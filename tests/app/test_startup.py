@@ -0,0 +1,60 @@
+import logging
+import sys
+import subprocess
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.db.database import engine
+from app.db.schema import SCHEMA_VERSION, ensure_schema, schema_is_current
+from app.main import model_loader
+from app.ml.loader import ModelLoader
+
+
+def test_ready_after_startup(client):
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_predict_returns_503_while_loading(client, payload, monkeypatch):
+    monkeypatch.setattr(model_loader, "state", "loading")
+    assert client.get("/ready").status_code == 503
+    response = client.post("/predict", auth=("test_admin", "pomme23"), json=payload)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_loader_background_and_missing_model(tmp_path):
+    loader = ModelLoader(model_loader.model_path, model_loader.features_path)
+    loader.start_background()
+    assert loader.wait(timeout=60)
+    assert loader.ready and loader.engine is not None
+
+    missing = ModelLoader(str(tmp_path / "absent.joblib"), str(tmp_path / "features.joblib"))
+    assert missing.load() is None
+    assert missing.state == "absent"
+
+
+def test_schema_version_skips_create_all(db_session):
+    # db_session crée les tables par ensure_schema, comme le démarrage : la version est déjà enregistrée
+    assert schema_is_current(engine)
+    assert ensure_schema(engine) is False
+    assert SCHEMA_VERSION >= 1
+
+
+def test_import_does_not_load_heavy_modules():
+    # Importer l'application ne doit plus charger scikit-learn, joblib ni pandas
+    code = "import sys, app.main; print(sorted({'sklearn', 'joblib', 'pandas', 'imblearn'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_startup_survives_history_maintenance_failure(db_session, monkeypatch, caplog):
+    def broken(*args, **kwargs):
+        raise RuntimeError("DDL refusé")
+
+    monkeypatch.setattr(main, "maintain_history", broken)
+    with caplog.at_level(logging.ERROR), TestClient(main.app) as client:
+        assert client.get("/ready").status_code == 200
+    assert "Échec de la maintenance de l'historique au démarrage" in caplog.text
@@ -0,0 +1,68 @@
+import json
+import os
+
+import joblib
+import pytest
+
+from Data.model.train import _feature_matrix, load_features, train
+from app.ml.features import FEATURE_COLUMNS
+from app.ml.loader import build_engine
+from app.ml.model_store import file_sha256, load_metadata, metadata_path
+from app.ml.scorer import DEFAULT_VALIDATION_DATA
+
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    output = tmp_path_factory.mktemp("model")
+    # Petite grille : on vérifie la mécanique, pas la qualité du modèle
+    metadata = train(output_dir=str(output), cache_dir=str(output / "cache"), n_jobs=1, folds=3,
+                     grid={"model__C": [0.1, 1.0]})
+    return output, metadata
+
+
+def test_training_writes_model_features_and_metadata(trained):
+    output, metadata = trained
+    assert joblib.load(output / "features.joblib") == FEATURE_COLUMNS
+    saved = json.loads((output / "model.meta.json").read_text())
+    assert saved["features"] == FEATURE_COLUMNS
+    assert saved["model_sha256"] == file_sha256(str(output / "model.joblib"))
+    assert saved["fits"] == 6 and saved["params"]["model__C"] in (0.1, 1.0)
+    assert set(saved["metrics"]) == {"roc_auc", "recall", "precision", "f1", "accuracy"}
+    assert saved["training_seconds"]["total"] >= saved["training_seconds"]["search"] > 0
+    assert metadata["metrics"] == saved["metrics"]
+    # Fichiers temporaires tous renommés
+    assert not list(output.glob("*.tmp"))
+
+
+def test_model_keeps_feature_names(trained):
+    output, _ = trained
+    model = joblib.load(output / "model.joblib")
+    assert list(model.feature_names_in_) == FEATURE_COLUMNS
+    engine = build_engine(str(output / "model.joblib"), str(output / "features.joblib"))
+    assert engine.fast_path and engine.backend == "compiled"
+
+
+def test_feature_matrix_is_cached_on_disk(trained):
+    output, _ = trained
+    memory = joblib.Memory(str(output / "cache"), verbose=0)
+    cached = memory.cache(_feature_matrix)
+    assert cached.check_call_in_cache(os.path.abspath(DEFAULT_VALIDATION_DATA), file_sha256(DEFAULT_VALIDATION_DATA))
+    X, y = load_features(DEFAULT_VALIDATION_DATA, memory)
+    assert X.shape == (len(y), len(FEATURE_COLUMNS))
+
+
+def test_api_checks_metadata_at_load(trained):
+    output, metadata = trained
+    engine = build_engine(str(output / "model.joblib"), str(output / "features.joblib"))
+    assert engine.metadata["trained_at"] == metadata["trained_at"]
+    with pytest.raises(ValueError):
+        load_metadata(str(output / "model.joblib"), list(reversed(FEATURE_COLUMNS)))
+
+
+def test_metadata_of_another_model_is_ignored(trained, tmp_path):
+    output, _ = trained
+    model_path = tmp_path / "model.joblib"
+    model_path.write_bytes((output / "model.joblib").read_bytes() + b"autre")
+    with open(metadata_path(str(model_path)), "w") as f:
+        f.write((output / "model.meta.json").read_text())
+    assert load_metadata(str(model_path), FEATURE_COLUMNS) is None
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+import numpy as np
+
+from app.db import models
+from app.main import EmployeeInput, model_loader
+from app.ml.features import build_feature_matrix, scenario_matrix
+
+AUTH = ("test_admin", "pomme23")
+
+
+def test_scenario_matrix_matches_individual_employees(payload):
+    employee = EmployeeInput(**payload)
+    variations = {"revenu_mensuel": [2000.0, 3000.0, 4500.0], "heures_supp": ["Oui", "Non"], "anciennete": [0, 7]}
+    matrix = scenario_matrix(employee, variations)
+    expected = build_feature_matrix([
+        EmployeeInput(**{**payload, "revenu_mensuel": r, "heures_supp": h, "anciennete": a})
+        for r in variations["revenu_mensuel"] for h in variations["heures_supp"] for a in variations["anciennete"]
+    ])
+    np.testing.assert_array_equal(matrix, expected)
+
+
+def test_whatif_scores_grid_in_one_call_without_history(client, db_session, payload):
+    variations = {"revenu_mensuel": [2000, 4000, 8000], "heures_supp": ["Oui", "Non"], "annees_promo": [0, 5]}
+    engine = model_loader.load()
+    with patch.object(engine, "predict", wraps=engine.predict) as predict:
+        response = client.post("/predict/whatif", auth=AUTH, json={"employee": payload, "variations": variations})
+    # Un seul appel au modèle pour l'employé et ses 12 scénarios (la référence de dérive peut aussi appeler predict)
+    assert [call.args[0].shape for call in predict.call_args_list].count((13, 10)) == 1
+    assert response.status_code == 200
+    body = response.json()
+    assert body["shape"] == [3, 2, 2]
+    surface = np.array(body["probabilities"])
+    assert surface.shape == (3, 2, 2)
+
+    # Chaque point de la surface est la probabilité de /predict pour ce scénario
+    _, probability = engine.predict_one(EmployeeInput(**{**payload, "revenu_mensuel": 8000, "heures_supp": "Non", "annees_promo": 5}))
+    assert surface[2, 1, 1] == probability
+    assert body["probability"] == engine.predict_one(EmployeeInput(**payload))[1]
+    assert body["lowest"]["probability"] == surface.min()
+    assert db_session.query(models.Historique).count() == 0
+
+
+def test_whatif_rejects_invalid_variations(client, payload, monkeypatch):
+    def post(variations):
+        return client.post("/predict/whatif", auth=AUTH, json={"employee": payload, "variations": variations})
+
+    assert post({"age": [17]}).status_code == 422  # Même contrainte que /predict (18 à 70 ans)
+    assert post({"salaire": [1000]}).status_code == 422
+    assert post({"heures_supp": ["Peut-être"]}).status_code == 422
+    monkeypatch.setattr("app.main.settings.WHATIF_MAX_SCENARIOS", 10)
+    assert post({"revenu_mensuel": list(range(1000, 5000, 1000)), "age": [20, 30, 40]}).status_code == 413
+
+
+def test_whatif_rejects_oversized_grid_before_validating_values(client, payload, monkeypatch):
+    monkeypatch.setattr("app.main.settings.WHATIF_MAX_SCENARIOS", 100)
+    variations = {"revenu_mensuel": list(range(1000, 1200)), "age": [17] * 50}  # Valeurs invalides, grille trop grande
+    with patch.object(EmployeeInput, "model_validate", wraps=EmployeeInput.model_validate) as validate:
+        response = client.post("/predict/whatif", auth=AUTH, json={"employee": payload, "variations": variations})
+    assert response.status_code == 413
+    assert validate.call_count == 0
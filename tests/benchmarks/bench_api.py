@@ -0,0 +1,198 @@
+"""Benchmark de l'API : latences p50/p95/p99 et débit par niveau de concurrence, plus le coût de chaque étape.
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_api                      # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_api --update-baseline    # enregistre la référence
+
+Un uvicorn local est lancé sur une base SQLite temporaire (ou --database-url pour un PostgreSQL local).
+Le script sort en erreur (code 1) si une mesure régresse au-delà de --tolerance.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.benchmarks.common import (
+    DEFAULT_BASELINE,
+    DEFAULT_OUTPUT,
+    check_against_baseline,
+    percentiles,
+    time_stage,
+    write_json,
+)
+
+BENCH_USER = ("bench_admin", "bench_password")
+PAYLOAD = {
+    "age": 30, "revenu_mensuel": 3000, "distance_domicile_travail": 10,
+    "satisfaction_environnement": 3, "heures_supp": "Non", "annees_promo": 2,
+    "satisfaction_equilibre": 3, "pee": 1, "poste_actuel": 5, "anciennete": 5, "exp_totale": 8,
+}
+
+
+def random_payload(rng: random.Random) -> dict:
+    # Des profils tous différents : on mesure le vrai chemin de calcul, pas le cache de prédictions
+    return {**PAYLOAD, "revenu_mensuel": round(rng.uniform(1000, 20000), 2), "age": rng.randint(18, 70)}
+
+
+def prepare_database() -> None:
+    """Crée les tables et l'utilisateur de benchmark sur DATABASE_URL."""
+    from app.core.security import get_password_hash
+    from app.db.database import Base, SessionLocal, engine
+    from app.db.models import User
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if not db.query(User).filter(User.username == BENCH_USER[0]).first():
+            db.add(User(username=BENCH_USER[0], hashed_password=get_password_hash(BENCH_USER[1])))
+            db.commit()
+
+
+def bench_stages(repeat: int) -> dict:
+    """Coût isolé de chaque étape du chemin /predict."""
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import insert
+
+    from app.core.security import get_password_hash, verify_password
+    from app.db.database import SessionLocal
+    from app.db.models import Historique
+    from app.main import EmployeeInput, model_loader, model_path
+    from app.ml.features import FEATURE_COLUMNS, fill_feature_row
+
+    engine_ml = model_loader.load()
+    model = joblib.load(model_path)
+    employee = EmployeeInput.model_validate(PAYLOAD)
+    row = np.empty((1, len(FEATURE_COLUMNS)))
+    fill_feature_row(row[0], employee)
+    frame = pd.DataFrame([dict(zip(FEATURE_COLUMNS, row[0]))])
+    history_row = {**PAYLOAD, "prediction": 0, "probability": 0.1}
+    hashed = get_password_hash(BENCH_USER[1])
+
+    def db_commit():
+        with SessionLocal() as db:
+            db.execute(insert(Historique), [dict(history_row)])
+            db.commit()
+
+    return {
+        "validation": time_stage(lambda: EmployeeInput.model_validate(PAYLOAD), repeat),
+        "feature_engineering": time_stage(lambda: fill_feature_row(row[0], employee), repeat),
+        "dataframe_build": time_stage(lambda: pd.DataFrame([dict(zip(FEATURE_COLUMNS, row[0]))]), repeat),
+        "predict_proba_sklearn": time_stage(lambda: model.predict_proba(frame), repeat),
+        # Clé stable quel que soit le moteur : un repli sur scikit-learn apparaît comme une régression, pas comme une clé nouvelle
+        "predict_engine": {"backend": engine_ml.backend, **time_stage(lambda: engine_ml.predict_one(employee), repeat)},
+        "db_commit": time_stage(db_commit, max(repeat // 10, 10), warmup=2),
+        # bcrypt est volontairement lent : quelques appels suffisent
+        "bcrypt_verify": time_stage(lambda: verify_password(BENCH_USER[1], hashed), 5, warmup=1),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    import httpx
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn n'a pas démarré")
+
+
+async def load(client, make_request, total: int, concurrency: int) -> dict:
+    """Envoie `total` requêtes avec `concurrency` clients simultanés ; renvoie latences et débit."""
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**percentiles(latencies), "rps": round(total / elapsed, 2), "errors": errors}
+
+
+async def bench_endpoints(base_url: str, total: int, levels: list[int]) -> dict:
+    import httpx
+
+    rng = random.Random(42)
+    payloads = [random_payload(rng) for _ in range(total)]
+    scenarios = {
+        "/predict": lambda c, i: c.post("/predict", json=payloads[i], auth=BENCH_USER),
+        "/history": lambda c, i: c.get("/history", params={"limit": 50}),
+        # /token ne fait que la dépendance d'authentification (+ signature du jeton)
+        "auth": lambda c, i: c.post("/token", auth=BENCH_USER),
+    }
+    results = {}
+    limits = httpx.Limits(max_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Première requête authentifiée : bcrypt une fois, ensuite le cache d'identifiants
+        await client.post("/predict", json=PAYLOAD, auth=BENCH_USER)
+        for name, make_request in scenarios.items():
+            results[name] = {
+                f"c{level}": await load(client, make_request, total, level) for level in levels
+            }
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="Requêtes par scénario et par niveau")
+    parser.add_argument("--concurrency", default="1,8,32", help="Niveaux de concurrence, séparés par des virgules")
+    parser.add_argument("--repeat", type=int, default=1000, help="Répétitions pour le chronométrage des étapes")
+    parser.add_argument("--database-url", default="", help="Base à utiliser (défaut : SQLite temporaire)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    # La base doit être choisie avant le premier import de l'application
+    tmp_dir = tempfile.mkdtemp(prefix="bench_api_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp_dir}/bench.db"
+    prepare_database()
+
+    results = {"stages": bench_stages(args.repeat)}
+    port = free_port()
+    server = start_server(port)
+    try:
+        levels = [int(level) for level in args.concurrency.split(",")]
+        results["endpoints"] = asyncio.run(bench_endpoints(f"http://127.0.0.1:{port}", args.requests, levels))
+    finally:
+        server.terminate()
+        server.wait()
+
+    write_json(results, args.output)
+    print(f"Résultats écrits dans {args.output}")
+    regressions = check_against_baseline(results, args.baseline, "api", args.tolerance, args.update_baseline)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
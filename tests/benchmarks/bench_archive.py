@@ -0,0 +1,132 @@
+"""Benchmark de l'archive Parquet : archivage, taille sur disque et lectures analytiques comparées à la base.
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_archive                      # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_archive --rows 10000000 --database-url postgresql://...
+    uv run python -m tests.benchmarks.bench_archive --update-baseline
+
+L'historique (même générateur que bench_storage) couvre --months mois. Tous les mois révolus sont archivés,
+puis on compare sur les six derniers mois archivés : un agrégat par mois (SQL GROUP BY contre archive_summary)
+et la lecture de trois colonnes (SELECT contre scan_archive). Sans --database-url, une base SQLite temporaire
+est utilisée.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from tests.benchmarks.bench_storage import generate_rows, storage_bytes
+from tests.benchmarks.common import DEFAULT_BASELINE, DEFAULT_OUTPUT, check_against_baseline, time_stage, write_json
+
+
+def bench(url: str, directory: str, rows: int, months: int, chunk: int, repeat: int) -> dict:
+    from sqlalchemy import create_engine, func, select
+
+    from app.db.archive import archive_history, archive_summary, scan_archive
+    from app.db.database import Base
+    from app.db.history import bulk_load_history
+    from app.db.models import Historique
+    from app.db.partitions import maintain_history, month_start
+    from app.db.schema import ensure_schema
+
+    bind = create_engine(url)
+    Base.metadata.drop_all(bind=bind)
+    ensure_schema(bind)
+    end = datetime.now(timezone.utc)
+    first_month = month_start(end.date(), 1 - months)
+    start = datetime(first_month.year, first_month.month, 1, tzinfo=timezone.utc)
+    maintain_history(bind)
+    rng = np.random.default_rng(42)
+    seconds = (end - start).total_seconds()
+    for offset in range(0, rows, chunk):
+        bulk_load_history(bind, generate_rows(rng, start, seconds, offset, min(chunk, rows - offset), rows))
+    database_bytes = storage_bytes(bind, url)
+
+    begin = time.perf_counter()
+    archived = archive_history(bind, directory, after_months=0)
+    archive_s = time.perf_counter() - begin
+    archive_bytes = sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+        if name.endswith(".parquet")
+    )
+    with bind.connect() as connection:
+        archived_count = connection.scalar(select(func.count()).select_from(Historique).where(
+            Historique.date_prediction < datetime(end.year, end.month, 1, tzinfo=timezone.utc)
+        ))
+
+    # Six derniers mois archivés
+    window_start = month_start(end.date(), -6)
+    date_from = datetime(window_start.year, window_start.month, 1, tzinfo=timezone.utc)
+    date_to = datetime(end.year, end.month, 1, tzinfo=timezone.utc)
+    month = func.strftime("%Y-%m", Historique.date_prediction) if bind.dialect.name == "sqlite" else \
+        func.date_trunc("month", Historique.date_prediction)
+    in_window = (Historique.date_prediction >= date_from, Historique.date_prediction < date_to)
+
+    with bind.connect() as connection:
+        def sql_summary():
+            return connection.execute(
+                select(month, func.count(), func.sum(Historique.prediction), func.avg(Historique.probability))
+                .where(*in_window).group_by(month)
+            ).all()
+
+        def sql_columns():
+            return connection.execute(
+                select(Historique.date_prediction, Historique.prediction, Historique.probability).where(*in_window)
+            ).all()
+
+        queries = {
+            "sql_summary": time_stage(sql_summary, repeat, 1),
+            "archive_summary": time_stage(lambda: archive_summary(directory, "month", date_from=date_from, date_to=date_to),
+                                          repeat, 1),
+            "sql_three_columns": time_stage(sql_columns, repeat, 1),
+            "archive_three_columns": time_stage(lambda: sum(batch.num_rows for batch in scan_archive(
+                directory, ["date_prediction", "prediction", "probability"], date_from=date_from, date_to=date_to,
+            )), repeat, 1),
+        }
+    bind.dispose()
+    return {
+        "rows": rows,
+        "archived_months": len(archived),
+        "archive_rows_per_s": round(archived_count / archive_s),
+        "database_bytes_per_row": round(database_bytes / rows, 1),
+        "archive_bytes_per_row": round(archive_bytes / max(archived_count, 1), 1),
+        "queries": queries,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="Lignes d'historique à charger")
+    parser.add_argument("--months", type=int, default=12, help="Nombre de mois couverts par l'historique")
+    parser.add_argument("--chunk", type=int, default=50_000, help="Lignes par appel à bulk_load_history")
+    parser.add_argument("--repeat", type=int, default=10, help="Répétitions de chaque lecture")
+    parser.add_argument("--database-url", default="", help="Base à utiliser (défaut : SQLite temporaire)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    # La base doit être choisie avant le premier import de l'application
+    tmp_dir = tempfile.mkdtemp(prefix="bench_archive_")
+    url = args.database_url or f"sqlite:///{tmp_dir}/bench.db"
+    os.environ["DATABASE_URL"] = url
+
+    results = bench(url, os.path.join(tmp_dir, "archive"), args.rows, args.months, args.chunk, args.repeat)
+    write_json(results, args.output)
+    print(f"{results['archived_months']} mois archivés : {results['archive_rows_per_s']} lignes/s, "
+          f"{results['archive_bytes_per_row']} octets/ligne (base : {results['database_bytes_per_row']})")
+    for name, timings in results["queries"].items():
+        print(name.ljust(22), f"p50={timings['p50_ms']}ms p95={timings['p95_ms']}ms")
+    regressions = check_against_baseline(results, args.baseline, "archive", args.tolerance, args.update_baseline)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Benchmark des micro-lots : débit et latence de /predict par requête, contre micro-lots en thread ou en processus.
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_batching                      # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_batching --update-baseline
+
+Mesure en processus, sans HTTP : des clients asyncio concurrents appellent le chemin de scoring de /predict.
+Par défaut le score compilé est désactivé (--scorer pour l'activer) : c'est le chemin scikit-learn, coûteux
+et tenu par le GIL, que les micro-lots et le pool de processus doivent accélérer.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.benchmarks.bench_api import PAYLOAD, random_payload
+from tests.benchmarks.common import DEFAULT_BASELINE, DEFAULT_OUTPUT, check_against_baseline, percentiles, write_json
+
+
+async def load(score, employees, concurrency: int) -> dict:
+    latencies = []
+    counter = iter(employees)
+
+    async def client():
+        for employee in counter:
+            start = time.perf_counter()
+            await score(employee)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**percentiles(latencies), "rps": round(len(employees) / elapsed, 2)}
+
+
+async def bench(args) -> dict:
+    from app.main import EmployeeInput
+    from app.ml.batcher import MicroBatcher
+    from app.ml.registry import ModelRegistry
+    from app.ml.scorer import MODEL_DIR
+
+    registry = ModelRegistry()
+    current = registry.load(
+        os.path.join(MODEL_DIR, "model.joblib"), os.path.join(MODEL_DIR, "features.joblib"),
+        activate=True, scorer_enabled=args.scorer,
+    )
+    rng = random.Random(42)
+    employees = [EmployeeInput.model_validate(random_payload(rng)) for _ in range(args.requests)]
+    levels = [int(level) for level in args.concurrency.split(",")]
+    executor = ThreadPoolExecutor(max_workers=args.threads)
+    loop = asyncio.get_running_loop()
+
+    async def per_request(employee):
+        return await loop.run_in_executor(executor, current.engine.predict_one, employee)
+
+    results = {"backend": current.engine.backend, "per_request": {}}
+    await per_request(EmployeeInput.model_validate(PAYLOAD))
+    for level in levels:
+        results["per_request"][f"c{level}"] = await load(per_request, employees, level)
+
+    modes = {"microbatch_thread": 0, "microbatch_process": args.processes}
+    for name, processes in modes.items():
+        batcher = MicroBatcher(args.max_batch_size, args.max_wait_ms, processes, scorer_enabled=args.scorer)
+        await batcher.start(current, executor)
+        try:
+            results[name] = {f"c{level}": await load(batcher.submit, employees, level) for level in levels}
+            results[name]["mean_batch_size"] = round(batcher.rows / max(batcher.batches, 1), 2)
+        finally:
+            await batcher.stop()
+    executor.shutdown()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Prédictions par niveau de concurrence")
+    parser.add_argument("--concurrency", default="1,8,32", help="Niveaux de concurrence, séparés par des virgules")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--processes", type=int, default=2, help="Taille du pool pour le mode processus")
+    parser.add_argument("--threads", type=int, default=4, help="Threads de l'exécuteur d'inférence")
+    parser.add_argument("--scorer", action="store_true", help="Activer le score compilé")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(bench(args))
+    write_json(results, args.output)
+    print(f"Résultats écrits dans {args.output}")
+    regressions = check_against_baseline(results, args.baseline, "batching", args.tolerance, args.update_baseline)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Micro-benchmark des explications : surcoût des contributions par rapport à la prédiction seule.
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_explain                      # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_explain --update-baseline
+
+Modèle livré (régression logistique, contributions exactes) et forêt aléatoire entraînée sur
+master_dataset.csv (attribution par chemin), pour un employé puis par lots. À titre de comparaison,
+"perturbation" mesure l'approche naïve : un appel au modèle par feature remplacée par sa moyenne.
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from tests.benchmarks.bench_api import PAYLOAD
+from tests.benchmarks.bench_features import per_row_us
+from tests.benchmarks.common import DEFAULT_BASELINE, DEFAULT_OUTPUT, check_against_baseline, write_json
+
+SIZES = [1, 100, 10_000]
+
+
+def forest_engine(X, trees: int):
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    from app.ml.explain import build_explainer
+    from app.ml.features import FEATURE_COLUMNS
+    from app.ml.inference import InferenceEngine
+    from app.ml.scorer import DEFAULT_VALIDATION_DATA, compile_scorer
+
+    y = (pd.read_csv(DEFAULT_VALIDATION_DATA)["a_quitte_l_entreprise"] == "Oui").astype(int).to_numpy()
+    forest = Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", RandomForestClassifier(n_estimators=trees, max_depth=8, random_state=42)),
+    ]).fit(pd.DataFrame(X, columns=FEATURE_COLUMNS), y)
+    engine = InferenceEngine(forest, FEATURE_COLUMNS, compile_scorer(forest))
+    engine.explainer = build_explainer(engine.scorer)
+    return engine
+
+
+def bench_engine(engine, employee, X) -> dict:
+    background = X.mean(axis=0)
+
+    def perturbation(rows):
+        # Approche naïve : la ligne, puis une copie par feature remplacée par sa moyenne
+        variants = np.repeat(rows, rows.shape[1] + 1, axis=0)
+        for j in range(rows.shape[1]):
+            variants[j + 1::rows.shape[1] + 1, j] = background[j]
+        return engine.predict(variants)
+
+    results = {
+        "predict_one_us": per_row_us(lambda: engine.predict_one(employee), 1),
+        "predict_explain_one_us": per_row_us(lambda: (engine.predict_one(employee), engine.explain_one(employee)), 1),
+    }
+    results["explain_overhead_us"] = round(results["predict_explain_one_us"] - results["predict_one_us"], 5)
+    rng = np.random.default_rng(42)
+    for n in SIZES:
+        rows = X[rng.integers(0, len(X), n)]
+        results[f"n{n}"] = {
+            "predict_per_row_us": per_row_us(lambda: engine.predict(rows), n),
+            "explain_per_row_us": per_row_us(lambda: engine.explain(rows), n),
+            "perturbation_per_row_us": per_row_us(lambda: perturbation(rows), n),
+        }
+    return results
+
+
+def bench(trees: int) -> dict:
+    from app.main import EmployeeInput
+    from app.ml.loader import build_engine
+    from app.ml.scorer import MODEL_DIR, validation_matrix
+    import os
+
+    X = np.ascontiguousarray(validation_matrix())
+    employee = EmployeeInput.model_validate(PAYLOAD)
+    linear = build_engine(os.path.join(MODEL_DIR, "model.joblib"), os.path.join(MODEL_DIR, "features.joblib"))
+    return {
+        "linear": bench_engine(linear, employee, X),
+        "forest": bench_engine(forest_engine(X, trees), employee, X),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trees", type=int, default=100, help="Nombre d'arbres de la forêt de comparaison")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = bench(args.trees)
+    write_json(results, args.output)
+    for model, timings in results.items():
+        print(f"{model} : prédiction {timings['predict_one_us']}µs, explication +{timings['explain_overhead_us']}µs")
+        for n in SIZES:
+            row = timings[f"n{n}"]
+            print(f"  n={n} : prédiction {row['predict_per_row_us']}µs/ligne, explication {row['explain_per_row_us']}µs/ligne,"
+                  f" perturbation {row['perturbation_per_row_us']}µs/ligne")
+    regressions = check_against_baseline(results, args.baseline, "explain", args.tolerance, args.update_baseline)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
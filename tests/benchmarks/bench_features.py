@@ -0,0 +1,87 @@
+"""Micro-benchmark du feature engineering : coût par ligne selon la taille du lot, de 1 à 1 000 000.
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_features                      # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_features --update-baseline
+
+Quatre entrées : un employé à la fois (fill_feature_row, /predict), une liste d'EmployeeInput
+(build_feature_matrix, /predict/batch), un tableau NumPy brut (compute_features) et un DataFrame
+(frame_feature_matrix, scoring en masse). Les chemins à base d'objets Python s'arrêtent à --max-objects lignes.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from tests.benchmarks.bench_api import PAYLOAD
+from tests.benchmarks.common import DEFAULT_BASELINE, DEFAULT_OUTPUT, check_against_baseline, write_json
+
+SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+def per_row_us(fn, rows: int, budget_s: float = 0.5) -> float:
+    """Meilleur temps par ligne (µs) sur des répétitions tenant dans `budget_s`."""
+    fn()
+    best = float("inf")
+    deadline = time.perf_counter() + budget_s
+    runs = 0
+    while runs < 3 or (time.perf_counter() < deadline and runs < 1000):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+        runs += 1
+    return round(best / rows * 1e6, 5)
+
+
+def bench(max_objects: int) -> dict:
+    import pandas as pd
+
+    from app.main import EmployeeInput
+    from app.ml.features import (
+        FEATURE_COLUMNS, INPUT_FIELDS, build_feature_matrix, compute_features, fill_feature_row, frame_feature_matrix,
+    )
+
+    rng = np.random.default_rng(42)
+    largest = max(SIZES)
+    frame = pd.DataFrame({
+        field: rng.integers(0, 40, largest).astype(np.float64) for field in INPUT_FIELDS if field != "heures_supp"
+    }).assign(heures_supp=np.where(rng.random(largest) < 0.3, "Oui", "Non"))[INPUT_FIELDS]
+    raw = frame.assign(heures_supp=(frame["heures_supp"] == "Oui").astype(np.float64)).to_numpy()
+    employees = [EmployeeInput.model_validate({**PAYLOAD, "revenu_mensuel": 1000 + i}) for i in range(min(max_objects, largest))]
+    row = np.empty(len(FEATURE_COLUMNS))
+
+    results = {"record": {}, "objects": {}, "numpy": {}, "dataframe": {}}
+    for n in SIZES:
+        key = f"n{n}_per_row_us"
+        if n <= max_objects:
+            subset = employees[:n]
+            results["record"][key] = per_row_us(lambda: [fill_feature_row(row, e) for e in subset], n)
+            results["objects"][key] = per_row_us(lambda: build_feature_matrix(subset), n)
+        raw_n, frame_n = raw[:n], frame.iloc[:n]
+        results["numpy"][key] = per_row_us(lambda: compute_features(raw_n), n)
+        results["dataframe"][key] = per_row_us(lambda: frame_feature_matrix(frame_n), n)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-objects", type=int, default=100_000, help="Taille maximale pour les lots d'EmployeeInput")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = bench(args.max_objects)
+    write_json(results, args.output)
+    for mode, timings in results.items():
+        print(mode.ljust(10), "  ".join(f"{key.split('_')[0]}={value}µs" for key, value in timings.items()))
+    regressions = check_against_baseline(results, args.baseline, "features", args.tolerance, args.update_baseline)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
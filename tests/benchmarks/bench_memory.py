@@ -0,0 +1,125 @@
+"""Benchmark mémoire : N workers chargent le modèle, copie privée (joblib.load) ou partagée (MODEL_MMAP).
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_memory --workers 4                    # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_memory --workers 4 --trees 500
+    uv run python -m tests.benchmarks.bench_memory --workers 4 --update-baseline
+
+Deux modèles sont mesurés : la régression logistique livrée (Data/model/model.joblib) et une forêt aléatoire
+de --trees arbres entraînée pour l'occasion sur master_dataset.csv. Pour chaque modèle et chaque mode :
+mémoire par worker avant et après le chargement (RSS et PSS), puis PSS totale une fois tous les workers chargés.
+La PSS répartit les pages partagées entre les processus qui les utilisent, c'est elle qui dit combien de
+workers tiennent dans la RAM du conteneur. Linux uniquement (/proc/<pid>/smaps_rollup).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from tests.benchmarks.common import DEFAULT_BASELINE, DEFAULT_OUTPUT, check_against_baseline, write_json
+
+MB = 1024 * 1024
+
+
+def worker(model_path: str, mmap: bool) -> None:
+    """Processus worker : charge le modèle, publie sa mémoire avant/après, puis attend la fin de la mesure."""
+    from app.ml.loader import build_engine
+    from app.ml.model_store import process_memory
+    from app.ml.scorer import MODEL_DIR
+
+    before = process_memory()
+    engine = build_engine(model_path, os.path.join(MODEL_DIR, "features.joblib"), mmap=mmap)
+    print(json.dumps({"before": before, "after": process_memory(), "backend": engine.backend}), flush=True)
+    sys.stdin.read()
+
+
+def train_forest(directory: str, trees: int) -> str:
+    """Forêt aléatoire (standardisation + arbres) sur master_dataset.csv, pour mesurer un modèle lourd."""
+    import joblib
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    from Data.model.train import load_features
+    from app.ml.features import FEATURE_COLUMNS
+
+    X, y = load_features()
+    model = Pipeline([("scaler", StandardScaler()), ("model", RandomForestClassifier(n_estimators=trees, random_state=0))])
+    model.fit(pd.DataFrame(X, columns=FEATURE_COLUMNS), y)
+    path = os.path.join(directory, "forest.joblib")
+    joblib.dump(model, path)
+    return path
+
+
+def pss(pid: int) -> int:
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def bench_mode(model_path: str, workers: int, mmap: bool) -> dict:
+    command = [sys.executable, "-W", "ignore", "-m", "tests.benchmarks.bench_memory", "--worker", model_path]
+    if mmap:
+        command.append("--mmap")
+    processes = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    try:
+        reports = [json.loads(process.stdout.readline()) for process in processes]
+        # Tous les workers sont chargés : la PSS reflète maintenant le partage des pages
+        total_pss = sum(pss(process.pid) for process in processes)
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+    def mean_mb(moment, kind):
+        return round(statistics.fmean(report[moment].get(kind, 0) for report in reports) / MB, 2)
+
+    return {
+        "rss_before_mb": mean_mb("before", "rss"),
+        "rss_after_mb": mean_mb("after", "rss"),
+        "pss_before_mb": mean_mb("before", "pss"),
+        "pss_after_mb": mean_mb("after", "pss"),
+        "total_pss_mb": round(total_pss / MB, 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--trees", type=int, default=300, help="Arbres de la forêt mesurée")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--worker", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--mmap", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker, args.mmap)
+        return 0
+
+    from app.ml.scorer import MODEL_DIR
+
+    models = {"logistic": os.path.join(MODEL_DIR, "model.joblib"),
+              "forest": train_forest(tempfile.mkdtemp(prefix="bench_memory_"), args.trees)}
+    results = {"workers": args.workers, "trees": args.trees}
+    for name, model_path in models.items():
+        results[name] = {"copy": bench_mode(model_path, args.workers, mmap=False),
+                         "mmap": bench_mode(model_path, args.workers, mmap=True)}
+    write_json(results, args.output)
+    print(json.dumps(results, indent=2))
+    regressions = check_against_baseline(results, args.baseline, "memory", args.tolerance, args.update_baseline)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Benchmark des écritures concurrentes d'historique : contention sur les agrégats de /stats.
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_rollup --database-url postgresql://...   # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_rollup --writers 16 --writes 500 --database-url postgresql://...
+    uv run python -m tests.benchmarks.bench_rollup --update-baseline --database-url postgresql://...
+
+--writers threads écrivent chacun --writes prédictions, une transaction par prédiction comme /predict, sur une
+seule journée : tous visent les mêmes lignes de historique_rollup. Deux modes sont comparés :
+- inline : agrégats mis à jour dans la transaction de chaque écriture (ancien comportement) ;
+- deferred : id des lignes inscrits dans historique_rollup_pending, repliés toutes les --interval secondes par
+  fold_pending (comportement actuel).
+Sur PostgreSQL, un thread relève toutes les 5 ms les sessions bloquées sur un verrou (pg_locks) : en mode
+deferred il ne doit y en avoir aucune, sinon le benchmark échoue. Le total des agrégats est vérifié dans les
+deux modes. Sans --database-url, une base SQLite temporaire est utilisée : elle sérialise toutes les écritures,
+le relevé des verrous n'y a pas de sens.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from tests.benchmarks.bench_storage import generate_rows
+from tests.benchmarks.common import DEFAULT_BASELINE, DEFAULT_OUTPUT, check_against_baseline, percentiles, write_json
+
+
+def blocked_sessions(connection) -> int:
+    from sqlalchemy import text
+    return connection.scalar(text("SELECT count(*) FROM pg_locks WHERE NOT granted"))
+
+
+def run_mode(mode: str, writers: int, writes: int, interval: float) -> dict:
+    from sqlalchemy import func, select
+
+    from app.db.database import Base, SessionLocal, engine
+    from app.db.history import insert_history
+    from app.db.models import HistoriqueRollup
+    from app.db.schema import ensure_schema
+    from app.db.stats import fold_pending
+
+    Base.metadata.drop_all(bind=engine)
+    ensure_schema(engine)
+    now = datetime.now(timezone.utc)
+    rows = generate_rows(np.random.default_rng(42), now, 0, 0, writers * writes, writers * writes)
+    deferred = mode == "deferred"
+    stop = threading.Event()
+    samples = [[] for _ in range(writers)]
+    blocked = []
+
+    def writer(index):
+        for row in rows[index * writes:(index + 1) * writes]:
+            start = time.perf_counter()
+            with SessionLocal() as db:
+                insert_history(db, [row], defer_rollup=deferred)
+                db.commit()
+            samples[index].append(time.perf_counter() - start)
+
+    def flusher():
+        while not stop.wait(interval):
+            fold_pending(engine)
+
+    def monitor():
+        with engine.connect() as connection:
+            while not stop.wait(0.005):
+                blocked.append(blocked_sessions(connection))
+
+    background = [threading.Thread(target=flusher)] if deferred else []
+    if engine.dialect.name == "postgresql":
+        background.append(threading.Thread(target=monitor))
+    for thread in background:
+        thread.start()
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+    stop.set()
+    for thread in background:
+        thread.join()
+    fold_pending(engine)
+
+    with SessionLocal() as db:
+        counted = db.scalar(select(func.sum(HistoriqueRollup.count)).where(HistoriqueRollup.metric == "prediction"))
+    if counted != writers * writes:
+        raise AssertionError(f"{mode} : {counted} prédictions dans les agrégats au lieu de {writers * writes}")
+    result = {**percentiles([s for writer_samples in samples for s in writer_samples]),
+              "writes_per_s": round(writers * writes / elapsed)}
+    if blocked:
+        result["blocked_max"] = max(blocked)
+        result["blocked_share"] = round(sum(1 for n in blocked if n) / len(blocked), 3)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8, help="Écritures concurrentes (threads)")
+    parser.add_argument("--writes", type=int, default=200, help="Prédictions écrites par thread")
+    parser.add_argument("--interval", type=float, default=1.0, help="Secondes entre deux écritures des agrégats (deferred)")
+    parser.add_argument("--database-url", default="", help="Base à utiliser (défaut : SQLite temporaire)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    # La base doit être choisie avant le premier import de l'application
+    url = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='bench_rollup_')}/bench.db"
+    os.environ["DATABASE_URL"] = url
+    os.environ["DB_POOL_SIZE"] = str(args.writers + 2)
+
+    results = {"writers": args.writers, "writes": args.writes}
+    for mode in ("inline", "deferred"):
+        results[mode] = run_mode(mode, args.writers, args.writes, args.interval)
+        print(mode.ljust(9), f"{results[mode]['writes_per_s']} écritures/s p50={results[mode]['p50_ms']}ms "
+              f"p95={results[mode]['p95_ms']}ms",
+              f"sessions bloquées : {results[mode]['blocked_share']:.0%} des relevés" if "blocked_share" in results[mode] else "")
+    write_json(results, args.output)
+
+    regressions = check_against_baseline(results, args.baseline, "rollup", args.tolerance, args.update_baseline)
+    if results["deferred"].get("blocked_max"):
+        regressions.append(f"rollup.deferred.blocked_max : {results['deferred']['blocked_max']} sessions bloquées (0 attendu)")
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Benchmark du démarrage : temps d'import de app.main, délai avant écoute, avant /ready, et première prédiction.
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_startup                      # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_startup --update-baseline    # enregistre la référence
+
+Les deux modes sont mesurés : chargement du modèle bloquant (défaut) et en tâche de fond (MODEL_BACKGROUND_LOAD=true).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.benchmarks.bench_api import BENCH_USER, PAYLOAD, free_port, prepare_database
+from tests.benchmarks.common import DEFAULT_BASELINE, DEFAULT_OUTPUT, check_against_baseline, write_json
+
+
+def bench_import(runs: int) -> dict:
+    """Durée de `import app.main` dans un interpréteur neuf (médiane sur plusieurs lancements)."""
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    durations = [
+        float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+        for _ in range(runs)
+    ]
+    return {"import_s": round(statistics.median(durations), 4)}
+
+
+def wait_for(url: str, expected: int, deadline: float) -> None:
+    import httpx
+
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == expected:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} n'a pas répondu {expected} à temps")
+
+
+def bench_cold_start(background: bool) -> dict:
+    """Lance un uvicorn neuf et mesure chaque jalon depuis le lancement du processus."""
+    import httpx
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "MODEL_BACKGROUND_LOAD": "true" if background else "false"}
+    start = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"], env=env,
+    )
+    try:
+        deadline = start + 120
+        wait_for(f"{base_url}/", 200, deadline)
+        listening = time.monotonic() - start
+        wait_for(f"{base_url}/ready", 200, deadline)
+        ready = time.monotonic() - start
+        request_start = time.perf_counter()
+        # Première requête authentifiée : inclut bcrypt (cache d'identifiants vide) et le premier appel au modèle
+        response = httpx.post(f"{base_url}/predict", json=PAYLOAD, auth=BENCH_USER, timeout=60)
+        first_request = time.perf_counter() - request_start
+        response.raise_for_status()
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "listening_s": round(listening, 4),
+        "ready_s": round(ready, 4),
+        "first_request_ms": round(first_request * 1000, 4),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Lancements pour la mesure de l'import")
+    parser.add_argument("--database-url", default="", help="Base à utiliser (défaut : SQLite temporaire)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp_dir}/bench.db"
+    prepare_database()
+
+    results = {
+        **bench_import(args.runs),
+        "eager": bench_cold_start(background=False),
+        "background": bench_cold_start(background=True),
+    }
+    write_json(results, args.output)
+    print(f"Résultats écrits dans {args.output}")
+    regressions = check_against_baseline(results, args.baseline, "startup", args.tolerance, args.update_baseline)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
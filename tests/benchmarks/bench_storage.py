@@ -0,0 +1,152 @@
+"""Benchmark du stockage de l'historique : chargement massif, requêtes de lecture et rétention à grand volume.
+
+Usage (depuis la racine du projet) :
+    uv run python -m tests.benchmarks.bench_storage                      # compare à baseline.json
+    uv run python -m tests.benchmarks.bench_storage --rows 10000000 --database-url postgresql://...   # 10M lignes
+    uv run python -m tests.benchmarks.bench_storage --update-baseline
+
+Les lignes sont réparties sur --months mois jusqu'au mois en cours, puis chargées par blocs avec
+bulk_load_history (COPY sur PostgreSQL, agrégats de /stats compris). On mesure ensuite les requêtes
+de /history (première page, page d'un mois, page filtrée), un comptage mensuel, /stats, puis la rétention
+du mois le plus ancien : DROP de partition sur PostgreSQL, DELETE ailleurs.
+Sans --database-url, une base SQLite temporaire est utilisée (pas de partitions).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from tests.benchmarks.common import DEFAULT_BASELINE, DEFAULT_OUTPUT, check_against_baseline, time_stage, write_json
+
+
+def generate_rows(rng, start: datetime, seconds: float, offset: int, count: int, total: int) -> list[dict]:
+    """Un bloc de lignes d'historique aléatoires, aux dates croissantes sur toute la période."""
+    dates = [start + timedelta(seconds=seconds * (offset + i) / total) for i in range(count)]
+    ages = rng.integers(18, 71, count)
+    revenus = rng.uniform(1000, 20000, count).round(2)
+    distances = rng.uniform(0, 50, count).round(1)
+    notes = rng.integers(1, 5, (count, 2))
+    heures = rng.random(count) < 0.3
+    annees = rng.integers(0, 20, (count, 4))
+    experiences = rng.uniform(0, 40, count).round(1)
+    probabilities = rng.random(count)
+    return [
+        {
+            "date_prediction": dates[i], "age": int(ages[i]), "revenu_mensuel": float(revenus[i]),
+            "distance_domicile_travail": float(distances[i]), "satisfaction_environnement": int(notes[i, 0]),
+            "heures_supp": "Oui" if heures[i] else "Non", "annees_promo": int(annees[i, 0]),
+            "satisfaction_equilibre": int(notes[i, 1]), "pee": int(annees[i, 1]), "poste_actuel": int(annees[i, 2]),
+            "anciennete": int(annees[i, 3]), "exp_totale": float(experiences[i]),
+            "prediction": int(probabilities[i] > 0.5), "probability": float(probabilities[i]), "model_version": "bench",
+        }
+        for i in range(count)
+    ]
+
+
+def storage_bytes(bind, url: str) -> int:
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy import text
+
+        # Table partitionnée : somme des partitions (données, index et TOAST)
+        return int(bind.connect().execute(text(
+            "SELECT COALESCE(sum(pg_total_relation_size(inhrelid)), pg_total_relation_size('historique_predictions')) "
+            "FROM pg_inherits WHERE inhparent = 'historique_predictions'::regclass"
+        )).scalar())
+    return os.path.getsize(url.split("///", 1)[1])
+
+
+def bench(url: str, rows: int, months: int, chunk: int, repeat: int) -> dict:
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import Session
+
+    from app.db.database import Base
+    from app.db.history import bulk_load_history, history_page
+    from app.db.models import Historique
+    from app.db.partitions import drop_expired, maintain_history, month_start
+    from app.db.schema import ensure_schema
+    from app.db.stats import read_stats
+
+    bind = create_engine(url)
+    Base.metadata.drop_all(bind=bind)
+    ensure_schema(bind)
+    end = datetime.now(timezone.utc)
+    first_month = month_start(end.date(), 1 - months)
+    start = datetime(first_month.year, first_month.month, 1, tzinfo=timezone.utc)
+    maintain_history(bind)
+
+    rng = np.random.default_rng(42)
+    seconds = (end - start).total_seconds()
+    load_s = 0.0
+    for offset in range(0, rows, chunk):
+        batch = generate_rows(rng, start, seconds, offset, min(chunk, rows - offset), rows)
+        begin = time.perf_counter()
+        bulk_load_history(bind, batch)
+        load_s += time.perf_counter() - begin
+
+    results = {
+        "rows": rows,
+        "insert_rows_per_s": round(rows / load_s),
+        "bytes_per_row": round(storage_bytes(bind, url) / rows, 1),
+    }
+    middle = month_start(end.date(), -(months // 2))
+    month_from = datetime(middle.year, middle.month, 1, tzinfo=timezone.utc)
+    upper = month_start(middle, 1)
+    month_to = datetime(upper.year, upper.month, 1, tzinfo=timezone.utc)
+    with Session(bind) as db:
+        results["queries"] = {
+            "latest_page": time_stage(lambda: history_page(db, 50), repeat, 2),
+            "month_page": time_stage(lambda: history_page(db, 50, date_from=month_from, date_to=month_to), repeat, 2),
+            "churn_page": time_stage(lambda: history_page(db, 50, prediction=1), repeat, 2),
+            "month_count": time_stage(lambda: db.scalar(
+                select(func.count()).select_from(Historique)
+                .where(Historique.date_prediction >= month_from, Historique.date_prediction < month_to)
+            ), max(repeat // 4, 1), 1),
+            "stats": time_stage(lambda: read_stats(db), repeat, 2),
+        }
+
+    # Rétention : on ne garde que months - 1 mois, le plus ancien disparaît
+    begin = time.perf_counter()
+    with bind.begin() as connection:
+        dropped = drop_expired(connection, months - 1)
+    results["retention_s"] = round(time.perf_counter() - begin, 4)
+    results["retention_dropped"] = ", ".join(dropped)
+    bind.dispose()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="Lignes d'historique à charger (10M : --rows 10000000)")
+    parser.add_argument("--months", type=int, default=12, help="Nombre de mois couverts par l'historique")
+    parser.add_argument("--chunk", type=int, default=50_000, help="Lignes par appel à bulk_load_history")
+    parser.add_argument("--repeat", type=int, default=50, help="Répétitions de chaque requête")
+    parser.add_argument("--database-url", default="", help="Base à utiliser (défaut : SQLite temporaire)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Dégradation tolérée (0.5 = +50 %%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    # La base doit être choisie avant le premier import de l'application
+    tmp_dir = tempfile.mkdtemp(prefix="bench_storage_")
+    url = args.database_url or f"sqlite:///{tmp_dir}/bench.db"
+    os.environ["DATABASE_URL"] = url
+
+    results = bench(url, args.rows, args.months, args.chunk, args.repeat)
+    write_json(results, args.output)
+    print(f"{results['rows']} lignes : {results['insert_rows_per_s']} lignes/s, {results['bytes_per_row']} octets/ligne")
+    for name, timings in results["queries"].items():
+        print(name.ljust(12), f"p50={timings['p50_ms']}ms p95={timings['p95_ms']}ms")
+    print(f"rétention : {results['retention_s']}s ({results['retention_dropped']})")
+    regressions = check_against_baseline(results, args.baseline, "storage", args.tolerance, args.update_baseline)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Outils partagés par les benchmarks : chronométrage, percentiles, comparaison à la référence."""
+import json
+import os
+import platform
+import statistics
+import time
+
+BENCH_DIR = os.path.dirname(__file__)
+# Mesures trop bruitées pour servir de garde-fou : elles sont écrites dans les résultats mais pas comparées
+REPORT_ONLY = {"p99_ms", "mean_ms"}
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results.json")
+
+
+def percentiles(samples_s: list[float]) -> dict:
+    """p50/p95/p99 (en millisecondes) d'une liste de durées en secondes."""
+    ordered = sorted(samples_s)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "p50_ms": round(pick(0.50), 4),
+        "p95_ms": round(pick(0.95), 4),
+        "p99_ms": round(pick(0.99), 4),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+    }
+
+
+def time_stage(fn, repeat: int = 1000, warmup: int = 20) -> dict:
+    """Chronomètre une étape isolée appel par appel."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def write_json(data: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float, path: str = "") -> list[str]:
+    """Liste les régressions : latences (*_ms, *_us, *_s) et mémoire (*_mb) plus hautes, débits (*rps, *per_s) plus bas.
+
+    Une mesure de la référence absente des résultats compte comme une régression : une clé renommée ou une étape
+    qui ne tourne plus ne doit pas passer en silence.
+    """
+    regressions = []
+    for key, reference in baseline.items():
+        current = results.get(key)
+        name = f"{path}.{key}" if path else key
+        if current is None:
+            regressions.append(f"{name} : absent des résultats (présent dans la référence)")
+            continue
+        if isinstance(reference, dict):
+            if isinstance(current, dict):
+                regressions += compare_to_baseline(current, reference, tolerance, name)
+            else:
+                regressions.append(f"{name} : {current!r} au lieu d'un groupe de mesures")
+            continue
+        if key in REPORT_ONLY or not isinstance(reference, (int, float)) or reference <= 0:
+            continue
+        if not isinstance(current, (int, float)):
+            regressions.append(f"{name} : {current!r} au lieu d'une mesure")
+        elif key.endswith(("_ms", "_us", "_s", "_mb")) and current > reference * (1 + tolerance):
+            regressions.append(f"{name} : {current} > {reference} (+{tolerance:.0%} toléré)")
+        elif key.endswith(("rps", "per_s")) and current < reference / (1 + tolerance):
+            regressions.append(f"{name} : {current} < {reference} (-{tolerance:.0%} toléré)")
+    return regressions
+
+
+def find_errors(results: dict, path: str = "") -> list[str]:
+    """Erreurs relevées pendant la mesure (clés "errors") : toujours une régression, quelle que soit la référence.
+
+    Un endpoint qui répond vite en 5xx paraîtrait sinon plus rapide que la référence.
+    """
+    found = []
+    for key, value in results.items():
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict):
+            found += find_errors(value, name)
+        elif key == "errors" and value:
+            found.append(f"{name} : {value} erreur(s) pendant la mesure (0 attendu)")
+    return found
+
+
+def runner_fingerprint() -> str:
+    """Machine de mesure : BENCH_RUNNER s'il est défini, sinon système, modèle et nombre de processeurs."""
+    if os.getenv("BENCH_RUNNER"):
+        return os.environ["BENCH_RUNNER"]
+    model = platform.processor()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            model = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), model)
+    except OSError:
+        pass
+    return f"{platform.system()} {platform.machine()} {model} x{os.cpu_count()}"
+
+
+def check_against_baseline(results: dict, baseline_path: str, section: str, tolerance: float, update: bool) -> list[str]:
+    """Compare une section des résultats à la référence stockée, ou met la référence à jour.
+
+    Les écarts à la référence ne comptent que si elle a été enregistrée sur la même machine (runner_fingerprint) :
+    ailleurs, ils sont seulement affichés. Les erreurs font échouer dans tous les cas.
+    """
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    errors = find_errors(results, section)
+    runner = runner_fingerprint()
+    if update:
+        if errors:
+            return errors  # Jamais de référence enregistrée sur un passage en erreur
+        baseline[section] = results
+        baseline.setdefault("runners", {})[section] = runner
+        write_json(baseline, baseline_path)
+        return []
+    if section not in baseline:
+        print(f"Pas de référence pour '{section}' dans {baseline_path} (--update-baseline pour la créer)")
+        return errors
+    regressions = compare_to_baseline(results, baseline[section], tolerance, section)
+    recorded_on = baseline.get("runners", {}).get(section)
+    if recorded_on != runner:
+        for regression in regressions:
+            print(f"(indicatif, référence enregistrée sur « {recorded_on or 'machine inconnue'} ») {regression}")
+        return errors
+    return errors + regressions
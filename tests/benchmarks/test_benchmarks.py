@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), "../..")
+
+# Les benchmarks sont longs et dépendent de la machine : on les lance explicitement avec RUN_BENCHMARKS=1
+pytestmark = pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="RUN_BENCHMARKS=1 pour lancer les benchmarks")
+
+
+def run_benchmark(module: str, tmp_path, *args: str) -> subprocess.CompletedProcess:
+    # Chaque benchmark tourne dans son propre processus, avec sa propre base
+    options = ["--output", str(tmp_path / "results.json")]
+    # En CI : référence enregistrée par la CI elle-même (BENCH_BASELINE), mise à jour sur main (BENCH_UPDATE_BASELINE)
+    if os.getenv("BENCH_BASELINE"):
+        options += ["--baseline", os.path.abspath(os.environ["BENCH_BASELINE"])]
+    if os.getenv("BENCH_UPDATE_BASELINE"):
+        options.append("--update-baseline")
+    return subprocess.run([sys.executable, "-m", module, *options, *args], cwd=ROOT, capture_output=True, text=True)
+
+
+def test_api_latency_no_regression(tmp_path):
+    result = run_benchmark("tests.benchmarks.bench_api", tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_startup_no_regression(tmp_path):
+    result = run_benchmark("tests.benchmarks.bench_startup", tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_memory_no_regression(tmp_path):
+    result = run_benchmark("tests.benchmarks.bench_memory", tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_batching_no_regression(tmp_path):
+    result = run_benchmark("tests.benchmarks.bench_batching", tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_features_no_regression(tmp_path):
+    result = run_benchmark("tests.benchmarks.bench_features", tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_storage_no_regression(tmp_path):
+    result = run_benchmark("tests.benchmarks.bench_storage", tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_explain_no_regression(tmp_path):
+    result = run_benchmark("tests.benchmarks.bench_explain", tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_archive_no_regression(tmp_path):
+    result = run_benchmark("tests.benchmarks.bench_archive", tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+@pytest.mark.skipif(not os.getenv("BENCH_DATABASE_URL"), reason="BENCH_DATABASE_URL (PostgreSQL) pour mesurer les verrous")
+def test_rollup_no_lock_contention(tmp_path):
+    # Écritures concurrentes façon /predict : aucune session ne doit attendre un verrou sur historique_rollup
+    result = run_benchmark("tests.benchmarks.bench_rollup", tmp_path, "--database-url", os.environ["BENCH_DATABASE_URL"])
+    assert result.returncode == 0, result.stdout + result.stderr
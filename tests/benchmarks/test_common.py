@@ -0,0 +1,46 @@
+import json
+
+from tests.benchmarks.common import check_against_baseline, compare_to_baseline, runner_fingerprint
+
+BASELINE = {"stages": {"predict_engine": {"backend": "compiled", "p50_ms": 0.02, "p99_ms": 0.03}}, "rps": 100}
+
+
+def test_comparison_flags_slower_and_missing_measures():
+    assert compare_to_baseline(BASELINE, BASELINE, 0.5) == []
+    slower = {"stages": {"predict_engine": {"backend": "sklearn", "p50_ms": 1.5, "p99_ms": 2.0}}, "rps": 40}
+    assert compare_to_baseline(slower, BASELINE, 0.5) == [
+        "stages.predict_engine.p50_ms : 1.5 > 0.02 (+50% toléré)",
+        "rps : 40 < 100 (-50% toléré)",
+    ]
+    # Une clé renommée (ancienne predict_engine_compiled) ne passe plus en silence
+    renamed = {"stages": {"predict_engine_sklearn": {"p50_ms": 0.02}}, "rps": 100}
+    assert compare_to_baseline(renamed, BASELINE, 0.5) == [
+        "stages.predict_engine : absent des résultats (présent dans la référence)",
+    ]
+
+
+def test_errors_always_fail_even_against_an_error_free_baseline(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    clean = {"scenario": {"p50_ms": 5.0, "rps": 100, "errors": 0}}
+    assert check_against_baseline(clean, path, "api", 0.5, update=True) == []
+    failing_fast = {"scenario": {"p50_ms": 1.0, "rps": 500, "errors": 5}}
+    assert check_against_baseline(failing_fast, path, "api", 0.5, update=False) == [
+        "api.scenario.errors : 5 erreur(s) pendant la mesure (0 attendu)",
+    ]
+    # Ni référence enregistrée sur un passage en erreur, ni passage sans référence qui les ignore
+    assert check_against_baseline(failing_fast, path, "api", 0.5, update=True)
+    assert json.loads((tmp_path / "baseline.json").read_text())["api"] == clean
+    assert check_against_baseline(failing_fast, path, "autre", 0.5, update=False)
+
+
+def test_timings_only_gate_against_a_baseline_from_the_same_runner(tmp_path, monkeypatch):
+    path = tmp_path / "baseline.json"
+    monkeypatch.setenv("BENCH_RUNNER", "runner-a")
+    assert runner_fingerprint() == "runner-a"
+    assert check_against_baseline({"p50_ms": 1.0}, str(path), "stage", 0.5, update=True) == []
+    assert check_against_baseline({"p50_ms": 2.0}, str(path), "stage", 0.5, update=False) == [
+        "stage.p50_ms : 2.0 > 1.0 (+50% toléré)",
+    ]
+    # Autre machine : l'écart est affiché mais ne fait pas échouer
+    monkeypatch.setenv("BENCH_RUNNER", "runner-b")
+    assert check_against_baseline({"p50_ms": 2.0}, str(path), "stage", 0.5, update=False) == []
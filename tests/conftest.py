@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.db.database import Base, get_db, engine, SessionLocal
+from app.db.schema import ensure_schema
+from app.main import app, prediction_cache
+from app.core.security import get_password_hash, credential_cache
+# On importe les modèles pour être sûr qu'ils sont enregistrés dans Base
+from app.db import models
+
+# La Fixture qui gère la BDD
+@pytest.fixture(scope="function")
+def db_session():
+    # NETTOYAGE PRÉVENTIF : On supprime tout pour partir d'une feuille blanche
+    # (Évite les erreurs si une exécution précédente a crashé sans nettoyer)
+    Base.metadata.drop_all(bind=engine)
+
+    # Crée les tables sur la vraie base, comme au démarrage de l'API (historique partitionné sur PostgreSQL)
+    ensure_schema(engine)
+
+    session = SessionLocal()
+
+    # --- CRÉATION DE L'UTILISATEUR DE TEST ---
+    # On utilise des données FIXES pour les tests, indépendantes du .env
+    # C'est une meilleure pratique ("Isolation")
+    test_username = "test_admin"
+    test_password = "pomme23"
+
+    hashed_pwd = get_password_hash(test_password)
+    user = models.User(username=test_username, hashed_password=hashed_pwd)
+    session.add(user)
+    session.commit()
+    # -----------------------------------------
+
+    try:
+        yield session
+    finally:
+        session.close()
+        # Supprime les tables après le test pour nettoyer
+        Base.metadata.drop_all(bind=engine)
+
+# La Fixture CLIENT
+@pytest.fixture(scope="function")
+def client(db_session):
+    def override_get_db():
+        try:
+            yield db_session
+        finally:
+            pass
+
+    app.dependency_overrides[get_db] = override_get_db
+    # Chaque test repart d'un cache d'authentification vide
+    credential_cache.invalidate()
+    prediction_cache.clear()
+
+    with TestClient(app) as c:
+        yield c
+
+    app.dependency_overrides.clear()
+
+# Un employé valide, réutilisable par tous les fichiers de tests
+@pytest.fixture
+def payload():
+    return {
+        "age": 30,
+        "revenu_mensuel": 3000,
+        "distance_domicile_travail": 10,
+        "satisfaction_environnement": 3,
+        "heures_supp": "Non",
+        "annees_promo": 2,
+        "satisfaction_equilibre": 3,
+        "pee": 1,
+        "poste_actuel": 5,
+        "anciennete": 5,
+        "exp_totale": 8
+    }
@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pyarrow.parquet as pq
+from sqlalchemy import func, insert, select
+
+from app.core.config import settings
+from app.db.archive import (
+    archive_dataset, archive_filter, archive_history, archive_summary, month_key, read_manifest, scan_archive,
+)
+from app.db.database import engine
+from app.db.models import Historique
+from app.db.partitions import drop_expired, month_start
+from app.main import run_history_maintenance
+
+AUTH = ("test_admin", "pomme23")
+TODAY = date(2026, 6, 15)
+
+
+def seed(db_session, payload):
+    # Dix prédictions par mois de janvier à juin 2026, une sur deux en départ
+    rows = []
+    for month in range(1, 7):
+        for i in range(10):
+            rows.append({
+                **payload, "heures_supp": "Oui" if i % 3 == 0 else "Non", "prediction": i % 2, "probability": i / 10,
+                "date_prediction": datetime(2026, month, 1) + timedelta(days=i, hours=i), "model_version": f"v{month % 2}",
+            })
+    db_session.execute(insert(Historique), rows)
+    db_session.commit()
+
+
+def test_archive_writes_completed_months_once(db_session, payload, tmp_path):
+    seed(db_session, payload)
+    # Trois mois révolus gardés dans la base (mars à mai) en plus de juin : janvier et février partent en archive
+    assert archive_history(engine, str(tmp_path), after_months=3, today=TODAY) == ["2026-01", "2026-02"]
+    assert archive_history(engine, str(tmp_path), after_months=3, today=TODAY) == []  # Rien en double
+
+    table = pq.read_table(tmp_path / "month=2026-01" / "part-0.parquet")
+    assert table.num_rows == 10
+    assert table.schema.field("heures_supp").type == "bool"
+    assert table.column("date_prediction").to_pylist() == sorted(table.column("date_prediction").to_pylist())
+    manifest = read_manifest(str(tmp_path))
+    assert manifest["archived_before"] == "2026-03-01"
+    assert manifest["months"]["2026-02"]["rows"] == 10 and not manifest["months"]["2026-02"]["deleted"]
+    assert db_session.scalar(select(func.count()).select_from(Historique)) == 60
+
+
+def test_archive_can_delete_archived_rows(db_session, payload, tmp_path):
+    seed(db_session, payload)
+    assert archive_history(engine, str(tmp_path), after_months=1, delete_rows=True, today=TODAY) == [
+        "2026-01", "2026-02", "2026-03", "2026-04",
+    ]
+    db_session.expire_all()
+    remaining = db_session.scalar(select(func.min(Historique.date_prediction)))
+    assert remaining.month == 5
+    assert db_session.scalar(select(func.count()).select_from(Historique)) == 20
+    assert sum(1 for batch in scan_archive(str(tmp_path), ["id"]) for _ in range(batch.num_rows)) == 40
+
+
+def test_scan_prunes_months_and_projects_columns(db_session, payload, tmp_path):
+    seed(db_session, payload)
+    archive_history(engine, str(tmp_path), after_months=0, today=TODAY)
+    batches = list(scan_archive(
+        str(tmp_path), ["id", "probability"], date_from=datetime(2026, 2, 3), date_to=datetime(2026, 3, 1), prediction=1,
+    ))
+    assert all(batch.schema.names == ["id", "probability"] for batch in batches)
+    # Élagage : seul le fichier de février est ouvert
+    fragments = archive_dataset(str(tmp_path)).get_fragments(archive_filter(datetime(2026, 2, 3), datetime(2026, 3, 1)))
+    assert [fragment.path.split("/")[-2] for fragment in fragments] == ["month=2026-02"]
+    # Février, à partir du 3 (i >= 2), départs seulement (i impair)
+    assert sum(batch.num_rows for batch in batches) == 4
+
+    summary = archive_summary(str(tmp_path), "month", date_from=datetime(2026, 4, 1))
+    assert [row["month"] for row in summary] == ["2026-04", "2026-05"]
+    assert summary[0] == {"month": "2026-04", "total": 10, "churn": 5, "churn_rate": 0.5, "mean_probability": 0.45}
+    by_version = archive_summary(str(tmp_path), "model_version")
+    assert {row["model_version"]: row["total"] for row in by_version} == {"v0": 20, "v1": 30}
+
+
+def test_archive_endpoints_read_parquet_only(client, db_session, payload, tmp_path, monkeypatch):
+    seed(db_session, payload)
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    archive_history(engine, str(tmp_path), after_months=3, today=TODAY)
+
+    assert set(client.get("/archive").json()["months"]) == {"2026-01", "2026-02"}
+    stats = client.get("/archive/stats", params={"group_by": "day", "date_to": "2026-01-03T00:00:00"}).json()
+    assert [row["day"] for row in stats] == ["2026-01-01", "2026-01-02"]
+
+    response = client.get("/archive/export", auth=AUTH, params={"columns": "id,heures_supp", "prediction": 0})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 10 and set(lines[0]) == {"id", "heures_supp"} and lines[0]["heures_supp"] == "Oui"
+    response = client.get("/archive/export", auth=AUTH, params={"format": "csv", "columns": "id,probability"})
+    assert len(list(csv.DictReader(io.StringIO(response.text)))) == 20
+
+    assert client.get("/archive/export", auth=AUTH, params={"columns": "mot_de_passe"}).status_code == 400
+    assert client.get("/archive/export").status_code == 401
+
+
+def test_retention_keeps_months_not_yet_archived(db_session, payload):
+    seed(db_session, payload)
+    with engine.begin() as connection:
+        # Rétention de 2 mois (mai, juin), mais seuls janvier et février sont archivés
+        drop_expired(connection, 2, today=TODAY, keep_from=date(2026, 3, 1))
+    db_session.expire_all()
+    assert db_session.scalar(select(func.min(Historique.date_prediction))).month == 3
+    assert db_session.scalar(select(func.count()).select_from(Historique)) == 40
+
+
+def test_maintenance_never_drops_unarchived_months(db_session, payload, tmp_path, monkeypatch):
+    # Archive après 3 mois, rétention de 2 : le mois M-3 n'est pas encore archivé et doit rester dans la base
+    today = datetime.now(timezone.utc).date()
+    rows = []
+    for offset in range(-5, 1):
+        month = month_start(today, offset)
+        rows.append({**payload, "prediction": 1, "probability": 0.5,
+                     "date_prediction": datetime(month.year, month.month, 2), "model_version": "v1"})
+    db_session.execute(insert(Historique), rows)
+    db_session.commit()
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "ARCHIVE_AFTER_MONTHS", 3)
+    monkeypatch.setattr(settings, "HISTORY_RETENTION_MONTHS", 2)
+
+    run_history_maintenance()
+    db_session.expire_all()
+    kept = {value.strftime("%Y-%m") for value in db_session.scalars(select(Historique.date_prediction))}
+    assert kept == {month_key(month_start(today, offset)) for offset in range(-3, 1)}
+    assert read_manifest(str(tmp_path))["archived_before"] == month_start(today, -3).isoformat()
+
+
+def test_retention_drops_nothing_before_the_first_archive(db_session, payload, tmp_path, monkeypatch):
+    db_session.execute(insert(Historique), [{**payload, "prediction": 0, "probability": 0.1,
+                                             "date_prediction": datetime(2020, 1, 2), "model_version": "v1"}])
+    db_session.commit()
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path / "vide"))
+    monkeypatch.setattr(settings, "HISTORY_RETENTION_MONTHS", 1)
+    # L'archivage échoue avant d'avoir rien écrit : la rétention ne doit rien supprimer
+    monkeypatch.setattr("app.main.archive_history", lambda *args, **kwargs: [])
+    assert run_history_maintenance()["dropped"] == []
+    assert db_session.scalar(select(func.count()).select_from(Historique)) == 1
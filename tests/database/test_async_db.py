@@ -0,0 +1,22 @@
+from app.db.database import async_database_url, get_async_db, get_db
+from app.db.models import Historique
+from app.main import app
+
+
+def test_async_database_url():
+    assert async_database_url("postgresql://u:p@h:5432/db") == "postgresql+asyncpg://u:p@h:5432/db"
+    assert async_database_url("postgresql+psycopg2://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+    assert async_database_url("sqlite:////tmp/test.db") == "sqlite+aiosqlite:////tmp/test.db"
+
+
+def test_routes_with_async_session(client, db_session, payload):
+    """Avec une AsyncSession (aiosqlite), /predict et /history fonctionnent à l'identique"""
+    app.dependency_overrides[get_db] = get_async_db
+    auth = ("test_admin", "pomme23")
+    assert client.post("/predict", auth=auth, json=payload).status_code == 200
+    assert client.post("/predict/batch", auth=auth, json=[payload, payload]).status_code == 200
+
+    history = client.get("/history", params={"limit": 2})
+    assert history.status_code == 200 and len(history.json()) == 2
+    assert history.headers["X-Next-Cursor"]
+    assert db_session.query(Historique).count() == 3
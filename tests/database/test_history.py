@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.db.models import Historique
+
+
+def seed(db_session, payload, n):
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    db_session.execute(insert(Historique), [
+        # Deux prédictions par seconde : le curseur doit départager les dates égales par l'id
+        {**payload, "prediction": i % 2, "probability": i / n, "date_prediction": start + timedelta(seconds=i // 2)}
+        for i in range(n)
+    ])
+    db_session.commit()
+
+
+def test_history_keyset_pagination(client, db_session, payload):
+    seed(db_session, payload, 25)
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10} if cursor is None else {"limit": 10, "cursor": cursor}
+        response = client.get("/history", params=params)
+        assert response.status_code == 200
+        seen += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    # Toutes les lignes, une seule fois, de la plus récente à la plus ancienne
+    assert seen == list(range(25, 0, -1))
+    assert client.get("/history", params={"cursor": "pas-un-curseur"}).status_code == 400
+
+
+def test_history_filters(client, db_session, payload):
+    seed(db_session, payload, 20)
+    rows = client.get("/history", params={"limit": 100, "prediction": 1}).json()
+    assert len(rows) == 10 and all(row["prediction"] == 1 for row in rows)
+
+    rows = client.get("/history", params={
+        "limit": 100, "date_from": "2026-01-01T12:00:02", "date_to": "2026-01-01T12:00:05",
+    }).json()
+    assert len(rows) == 6
+
+
+def test_history_export_streams_ndjson_and_csv(client, db_session, payload):
+    seed(db_session, payload, 30)
+    auth = ("test_admin", "pomme23")
+    response = client.get("/history/export", auth=auth, params={"prediction": 0})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 15 and lines[0]["prediction"] == 0
+
+    response = client.get("/history/export", auth=auth, params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 30 and rows[0]["id"] == "30"
+
+    assert client.get("/history/export").status_code == 401
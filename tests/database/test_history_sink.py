@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from app.db.database import SessionLocal
+from app.db.history_sink import HistorySink
+from app.db.models import Historique
+
+
+def make_rows(payload, n):
+    return [{**payload, "prediction": 0, "probability": 0.1} for _ in range(n)]
+
+
+def test_sink_flushes_in_background_and_drains_on_stop(db_session, payload, tmp_path):
+    sink = HistorySink(batch_size=3, flush_interval=0.05, spill_path=str(tmp_path / "spill.jsonl"))
+
+    async def scenario():
+        await sink.start()
+        await sink.submit(make_rows(payload, 7))
+        await sink.stop()  # Ce qui reste en file est écrit à l'arrêt
+
+    asyncio.run(scenario())
+    assert sink.qsize() == 0
+    assert db_session.query(Historique).count() == 7
+
+
+def test_sink_backpressure_drop(db_session, payload, tmp_path):
+    sink = HistorySink(max_queue=2, policy="drop", spill_path=str(tmp_path / "spill.jsonl"))
+    asyncio.run(sink.submit(make_rows(payload, 5)))
+    assert sink.dropped == 3
+    assert sink.drain() == 2
+
+
+def test_sink_backpressure_block_keeps_the_loop_running(db_session, payload, tmp_path):
+    sink = HistorySink(max_queue=2, policy="block", spill_path=str(tmp_path / "spill.jsonl"))
+    ticks = []
+
+    async def scenario():
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.005)
+        task = asyncio.create_task(ticker())
+        submit = asyncio.create_task(sink.submit(make_rows(payload, 3)))
+        await asyncio.sleep(0.05)
+        # File pleine : la requête attend, les autres tâches de la boucle continuent
+        assert not submit.done() and len(ticks) > 2
+        await asyncio.to_thread(sink.drain)
+        await asyncio.wait_for(submit, 1)
+        task.cancel()
+
+    asyncio.run(scenario())
+    sink.drain()
+    assert db_session.query(Historique).count() == 3
+
+
+def test_sink_spills_when_full_or_database_down(db_session, payload, tmp_path):
+    sink = HistorySink(max_queue=2, policy="spill", spill_path=str(tmp_path / "spill.jsonl"))
+    spill = sink._spill
+    threads = []
+
+    def recording_spill(rows):
+        threads.append(threading.current_thread())
+        spill(rows)
+
+    sink._spill = recording_spill
+    asyncio.run(sink.submit(make_rows(payload, 3)))
+    assert sink.spilled == 1
+    # Le fichier est écrit hors de la boucle d'événements
+    assert threads and threading.main_thread() not in threads
+    # Un fichier par processus
+    assert sink.spill_path == str(tmp_path / f"spill.{os.getpid()}.jsonl")
+
+    # Base indisponible : le lot part sur disque au lieu d'être perdu
+    def broken_session():
+        raise ConnectionError("base indisponible")
+    sink.session_factory = broken_session
+    assert sink.drain() == 0
+    assert sink.spilled == 3
+
+    # Reprise pendant la panne : les lignes sont débordées de nouveau, pas perdues (les compteurs ne font que croître)
+    sink._replay_spill()
+    assert (sink.spilled, sink.replayed) == (6, 0) and os.path.exists(sink.spill_path)
+
+    # La base revient : tout est rejoué
+    sink.session_factory = SessionLocal
+    sink._replay_spill()
+    assert os.listdir(tmp_path) == []
+    assert (sink.spilled, sink.replayed) == (6, 3)
+    assert db_session.query(Historique).count() == 3
+
+
+def test_sink_replays_files_of_stopped_processes_and_skips_bad_lines(db_session, payload, tmp_path):
+    # PID d'un processus terminé, puis d'un processus vivant (le nôtre ne compte pas : c'est le test)
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    alive = os.getppid()
+    row = json.dumps({**payload, "prediction": 1, "probability": 0.9, "date_prediction": "2026-03-01T10:00:00+00:00"})
+    (tmp_path / f"spill.{dead.stdout.strip()}.jsonl").write_text(f"{row}\n{{tronqu\n{row}\n")
+    (tmp_path / f"spill.{alive}.jsonl").write_text(f"{row}\n")
+
+    sink = HistorySink(spill_path=str(tmp_path / "spill.jsonl"))
+    sink._replay_spill(orphans=True)
+    # La ligne illisible est ignorée, le fichier du worker encore vivant n'est pas touché
+    assert db_session.query(Historique).count() == 2
+    assert os.listdir(tmp_path) == [f"spill.{alive}.jsonl"]
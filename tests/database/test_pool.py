@@ -0,0 +1,98 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc as sa_exc
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SQLALCHEMY_DATABASE_URL, db_latency, get_db
+from app.main import app
+
+AUTH = ("test_admin", "pomme23")
+
+
+def small_pool():
+    # Deux connexions, attente courte : on sature le pool sans ralentir la suite de tests
+    return create_engine(SQLALCHEMY_DATABASE_URL, pool_size=2, max_overflow=0, pool_timeout=0.2)
+
+
+def test_health_reports_pool_and_latency(client):
+    client.get("/history", auth=AUTH)
+    body = client.get("/health").json()
+    assert body["status"] == "ok"
+    assert body["database"]["pool"]["capacity"] >= body["database"]["pool"]["checked_out"]
+    assert body["database"]["ping_ms"] >= 0
+    assert 0 < body["database"]["latency"]["samples"] <= db_latency.samples.maxlen
+
+
+def test_pool_exhaustion_returns_503_without_hanging(client, monkeypatch):
+    bind = small_pool()
+    held = [bind.connect() for _ in range(2)]
+
+    def override_get_db():
+        with Session(bind) as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr("app.main.engine", bind)
+    try:
+        health = client.get("/health")
+        assert health.status_code == 503 and health.json()["status"] == "saturated"
+
+        # Rafale de requêtes concurrentes : toutes échouent vite et proprement, aucune ne reste bloquée
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            responses = list(executor.map(lambda _: client.get("/history", auth=AUTH), range(32)))
+        assert time.perf_counter() - start < 10
+        assert {response.status_code for response in responses} == {503}
+        assert all(response.headers["Retry-After"] == "1" for response in responses)
+    finally:
+        for connection in held:
+            connection.close()
+
+    # Connexions rendues : le service repart sans redémarrage
+    assert client.get("/history", auth=AUTH).status_code == 200
+    assert client.get("/health").status_code == 200
+    bind.dispose()
+
+
+@pytest.mark.parametrize("error, expected", [
+    # Connexion refusée à l'ouverture : aucune requête n'a été envoyée
+    (sa_exc.OperationalError(None, None, Exception("connection refused")), 503),
+    # Connexion coupée en cours de requête, reconnue par le pilote
+    (sa_exc.OperationalError("SELECT 1", {}, Exception("server closed the connection"), connection_invalidated=True), 503),
+    # Erreur de la requête elle-même : un bug à voir en 500, pas une indisponibilité
+    (sa_exc.OperationalError("SELECT 1", {}, Exception("database is locked")), 500),
+])
+def test_only_unreachable_database_returns_503(db_session, error, expected):
+    def failing_get_db():
+        raise error
+        yield
+
+    app.dependency_overrides[get_db] = failing_get_db
+    try:
+        with TestClient(app, raise_server_exceptions=False) as client:
+            response = client.get("/history", auth=AUTH)
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == expected
+    assert ("Retry-After" in response.headers) == (expected == 503)
+
+
+def test_health_reports_the_async_pool(client, monkeypatch):
+    # Avec DB_ASYNC=true, les routes utilisent le pool asynchrone : /health décrit et sonde celui-là
+    monkeypatch.setattr(settings, "DB_ASYNC", True)
+    body = client.get("/health").json()
+    assert body["status"] == "ok"
+    assert body["database"]["pool"]["type"] == "AsyncAdaptedQueuePool"
+    assert body["database"]["ping_ms"] >= 0
+
+
+def test_auth_does_not_hold_a_connection(client, payload):
+    # Après l'authentification, la connexion est rendue : /predict ne garde rien pendant l'inférence
+    from app.db.database import engine
+
+    assert client.post("/predict", auth=AUTH, json=payload).status_code == 200
+    assert engine.pool.checkedout() == 0
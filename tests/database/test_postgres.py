@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.db.archive import archive_history, archived_before_month, read_manifest, scan_archive
+from app.db.database import Base, engine
+from app.db.history import insert_history
+from app.db.models import Historique, SchemaVersion
+from app.db.partitions import history_partitions, is_partitioned, maintain_history, month_start, partition_name
+from app.db.schema import SCHEMA_VERSION, current_version, ensure_schema
+
+# Partitions, DETACH et verrous consultatifs n'existent que sur PostgreSQL (la CI lance la suite sur postgres:15)
+pytestmark = pytest.mark.skipif(engine.dialect.name != "postgresql", reason="PostgreSQL uniquement (DATABASE_URL)")
+
+# Historique tel qu'il était en version 3, en types PostgreSQL
+V3_HISTORY = """
+CREATE TABLE historique_predictions (
+    id SERIAL PRIMARY KEY, date_prediction TIMESTAMP WITH TIME ZONE, age INTEGER, revenu_mensuel FLOAT,
+    distance_domicile_travail INTEGER, satisfaction_environnement INTEGER, heures_supp VARCHAR,
+    annees_promo INTEGER, satisfaction_equilibre INTEGER, pee INTEGER, poste_actuel INTEGER,
+    anciennete INTEGER, exp_totale INTEGER, prediction INTEGER, probability FLOAT, model_version VARCHAR
+)"""
+
+
+@pytest.fixture
+def bind():
+    Base.metadata.drop_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS historique_predictions_v3"))  # Migration interrompue
+
+
+def test_v3_history_is_partitioned_maintained_and_archived(bind, payload, tmp_path):
+    today = datetime.now(timezone.utc).date()
+    # Une ligne il y a trois mois, une il y a deux mois, une ce mois-ci
+    months = [month_start(today, offset) for offset in (-3, -2, 0)]
+    with bind.begin() as connection:
+        connection.execute(text(V3_HISTORY))
+        connection.execute(text("CREATE INDEX ix_historique_predictions_date_id ON historique_predictions (date_prediction, id)"))
+        for i, month in enumerate(months):
+            connection.execute(text(
+                "INSERT INTO historique_predictions (id, date_prediction, age, heures_supp, exp_totale, prediction, probability) "
+                "VALUES (:id, :date, 30, :heures_supp, 8, :prediction, 0.5)"
+            ), {"id": i + 1, "date": datetime(month.year, month.month, 1, 10, tzinfo=timezone.utc),
+                "heures_supp": "Oui" if i % 2 == 0 else "Non", "prediction": i % 2})
+        SchemaVersion.__table__.create(connection)
+        connection.execute(text("INSERT INTO schema_version (version) VALUES (3)"))
+
+    # Migration : table partitionnée par mois, une partition par mois déjà présent, données et séquence reprises
+    assert ensure_schema(bind) is True
+    assert current_version(bind) == SCHEMA_VERSION
+    with bind.connect() as connection:
+        assert is_partitioned(connection)
+        assert {partition_name(month) for month in months} <= set(history_partitions(connection))
+    with Session(bind) as db:
+        rows = db.execute(select(Historique.id, Historique.heures_supp).order_by(Historique.id)).all()
+        assert rows == [(1, "Oui"), (2, "Non"), (3, "Oui")]
+        insert_history(db, [{**payload, "prediction": 0, "probability": 0.2}])
+        db.commit()
+        assert db.scalar(select(func.max(Historique.id))) == 4
+
+    # Maintenance : partitions des mois à venir, sous le verrou consultatif
+    ahead = maintain_history(bind, months_ahead=4)
+    assert ahead["partitions"] == [partition_name(month_start(today, 3)), partition_name(month_start(today, 4))]
+    assert maintain_history(bind, months_ahead=4)["partitions"] == []
+
+    # Archivage : les mois révolus partent en Parquet et leurs partitions sont détachées puis supprimées
+    archived = archive_history(bind, str(tmp_path), after_months=1, delete_rows=True)
+    assert archived == [f"{month:%Y-%m}" for month in months[:2]]
+    with bind.connect() as connection:
+        remaining = set(history_partitions(connection))
+        assert not {partition_name(month) for month in months[:2]} & remaining
+        assert connection.scalar(select(func.count()).select_from(Historique)) == 2
+    assert sum(batch.num_rows for batch in scan_archive(str(tmp_path), ["id"])) == 2
+
+    # Rétention bornée par le manifeste : seul le mois vide et déjà archivé (le mois dernier) est supprimé
+    keep_from = archived_before_month(read_manifest(str(tmp_path)))
+    assert keep_from == month_start(today)
+    dropped = maintain_history(bind, months_ahead=0, retention_months=1, keep_from=keep_from)["dropped"]
+    assert dropped == [partition_name(month_start(today, -1))]
+    with Session(bind) as db:
+        assert db.scalar(select(func.count()).select_from(Historique)) == 2
+        assert month_start(db.scalar(select(func.min(Historique.date_prediction))).date()) == month_start(today)
@@ -0,0 +1,152 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from app.db.history import insert_history
+from app.db.models import Historique, HistoriqueRollup, SchemaVersion
+from app.db.partitions import (
+    create_partitions, drop_expired, maintain_history, month_start, partition_name, partitioned_history_table,
+)
+from app.db.schema import SCHEMA_VERSION, current_version, ensure_schema
+
+# Historique tel qu'il était en version 3 : heures_supp en texte, exp_totale et distance en entiers
+V3_HISTORY = """
+CREATE TABLE historique_predictions (
+    id INTEGER PRIMARY KEY, date_prediction DATETIME, age INTEGER, revenu_mensuel FLOAT,
+    distance_domicile_travail INTEGER, satisfaction_environnement INTEGER, heures_supp VARCHAR,
+    annees_promo INTEGER, satisfaction_equilibre INTEGER, pee INTEGER, poste_actuel INTEGER,
+    anciennete INTEGER, exp_totale INTEGER, prediction INTEGER, probability FLOAT, model_version VARCHAR
+)"""
+
+
+def test_fresh_database_gets_latest_schema(tmp_path):
+    bind = create_engine(f"sqlite:///{tmp_path / 'neuve.db'}")
+    assert current_version(bind) == 0
+    assert ensure_schema(bind) is True
+    assert current_version(bind) == SCHEMA_VERSION
+    columns = {column["name"]: column["type"] for column in inspect(bind).get_columns("historique_predictions")}
+    assert type(columns["heures_supp"]).__name__ == "BOOLEAN"
+    assert type(columns["exp_totale"]).__name__ == "FLOAT"
+    assert ensure_schema(bind) is False
+
+
+def test_v3_history_is_migrated_to_compact_schema(tmp_path, payload):
+    bind = create_engine(f"sqlite:///{tmp_path / 'v3.db'}")
+    with bind.begin() as connection:
+        connection.execute(text(V3_HISTORY))
+        connection.execute(text("CREATE INDEX ix_historique_predictions_date_id ON historique_predictions (date_prediction, id)"))
+        connection.execute(text(
+            "INSERT INTO historique_predictions (id, date_prediction, age, heures_supp, exp_totale, prediction, probability) "
+            "VALUES (7, '2026-01-15 10:00:00', 30, 'Oui', 8, 1, 0.9), (8, '2026-02-01 10:00:00', 40, 'Non', 3, 0, 0.1)"
+        ))
+        SchemaVersion.__table__.create(connection)
+        connection.execute(text("INSERT INTO schema_version (version) VALUES (3)"))
+
+    assert ensure_schema(bind) is True
+    assert current_version(bind) == SCHEMA_VERSION
+    with Session(bind) as db:
+        rows = db.execute(select(Historique.id, Historique.heures_supp, Historique.exp_totale).order_by(Historique.id)).all()
+        assert rows == [(7, "Oui", 8.0), (8, "Non", 3.0)]
+        # Les nouvelles lignes reprennent la numérotation après les anciennes
+        insert_history(db, [{**payload, "exp_totale": 2.5, "prediction": 0, "probability": 0.2}])
+        db.commit()
+        assert db.scalar(select(Historique.exp_totale).where(Historique.id == 9)) == 2.5
+    assert {index["name"] for index in inspect(bind).get_indexes("historique_predictions")} >= {
+        "ix_historique_predictions_date_id", "ix_historique_predictions_prediction_date_id",
+    }
+    with bind.connect() as connection:
+        stored = connection.execute(text("SELECT heures_supp FROM historique_predictions ORDER BY id")).scalars().all()
+    assert stored == [1, 0, 0]
+
+
+def test_pre_versioning_database_gets_rollup(tmp_path):
+    bind = create_engine(f"sqlite:///{tmp_path / 'v1.db'}")
+    with bind.begin() as connection:
+        connection.execute(text(V3_HISTORY.replace(", model_version VARCHAR", "")))
+        connection.execute(text(
+            "INSERT INTO historique_predictions (date_prediction, age, heures_supp, prediction, probability, revenu_mensuel, "
+            "distance_domicile_travail, satisfaction_environnement, annees_promo, satisfaction_equilibre, pee, "
+            "poste_actuel, anciennete, exp_totale) VALUES ('2026-01-15 10:00:00', 30, 'Oui', 1, 0.9, 3000, 5, 3, 1, 3, 0, 2, 3, 8)"
+        ))
+    ensure_schema(bind)
+    with Session(bind) as db:
+        assert db.get(HistoriqueRollup, (date(2026, 1, 15), "heures_supp")).total == 1
+
+
+def test_retention_deletes_old_months_without_partitions(db_session, payload):
+    rows = [
+        {**payload, "prediction": 0, "probability": 0.1, "date_prediction": datetime(2026, month, 10, tzinfo=timezone.utc)}
+        for month in (1, 2, 3, 4)
+    ]
+    insert_history(db_session, rows)
+    db_session.commit()
+    with db_session.get_bind().begin() as connection:
+        assert drop_expired(connection, 2, today=date(2026, 4, 20)) == ["2 lignes"]
+    remaining = db_session.scalars(select(Historique.date_prediction).order_by(Historique.date_prediction)).all()
+    assert [value.month for value in remaining] == [3, 4]
+
+
+def test_postgres_history_is_partitioned_by_month():
+    ddl = str(CreateTable(partitioned_history_table()).compile(dialect=postgresql.dialect()))
+    assert "PARTITION BY RANGE (date_prediction)" in ddl
+    assert "PRIMARY KEY (id, date_prediction)" in ddl
+    assert "id BIGSERIAL" in ddl and "heures_supp BOOLEAN" in ddl and "age SMALLINT" in ddl
+    assert month_start(date(2026, 11, 18), 2) == date(2027, 1, 1)
+    assert month_start(date(2026, 3, 31), -3) == date(2025, 12, 1)
+    assert partition_name(date(2026, 3, 1)) == "historique_predictions_2026_03"
+
+
+class RecordingConnection:
+    """Connexion PostgreSQL factice : garde le SQL exécuté ; la partition par défaut a des lignes de chaque mois."""
+
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self, partitions=()):
+        self.partitions = list(partitions)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return self
+
+    def scalars(self):
+        return iter(self.partitions)
+
+    def scalar(self):
+        return True
+
+    rowcount = 3
+
+    def begin(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_partition_creation_moves_rows_out_of_the_default_partition():
+    connection = RecordingConnection(partitions=["historique_predictions_2026_03"])
+    assert create_partitions(connection, date(2026, 3, 1), date(2026, 4, 1)) == ["historique_predictions_2026_04"]
+    ddl = [statement.split(" WHERE ")[0] for statement in connection.statements[2:]]
+    # Détacher la partition par défaut, créer le mois, y déplacer ses lignes, rattacher
+    assert ddl == [
+        "ALTER TABLE historique_predictions DETACH PARTITION historique_predictions_default",
+        "CREATE TABLE historique_predictions_2026_04 PARTITION OF historique_predictions "
+        "FOR VALUES FROM ('2026-04-01 00:00:00+00') TO ('2026-05-01 00:00:00+00')",
+        "INSERT INTO historique_predictions_2026_04 SELECT * FROM historique_predictions_default",
+        "DELETE FROM historique_predictions_default",
+        "ALTER TABLE historique_predictions ATTACH PARTITION historique_predictions_default DEFAULT",
+    ]
+
+
+def test_maintenance_is_serialised_between_workers():
+    connection = RecordingConnection()
+    maintain_history(connection, months_ahead=0)
+    assert connection.statements[0] == "SELECT pg_advisory_xact_lock(:key)"
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.db.history import insert_history
+from app.db.database import engine
+from app.db.models import HistoriqueRollup, HistoriqueRollupPending
+from app.db.stats import fold_pending, read_stats, rebuild_rollup
+from app.main import _insert_history
+
+
+def rows(payload, n, day):
+    return [
+        {**payload, "age": 20 + i, "heures_supp": "Oui" if i % 4 == 0 else "Non", "prediction": int(i % 3 == 0),
+         "probability": i / n, "date_prediction": datetime(2026, 3, day, 9, i, tzinfo=timezone.utc)}
+        for i in range(n)
+    ]
+
+
+def test_stats_follow_history_writes(client, db_session, payload):
+    auth = ("test_admin", "pomme23")
+    for age in (25, 35, 45):
+        client.post("/predict", auth=auth, json={**payload, "age": age})
+    client.post("/predict/batch", auth=auth, json=[{**payload, "age": 55}, {**payload, "age": 65}])
+
+    fold_pending(engine)  # Sans attendre le passage périodique
+    stats = client.get("/stats").json()
+    assert stats["total"] == 5
+    assert sum(b["count"] for b in stats["probability_histogram"]) == 5
+    assert stats["features"]["age"] == pytest.approx({"mean": 45, "std": (200) ** 0.5, "min": 25, "max": 65})
+    assert stats["daily"][0]["count"] == 5
+
+
+def test_rollup_per_day_and_rebuild(client, db_session, payload):
+    insert_history(db_session, rows(payload, 12, 1))
+    insert_history(db_session, rows(payload, 6, 2))
+    db_session.commit()
+
+    stats = client.get("/stats", params={"date_from": "2026-03-02"}).json()
+    assert stats["total"] == 6
+    assert stats["churn_rate"] == pytest.approx(2 / 6)
+    assert stats["features"]["heures_supp"]["mean"] == pytest.approx(2 / 6)
+
+    everything = read_stats(db_session)
+    assert [day["count"] for day in everything["daily"]] == [12, 6]
+
+    # Le recalcul complet depuis l'historique redonne les agrégats tenus à jour au fil des écritures
+    def snapshot():
+        return {(r.jour, r.metric): (r.count, r.total or 0.0, r.minimum or 0.0, r.maximum or 0.0)
+                for r in db_session.scalars(select(HistoriqueRollup))}
+    before = snapshot()
+    assert rebuild_rollup(db_session) == 18
+    after = snapshot()
+    assert after.keys() == before.keys()
+    for key, values in before.items():
+        assert after[key] == pytest.approx(values)
+
+
+def test_request_writes_defer_rollup(db_session, payload):
+    # L'écriture d'une requête ne verrouille pas les lignes d'agrégat partagées : elles partent au passage suivant
+    _insert_history(db_session, rows(payload, 4, 1))
+    assert db_session.scalar(select(HistoriqueRollup).limit(1)) is None
+    assert db_session.query(HistoriqueRollupPending).count() == 4
+    assert fold_pending(engine, batch_size=3) == 4
+    assert read_stats(db_session)["total"] == 4
+    assert db_session.query(HistoriqueRollupPending).count() == 0
+
+
+def test_pending_rows_survive_a_crash_and_a_failed_fold(db_session, payload, monkeypatch):
+    # Worker arrêté brutalement après ses commits : rien n'était en mémoire, les lignes attendent en base
+    _insert_history(db_session, rows(payload, 4, 1))
+    _insert_history(db_session, rows(payload, 4, 1))
+    db_session.close()
+
+    def broken(*args):
+        raise RuntimeError("base indisponible")
+
+    monkeypatch.setattr("app.db.stats.apply_rollup", broken)
+    with pytest.raises(RuntimeError):
+        fold_pending(engine)
+    monkeypatch.undo()
+    # Le repli raté n'a rien réclamé : le passage suivant (de n'importe quel worker) compte tout, une seule fois
+    assert db_session.query(HistoriqueRollupPending).count() == 8
+    assert fold_pending(engine) == 8
+    assert fold_pending(engine) == 0
+    assert read_stats(db_session)["total"] == 8
@@ -0,0 +1,78 @@
+import time
+from unittest.mock import patch
+
+from app.core import security
+from app.core.security import (
+    CredentialCache,
+    bump_credentials_epoch,
+    create_access_token,
+    credential_cache,
+    verify_access_token,
+)
+
+
+def test_cache_ttl_and_eviction():
+    cache = CredentialCache(maxsize=2, ttl=60)
+    cache.add("alice", "pomme23")
+    assert cache.contains("alice", "pomme23")
+    # Un autre mot de passe pour le même utilisateur n'est pas en cache
+    assert not cache.contains("alice", "banane19")
+
+    # Au-delà de la taille maximale, le plus ancien est évincé
+    cache.add("bob", "b")
+    cache.add("carol", "c")
+    assert not cache.contains("alice", "pomme23")
+    assert cache.contains("carol", "c")
+
+    # Une entrée expirée n'est plus valide
+    with patch.object(security.time, "monotonic", return_value=time.monotonic() + 61):
+        assert not cache.contains("carol", "c")
+
+
+def test_cache_cleared_on_password_rotation():
+    """Un changement de mot de passe (create_user.py) vide le cache de tous les processus"""
+    cache = CredentialCache(maxsize=10, ttl=60)
+    cache.add("alice", "pomme23")
+    bump_credentials_epoch()
+    assert not cache.contains("alice", "pomme23")
+
+
+def test_token_roundtrip_and_revocation():
+    token = create_access_token("alice")
+    assert verify_access_token(token) == "alice"
+
+    # Un jeton modifié est refusé
+    payload, signature = token.split(".")
+    forged = security._b64encode(b"admin" + security._b64decode(payload)[5:])
+    assert verify_access_token(f"{forged}.{signature}") is None
+    assert verify_access_token("n'importe quoi") is None
+
+    # Changer un mot de passe révoque les jetons déjà émis
+    bump_credentials_epoch()
+    assert verify_access_token(token) is None
+
+
+def test_predict_uses_cache_and_token(client, payload):
+    # Premier appel : bcrypt, puis les identifiants sont en cache
+    assert client.post("/predict", auth=("test_admin", "pomme23"), json=payload).status_code == 200
+    assert credential_cache.contains("test_admin", "pomme23")
+
+    # Les appels suivants ne repassent pas par bcrypt
+    with patch("app.main.verify_password") as verify:
+        assert client.post("/predict", auth=("test_admin", "pomme23"), json=payload).status_code == 200
+        verify.assert_not_called()
+
+    # Mode jeton
+    token = client.post("/token", auth=("test_admin", "pomme23")).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/predict", headers=headers, json=payload).status_code == 200
+    response = client.post("/predict", headers={"Authorization": "Bearer faux"}, json=payload)
+    assert response.status_code == 401
+
+
+def test_token_endpoint_requires_basic_credentials(client):
+    """Un jeton ne permet pas d'en obtenir un nouveau : sinon un jeton volé n'expirerait jamais"""
+    token = client.post("/token", auth=("test_admin", "pomme23")).json()["access_token"]
+    response = client.post("/token", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert client.post("/token", auth=("test_admin", "MAUVAIS")).status_code == 401
@@ -1,7 +1,7 @@
-from app.db.database import SessionLocal, engine
-from app.db.models import User, Historique
+from app.db.database import SessionLocal, engine, ping, pool_status
+from app.db.models import User
+from app.db.stats import read_stats
 from app.core.config import settings
-from sqlalchemy import text
 
 def check_db_health():
     print("--- DIAGNOSTIC BASE DE DONNÉES ---")
@@ -9,9 +9,8 @@ def check_db_health():
 
     try:
         # 1. Test de connexion brute
-        with engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
-            print("Connexion Engine : OK")
+        print(f"Connexion Engine : OK ({ping(engine)} ms)")
+        print(f"Pool : {pool_status(engine)}")
     except Exception as e:
         print(f"Connexion Engine : ÉCHEC ({e})")
         return
@@ -27,9 +26,9 @@ def check_db_health():
         if not users:
             print("AUCUN UTILISATEUR TROUVÉ ! L'authentification ne marchera pas.")
 
-        # 3. Vérification de l'historique
-        history_count = db.query(Historique).count()
-        print(f"\nHistorique Prédictions : {history_count} entrées")
+        # 3. Vérification de l'historique (lu dans les agrégats : pas de parcours complet de la table)
+        stats = read_stats(db)
+        print(f"\nHistorique Prédictions : {stats['total']} entrées")
 
     except Exception as e:
         print(f"Erreur lors de la lecture des tables : {e}")